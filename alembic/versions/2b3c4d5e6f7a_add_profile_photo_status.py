@@ -0,0 +1,31 @@
+"""Add UserProfile.photo_status
+
+Revision ID: 2b3c4d5e6f7a
+Revises: 1a2b3c4d5e6f
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '2b3c4d5e6f7a'
+down_revision = '1a2b3c4d5e6f'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    photostatus = postgresql.ENUM('NONE', 'PROCESSING', 'DONE', 'FAILED', name='photostatus')
+    photostatus.create(op.get_bind())
+
+    op.add_column('user_profiles',
+        sa.Column('photo_status', sa.Enum('NONE', 'PROCESSING', 'DONE', 'FAILED', name='photostatus'), nullable=False, server_default='NONE')
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('user_profiles', 'photo_status')
+
+    photostatus = postgresql.ENUM('NONE', 'PROCESSING', 'DONE', 'FAILED', name='photostatus')
+    photostatus.drop(op.get_bind())
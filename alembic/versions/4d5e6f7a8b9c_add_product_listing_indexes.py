@@ -0,0 +1,24 @@
+"""Add indexes for keyset product listing
+
+Revision ID: 4d5e6f7a8b9c
+Revises: 3c4d5e6f7a8b
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '4d5e6f7a8b9c'
+down_revision = '3c4d5e6f7a8b'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_index('ix_products_active_name_id', 'products', ['name', 'id'], postgresql_where=sa.text('is_active'))
+    op.create_index(op.f('ix_product_variants_product_id'), 'product_variants', ['product_id'])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_product_variants_product_id'), table_name='product_variants')
+    op.drop_index('ix_products_active_name_id', table_name='products')
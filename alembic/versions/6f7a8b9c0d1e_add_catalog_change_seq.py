@@ -0,0 +1,34 @@
+"""Add catalog change sequence for the change feed
+
+Revision ID: 6f7a8b9c0d1e
+Revises: 5e6f7a8b9c0d
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '6f7a8b9c0d1e'
+down_revision = '5e6f7a8b9c0d'
+branch_labels = None
+depends_on = None
+
+TABLES = ('products', 'product_variants', 'garment_assets')
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(sa.Sequence('catalog_change_seq')))
+    for table in TABLES:
+        # Existing rows each draw a value while the column is added
+        op.add_column(table, sa.Column(
+            'change_seq', sa.BigInteger(), nullable=False,
+            server_default=sa.text("nextval('catalog_change_seq')"),
+        ))
+        op.create_index(op.f(f'ix_{table}_change_seq'), table, ['change_seq'])
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.drop_index(op.f(f'ix_{table}_change_seq'), table_name=table)
+        op.drop_column(table, 'change_seq')
+    op.execute(sa.schema.DropSequence(sa.Sequence('catalog_change_seq')))
@@ -0,0 +1,33 @@
+"""Add keys for bulk catalog import upserts
+
+Revision ID: 7a8b9c0d1e2f
+Revises: 6f7a8b9c0d1e
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7a8b9c0d1e2f'
+down_revision = '6f7a8b9c0d1e'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('external_id', sa.String(), nullable=True))
+    op.create_unique_constraint('products_external_id_key', 'products', ['external_id'])
+    # Re-running create_variants_bulk used to duplicate sizes. Keep the most
+    # recently written row (highest change_seq): later stock or SKU fixes went
+    # there, and the backfilled sequence says nothing about creation order
+    op.execute(
+        "DELETE FROM product_variants a USING product_variants b "
+        "WHERE a.product_id = b.product_id AND a.size = b.size AND a.change_seq < b.change_seq"
+    )
+    op.create_unique_constraint('_product_size_uc', 'product_variants', ['product_id', 'size'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('_product_size_uc', 'product_variants', type_='unique')
+    op.drop_constraint('products_external_id_key', 'products', type_='unique')
+    op.drop_column('products', 'external_id')
@@ -0,0 +1,54 @@
+"""Add mannequin video metadata and renditions
+
+Revision ID: 8b9c0d1e2f3a
+Revises: 7a8b9c0d1e2f
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '8b9c0d1e2f3a'
+down_revision = '7a8b9c0d1e2f'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    videostatus = postgresql.ENUM('NONE', 'PROCESSING', 'DONE', 'FAILED', name='videostatus')
+    videostatus.create(op.get_bind())
+
+    op.add_column('mannequin_assets',
+        sa.Column('video_status', sa.Enum('NONE', 'PROCESSING', 'DONE', 'FAILED', name='videostatus'), nullable=False, server_default='NONE')
+    )
+    op.add_column('mannequin_assets', sa.Column('fps', sa.Float(), nullable=True))
+    op.add_column('mannequin_assets', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('mannequin_assets', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('mannequin_assets', sa.Column('poster_url', sa.String(), nullable=True))
+
+    op.create_table('mannequin_renditions',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('mannequin_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('width', sa.Integer(), nullable=False),
+        sa.Column('height', sa.Integer(), nullable=False),
+        sa.Column('bitrate_kbps', sa.Integer(), nullable=False),
+        sa.Column('url', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['mannequin_id'], ['mannequin_assets.id'], ondelete='CASCADE')
+    )
+    op.create_index(op.f('ix_mannequin_renditions_mannequin_id'), 'mannequin_renditions', ['mannequin_id'])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_mannequin_renditions_mannequin_id'), table_name='mannequin_renditions')
+    op.drop_table('mannequin_renditions')
+    op.drop_column('mannequin_assets', 'poster_url')
+    op.drop_column('mannequin_assets', 'height')
+    op.drop_column('mannequin_assets', 'width')
+    op.drop_column('mannequin_assets', 'fps')
+    op.drop_column('mannequin_assets', 'video_status')
+
+    videostatus = postgresql.ENUM('NONE', 'PROCESSING', 'DONE', 'FAILED', name='videostatus')
+    videostatus.drop(op.get_bind())
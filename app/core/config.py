@@ -25,14 +25,49 @@ class Settings(BaseSettings):
     # Storage paths (mounted volume: ./data -> /app/data)
     UPLOAD_DIR: str = "./data/uploads"
     STATIC_DIR: str = "./data/static"
+    # Uploads are streamed to disk and rejected once they pass these sizes
+    MAX_UPLOAD_BYTES: int = 200 * 1024 * 1024
+    PHOTO_MAX_UPLOAD_BYTES: int = 25 * 1024 * 1024
+    # Resumable (chunked) uploads not completed and claimed by then are purged
+    RESUMABLE_UPLOAD_TTL_SECONDS: int = 24 * 3600
+    # Resized image variants (thumb/medium/full) kept on disk, LRU-evicted
+    DERIVATIVE_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
 
     # Redis (docker-friendly default)
     REDIS_URL: str = "redis://redis:6379/0"
 
+    # Public catalog reads: per-process LRU in front of Redis
+    CATALOG_CACHE_TTL_SECONDS: int = 300
+    CATALOG_CACHE_MAX_ENTRIES: int = 2048
+
+    # Password hashing (bcrypt) runs on a small thread pool; past this many
+    # hashes waiting per process, login/register answer 503 right away
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+
+    # Authenticated principals (user id, role, profile completion), per-process
+    # LRU optionally backed by Redis; invalidated on role/profile changes
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10_000
+    PRINCIPAL_CACHE_REDIS: bool = True
+
+    # Endpoints over their @query_budget raise instead of logging a warning
+    SQL_QUERY_BUDGET_STRICT: bool = False
+
     # Renders
     RENDER_TEMPLATE_MP4: str = "./data/static/templates/template.mp4"
     RENDER_OUTPUT_DIR: str = "./data/renders"
 
+    # Body photo analysis (OpenCV) runs in a separate process pool
+    PHOTO_PROCESSING_WORKERS: int = 2
+    PHOTO_PROCESSING_MAX_CONCURRENCY: int = 8
+    # Limits checked from the image header before decoding
+    PHOTO_MAX_PIXELS: int = 50_000_000
+    PHOTO_MAX_SIDE: int = 12_000
+    # Face detection runs on a copy no larger than this on its longest side
+    PHOTO_DETECTION_MAX_SIDE: int = 1024
+
     # Do not require a .env file inside the container; rely on env vars.
     # Local dev can still use pydantic-settings to load .env if present.
     model_config = ConfigDict(case_sensitive=True)
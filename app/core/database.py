@@ -1,5 +1,9 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import NullPool
 from app.core.config import settings
 
 engine = create_async_engine(settings.DATABASE_URL, echo=False)
@@ -11,3 +15,17 @@ class Base(DeclarativeBase):
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+@asynccontextmanager
+async def standalone_session() -> AsyncIterator[AsyncSession]:
+    """
+    Session on a throwaway engine, for code run through asyncio.run() outside
+    the API's event loop (RQ jobs, worker threads): pooled connections cannot
+    cross event loops.
+    """
+    standalone_engine = create_async_engine(settings.DATABASE_URL, poolclass=NullPool)
+    try:
+        async with AsyncSession(standalone_engine, expire_on_commit=False) as session:
+            yield session
+    finally:
+        await standalone_engine.dispose()
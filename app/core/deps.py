@@ -1,43 +1,79 @@
 from typing import Annotated
+from uuid import UUID
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from app.core import security, config
 from app.core.database import get_db
-from app.db.models import User, UserRole
+from app.core.principals import Principal, principals
+from app.db.models import UserRole
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{config.settings.API_V1_STR}/auth/login")
 
-async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)],
-    db: Annotated[AsyncSession, Depends(get_db)]
-) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _access_claims(token: str) -> dict:
     try:
         payload = jwt.decode(token, config.settings.JWT_SECRET, algorithms=[config.settings.ALGORITHM])
         user_id: str = payload.get("sub")
         token_type: str = payload.get("type")
         if user_id is None or token_type != "access":
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
-    
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalars().first()
-    if user is None:
-        raise credentials_exception
-    return user
+        raise _credentials_exception()
+    return payload
+
+def _claims_user_id(claims: dict) -> UUID:
+    try:
+        return UUID(claims["sub"])
+    except ValueError:
+        raise _credentials_exception()
+
+async def _cached_principal(db: AsyncSession, claims: dict) -> Principal:
+    principal = await principals.get(db, _claims_user_id(claims))
+    if principal is None:
+        raise _credentials_exception()
+    return principal
+
+async def get_current_principal(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(get_db)]
+) -> Principal:
+    """
+    The authenticated user's id, role and profile completion, from the
+    principal cache: a warm request does no database work for auth. Load
+    the ORM user explicitly in the rare handler that needs it.
+    """
+    return await _cached_principal(db, _access_claims(token))
+
+async def get_token_principal(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(get_db)]
+) -> Principal:
+    """
+    get_current_principal for hot read endpoints (polling, try-on): trusts the
+    role and profile completion signed into the token as long as its version
+    is still the user's current one, which costs a Redis GET and no query.
+    Stale or claim-less tokens, or no Redis, fall back to the principal cache.
+    Admin and write paths keep using get_current_principal.
+    """
+    claims = _access_claims(token)
+    if "ver" in claims:
+        user_id = _claims_user_id(claims)
+        if claims["ver"] == await principals.token_version(user_id):
+            return Principal.from_claims(user_id, claims)
+    return await _cached_principal(db, claims)
 
 async def get_current_active_admin(
-    current_user: Annotated[User, Depends(get_current_user)]
-) -> User:
+    current_user: Annotated[Principal, Depends(get_current_principal)]
+) -> Principal:
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not enough privileges")
     return current_user
@@ -0,0 +1,58 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from fastapi import Response
+
+@dataclass(frozen=True)
+class SerializedBody:
+    """
+    A JSON response body encoded once, with its strong ETag and any extra
+    response headers (e.g. pagination cursors) that belong to it.
+    """
+    body: bytes
+    etag: str
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_bytes(cls, body: bytes, headers: Optional[Dict[str, str]] = None) -> "SerializedBody":
+        headers = headers or {}
+        digest = hashlib.sha256(body)
+        if headers:
+            digest.update(json.dumps(headers, sort_keys=True).encode())
+        return cls(body=body, etag=f'"{digest.hexdigest()[:32]}"', headers=headers)
+
+    def pack(self) -> bytes:
+        """Single bytes value for external caches: headers JSON, newline, body."""
+        return json.dumps(self.headers).encode() + b"\n" + self.body
+
+    @classmethod
+    def unpack(cls, packed: bytes) -> "SerializedBody":
+        headers, body = packed.split(b"\n", 1)
+        return cls.from_bytes(body, json.loads(headers))
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def json_response(
+    serialized: SerializedBody,
+    if_none_match: Optional[str] = None,
+    cache_control: str = "no-cache",
+) -> Response:
+    """
+    Sends pre-encoded JSON as is, or an empty 304 when the client already
+    holds this exact body. `no-cache` lets clients keep the body but
+    revalidate on every use.
+    """
+    headers = {**serialized.headers, "ETag": serialized.etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, serialized.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=serialized.body, media_type="application/json", headers=headers)
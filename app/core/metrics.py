@@ -0,0 +1,197 @@
+"""
+Prometheus metrics, served by the API at /metrics.
+
+API processes record per-route latency, in-flight requests and database
+pool usage; workers record the render pipeline (time spent queued, stage
+durations, output size). With PROMETHEUS_MULTIPROC_DIR set, every process
+of a service writes its samples there, and /metrics aggregates them together
+with the directories listed in METRICS_SCRAPE_DIRS (colon-separated). RQ
+work horses exit after every job; the worker folds each one's counters and
+histograms into its own files once the horse is gone (fold_process), so the
+directory doesn't grow by a set of files per job. docker-compose gives the
+API and the worker one directory each on the data volume, and the container
+entrypoint clears it on start. Without PROMETHEUS_MULTIPROC_DIR, /metrics
+shows the serving process only.
+
+Queue depths are read from Redis at scrape time.
+"""
+import glob
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.mmap_dict import MmapedDict
+from sqlalchemy import event
+
+from app.core.resources import resources
+
+logger = logging.getLogger(__name__)
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+# Other services' multiprocess directories, e.g. the workers' for the API
+SCRAPE_DIRS = [path for path in os.environ.get("METRICS_SCRAPE_DIRS", "").split(":") if path]
+
+QUEUES = ("renders", "media")
+
+# --- API ---
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being served", ["method"], multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_connections_checked_out", "Pooled database connections in use", multiprocess_mode="livesum",
+)
+DB_POOL_OPEN = Gauge(
+    "db_pool_connections_open", "Database connections held by the pool", multiprocess_mode="livesum",
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity", "Pool size plus max overflow, per process", multiprocess_mode="max",
+)
+
+# --- Workers ---
+
+RENDER_QUEUE_WAIT = Histogram(
+    "render_queue_wait_seconds", "Time render jobs spent QUEUED before a worker picked them up",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+RENDER_STAGE_DURATION = Histogram(
+    "render_stage_duration_seconds", "Render job duration by pipeline stage", ["stage"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+RENDER_OUTPUT_BYTES = Histogram(
+    "render_output_bytes", "Size of rendered videos",
+    buckets=tuple(mb * 1024 * 1024 for mb in (1, 2, 5, 10, 20, 50, 100, 200, 500)),
+)
+RENDER_JOBS = Counter("render_jobs_total", "Finished render jobs by outcome", ["status"])
+
+@contextmanager
+def render_stage(stage: str):
+    """Observes the duration of the block as that render pipeline stage."""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        RENDER_STAGE_DURATION.labels(stage=stage).observe(time.perf_counter() - started_at)
+
+# --- Collection ---
+
+class QueueDepthCollector:
+    """RQ queue lengths, read from Redis when scraped."""
+
+    def collect(self):
+        from rq import Queue
+
+        depth = GaugeMetricFamily("rq_queue_depth", "Jobs waiting in each RQ queue", labels=["queue"])
+        try:
+            connection = resources.get("redis")
+            for name in QUEUES:
+                depth.add_metric([name], Queue(name, connection=connection).count)
+        except Exception as e:
+            logger.warning(f"Metrics: cannot read queue depths: {e}")
+            return
+        yield depth
+
+class MultiProcessDirsCollector:
+    """multiprocess.MultiProcessCollector over several directories."""
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    def collect(self):
+        files = [file for path in self.paths for file in glob.glob(os.path.join(path, "*.db"))]
+        return multiprocess.MultiProcessCollector.merge(files, accumulate=True)
+
+_scrape_time_registry = CollectorRegistry()
+_scrape_time_registry.register(QueueDepthCollector())
+
+def latest() -> bytes:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        registry.register(MultiProcessDirsCollector([MULTIPROC_DIR, *SCRAPE_DIRS]))
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(_scrape_time_registry)
+
+def instrument_pool(engine):
+    """Tracks a pool's open and checked-out connections (pass the sync engine)."""
+    pool = engine.pool
+    if hasattr(pool, "size"):
+        DB_POOL_CAPACITY.set(pool.size() + max(getattr(pool, "_max_overflow", 0), 0))
+    event.listen(pool, "connect", lambda *args: DB_POOL_OPEN.inc())
+    event.listen(pool, "close", lambda *args: DB_POOL_OPEN.dec())
+    event.listen(pool, "checkout", lambda *args: DB_POOL_CHECKED_OUT.inc())
+    event.listen(pool, "checkin", lambda *args: DB_POOL_CHECKED_OUT.dec())
+
+def mark_process_dead():
+    """Drops this process's live gauges from the aggregate; call on shutdown."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+def fold_process(pid: int, into: str):
+    """
+    Adds the counters and histograms of an exited process to the `into` files
+    and deletes that process's files; its gauges are dropped, as
+    mark_process_dead would. Only the process writing `into` may call this.
+    """
+    if not MULTIPROC_DIR:
+        return
+    for path in glob.glob(os.path.join(MULTIPROC_DIR, f"*_{pid}.db")):
+        kind = os.path.basename(path).split("_")[0]
+        if kind in ("counter", "histogram", "summary"):
+            folded = MmapedDict(os.path.join(MULTIPROC_DIR, f"{kind}_{into}.db"))
+            try:
+                for key, value, timestamp, _ in MmapedDict.read_all_values_from_file(path):
+                    folded.write_value(key, folded.read_value(key)[0] + value, timestamp)
+            finally:
+                folded.close()
+        os.remove(path)
+
+def _route_template(scope) -> str:
+    # The route template, not the path, keeps the label set bounded. Newer
+    # FastAPI keeps an included router's own route in the scope and records
+    # the prefixed template in its effective route context.
+    effective = scope.get("fastapi", {}).get("effective_route_context")
+    if effective is not None:
+        return effective.path
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+class MetricsMiddleware:
+    """Per-route latency histogram and in-flight gauge for HTTP requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method=method)
+        in_progress.inc()
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            REQUEST_DURATION.labels(
+                method=method, route=_route_template(scope), status=str(status["code"])
+            ).observe(time.perf_counter() - started_at)
@@ -0,0 +1,186 @@
+"""
+Cache of authenticated principals: the few user fields that authorization
+needs (id, email, role, profile completion), keyed by user id.
+
+Every authenticated request resolves its token to a Principal; with the
+cache warm that costs no query. Entries live in an in-process TTL LRU in
+front of Redis. Writes that change a role or a profile's completion call
+`invalidate`, which drops the entry everywhere: locally, in Redis, and on
+other replicas through pub/sub. The TTL bounds staleness if a message is
+lost, and Redis is optional like for the catalog cache.
+
+Access tokens also carry a principal as signed claims, stamped with the
+user's token version: a random nonce kept in Redis, which `invalidate`
+deletes so the next token gets a new one. A nonce never repeats, so tokens
+issued before an invalidation (or before Redis lost the key) are never
+trusted again. Hot read endpoints trust the claims while the version
+matches (deps.get_token_principal), so they authorize with a single Redis GET.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.resources import resources
+from app.db.models import User, UserProfile, UserRole
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "principals:invalidate"
+
+@dataclass(frozen=True)
+class Principal:
+    id: UUID
+    email: str
+    role: UserRole
+    profile_completed: bool
+
+    def pack(self) -> str:
+        return json.dumps({**asdict(self), "id": str(self.id)})
+
+    def claims(self, version: str) -> dict:
+        """Access-token claims (see security.create_access_token)."""
+        return {"email": self.email, "role": self.role.value, "pc": self.profile_completed, "ver": version}
+
+    @classmethod
+    def from_claims(cls, user_id: UUID, claims: dict) -> "Principal":
+        return cls(
+            id=user_id, email=claims["email"], role=UserRole(claims["role"]), profile_completed=bool(claims["pc"])
+        )
+
+    @classmethod
+    def unpack(cls, raw) -> "Principal":
+        data = json.loads(raw)
+        return cls(
+            id=UUID(data["id"]), email=data["email"], role=UserRole(data["role"]),
+            profile_completed=data["profile_completed"],
+        )
+
+class PrincipalCache:
+    def __init__(self):
+        self.local = TTLCache(settings.PRINCIPAL_CACHE_MAX_ENTRIES, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+        # Lets a replica skip the invalidations it published itself
+        self.origin = uuid.uuid4().hex
+
+    def _redis(self):
+        return resources.get("redis_async")
+
+    def _key(self, user_id: UUID) -> str:
+        return f"principal:{user_id}"
+
+    def _version_key(self, user_id: UUID) -> str:
+        return f"principal:{user_id}:version"
+
+    async def token_version(self, user_id: UUID) -> Optional[str]:
+        """The version tokens must carry to be trusted, or None if there is none (or no Redis)."""
+        if not settings.PRINCIPAL_CACHE_REDIS:
+            return None
+        try:
+            version = await self._redis().get(self._version_key(user_id))
+        except Exception as e:
+            logger.warning(f"Principal cache: cannot read token version: {e}")
+            return None
+        return version.decode() if isinstance(version, bytes) else version
+
+    async def issue_token_version(self, user_id: UUID) -> Optional[str]:
+        """
+        The version to stamp on a new token, starting a new one if needed.
+        Call before reading the claims from the database: an invalidation in
+        between then drops the version, and the token is simply not trusted.
+        """
+        if not settings.PRINCIPAL_CACHE_REDIS:
+            return None
+        try:
+            await self._redis().set(self._version_key(user_id), uuid.uuid4().hex, nx=True)
+        except Exception as e:
+            logger.warning(f"Principal cache: cannot start token version: {e}")
+            return None
+        return await self.token_version(user_id)
+
+    async def _load(self, db: AsyncSession, user_id: UUID) -> Optional[Principal]:
+        row = (await db.execute(
+            select(User.id, User.email, User.role, UserProfile.profile_completed)
+            .outerjoin(UserProfile, UserProfile.user_id == User.id)
+            .where(User.id == user_id)
+        )).first()
+        if row is None:
+            return None
+        return Principal(id=row.id, email=row.email, role=row.role, profile_completed=bool(row.profile_completed))
+
+    async def get(self, db: AsyncSession, user_id: UUID) -> Optional[Principal]:
+        """The principal for `user_id`, or None if the user does not exist (not cached)."""
+        principal = self.local.get(user_id)
+        if principal is not None:
+            return principal
+
+        if settings.PRINCIPAL_CACHE_REDIS:
+            try:
+                raw = await self._redis().get(self._key(user_id))
+            except Exception as e:
+                logger.warning(f"Principal cache: Redis read failed: {e}")
+                raw = None
+            if raw is not None:
+                principal = Principal.unpack(raw)
+                self.local.set(user_id, principal)
+                return principal
+
+        principal = await self._load(db, user_id)
+        if principal is None:
+            return None
+        self.local.set(user_id, principal)
+        if settings.PRINCIPAL_CACHE_REDIS:
+            try:
+                await self._redis().set(self._key(user_id), principal.pack(), ex=settings.PRINCIPAL_CACHE_TTL_SECONDS)
+            except Exception as e:
+                logger.warning(f"Principal cache: Redis write failed: {e}")
+        return principal
+
+    async def invalidate(self, user_id: UUID):
+        """
+        Call after committing a change to a user's role or profile completion.
+        Claims in tokens issued before stop being trusted.
+        """
+        self.local.pop(user_id)
+        if not settings.PRINCIPAL_CACHE_REDIS:
+            return
+        try:
+            await self._redis().delete(self._version_key(user_id), self._key(user_id))
+            await self._redis().publish(
+                INVALIDATION_CHANNEL, json.dumps({"user_id": str(user_id), "origin": self.origin})
+            )
+        except Exception as e:
+            logger.warning(f"Principal cache: cannot publish invalidation: {e}")
+
+    async def listen(self):
+        """Drops entries invalidated by other replicas. Runs for the life of the app."""
+        if not settings.PRINCIPAL_CACHE_REDIS:
+            return
+        while True:
+            pubsub = self._redis().pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything could have changed while we were not subscribed
+                self.local.clear()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    if data.get("origin") != self.origin:
+                        self.local.pop(UUID(data["user_id"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Principal invalidation listener failed, retrying: {e}")
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.aclose()
+
+principals = PrincipalCache()
@@ -0,0 +1,117 @@
+"""
+Per-request SQL instrumentation.
+
+Engine event hooks count and time every statement executed on behalf of
+the current request (tracked through a context variable, so concurrent
+requests never mix). QueryStatsMiddleware reports the totals in a
+`Server-Timing` header and logs statements repeated within one request,
+the usual sign of an N+1 or of a duplicate query.
+
+Endpoints declare how many statements they may run with `@query_budget(n)`.
+Over budget is a warning, or a QueryBudgetExceeded error when
+SQL_QUERY_BUDGET_STRICT is set (the test suite does), so regressions fail
+tests instead of reaching production.
+"""
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration_ms: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+
+    def repeated(self) -> dict:
+        return {statement: n for statement, n in self.statements.items() if n > 1}
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+def current() -> Optional[QueryStats]:
+    return _current.get()
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    started_at = conn.info["query_started_at"].pop()
+    stats.count += 1
+    stats.duration_ms += (time.perf_counter() - started_at) * 1000
+    stats.statements[statement] += 1
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    if _current.get() is not None and context.connection is not None:
+        started = context.connection.info.get("query_started_at")
+        if started:
+            started.pop()
+
+def query_budget(max_queries: int) -> Callable:
+    """Declares the most SQL statements an endpoint may run per request."""
+    def decorate(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorate
+
+def _check(scope, stats: QueryStats):
+    endpoint = scope.get("endpoint")
+    name = getattr(endpoint, "__name__", scope.get("path"))
+    repeated = stats.repeated()
+    if repeated:
+        logger.warning(f"{name}: statements repeated within one request: {repeated}")
+    budget = getattr(endpoint, "query_budget", None)
+    if budget is not None and stats.count > budget:
+        message = f"{name} ran {stats.count} SQL statements, its budget is {budget}"
+        if settings.SQL_QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+class QueryStatsMiddleware:
+    """
+    Adds `Server-Timing: db;dur=<ms>;desc="<n> queries", app;dur=<ms>` to
+    every HTTP response and enforces declared query budgets.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = _current.set(stats)
+        started_at = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                _check(scope, stats)
+                app_ms = (time.perf_counter() - started_at) * 1000
+                timing = f'db;dur={stats.duration_ms:.1f};desc="{stats.count} queries", app;dur={app_ms:.1f}'
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
@@ -0,0 +1,74 @@
+"""
+Registry of heavy process-wide resources (Redis connections, RQ queues, the
+OpenCV face cascade, ...).
+
+Nothing is created at import time: modules register a factory, the resource
+is built on first `get` and reused by the process afterwards. `close` runs
+from the FastAPI lifespan on shutdown, so importing the app, collecting tests
+or starting a replica never pays for resources a request has not asked for.
+"""
+import inspect
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class ResourceRegistry:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._closers: Dict[str, Optional[Callable[[Any], None]]] = {}
+        self._instances: Dict[str, Any] = {}
+
+    def register(self, name: str, factory: Callable[[], Any], close: Optional[Callable[[Any], None]] = None):
+        with self._lock:
+            self._factories[name] = factory
+            self._closers[name] = close
+
+    def get(self, name: str) -> Any:
+        # Fast path without the lock once the resource exists
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Unknown resource: {name}")
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    async def close(self):
+        """Closes every created resource, newest first. Closers may be async."""
+        with self._lock:
+            created = [(name, self._instances.pop(name)) for name in reversed(list(self._instances))]
+        for name, instance in created:
+            closer = self._closers.get(name)
+            if closer is None:
+                continue
+            try:
+                result = closer(instance)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception(f"Failed to close resource {name}")
+
+resources = ResourceRegistry()
+
+def _redis():
+    from redis import Redis
+    return Redis.from_url(settings.REDIS_URL)
+
+def _redis_async():
+    from redis.asyncio import Redis
+    return Redis.from_url(settings.REDIS_URL)
+
+resources.register("redis", _redis, close=lambda conn: conn.close())
+# For code running on the event loop (caches, pub/sub listeners)
+resources.register("redis_async", _redis_async, close=lambda conn: conn.aclose())
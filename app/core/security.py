@@ -1,18 +1,51 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Optional, Tuple, Union
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.resources import resources
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes made with other rounds are replaced on the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
-def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
+class PasswordHashingBusy(Exception):
+    """Too many password hashes queued on this process; the caller should retry later."""
+
+def _password_hasher() -> ThreadPoolExecutor:
+    # bcrypt releases the GIL, so threads hash in parallel off the event loop
+    return ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+resources.register("password_hasher", _password_hasher, close=lambda pool: pool.shutdown(wait=False, cancel_futures=True))
+
+# Hashes running or queued on the executor; only touched from the event loop
+_pending = 0
+
+async def _run_hasher(fn, *args):
+    global _pending
+    if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise PasswordHashingBusy()
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(resources.get("password_hasher"), fn, *args)
+    finally:
+        _pending -= 1
+
+def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None, claims: Optional[dict] = None) -> str:
+    """`claims` (Principal.claims) let hot endpoints authorize from the token alone."""
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode = {"exp": expire, "sub": str(subject), "type": "access"}
+    to_encode = {**(claims or {}), "exp": expire, "sub": str(subject), "type": "access"}
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -27,3 +60,17 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+async def hash_password(password: str) -> str:
+    """
+    get_password_hash for request handlers: runs on the bounded hashing
+    executor and raises PasswordHashingBusy instead of queueing without limit.
+    """
+    return await _run_hasher(pwd_context.hash, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    verify_password for request handlers, on the hashing executor. Also returns
+    a new hash when the stored one uses outdated parameters (save it), else None.
+    """
+    return await _run_hasher(pwd_context.verify_and_update, plain_password, hashed_password)
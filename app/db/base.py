@@ -1,2 +1,2 @@
 from app.db.models import Base
-from app.db.models import User, UserProfile, Product, ProductImage, ProductVariant, GarmentAsset, MannequinAsset
+from app.db.models import User, UserProfile, Product, ProductImage, ProductVariant, GarmentAsset, MannequinAsset, MannequinRendition, RenderJob, StoredBlob, PhotoAnalysis
@@ -2,11 +2,26 @@ import uuid
 from datetime import datetime
 from enum import Enum as PyEnum
 from typing import Optional, List
-from sqlalchemy import String, Boolean, DateTime, ForeignKey, Integer, Float, Enum, UniqueConstraint
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Boolean, DateTime, ForeignKey, Integer, BigInteger, Float, Enum, UniqueConstraint, Index, Computed, Sequence, DDL, text
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy import event
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
 from app.core.database import Base
 
+# One sequence shared by products, variants and garment assets gives the
+# catalog change feed a single total order. Every insert and update takes a
+# new value; catalog writers hold CATALOG_WRITE_LOCK (see lock_catalog_writes) so
+# values become visible in commit order.
+catalog_change_seq = Sequence("catalog_change_seq", metadata=Base.metadata)
+
+def change_seq_column() -> Mapped[int]:
+    return mapped_column(
+        BigInteger,
+        server_default=catalog_change_seq.next_value(),
+        onupdate=catalog_change_seq.next_value(),
+        index=True,
+    )
+
 class UserRole(str, PyEnum):
     ADMIN = "ADMIN"
     CUSTOMER = "CUSTOMER"
@@ -31,6 +46,18 @@ class AssetType(str, PyEnum):
 class BodyType(str, PyEnum):
     DEFAULT = "DEFAULT"
 
+class PhotoStatus(str, PyEnum):
+    NONE = "NONE"
+    PROCESSING = "PROCESSING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+class VideoStatus(str, PyEnum):
+    NONE = "NONE"
+    PROCESSING = "PROCESSING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
 class User(Base):
     __tablename__ = "users"
 
@@ -60,6 +87,7 @@ class UserProfile(Base):
     body_photo_url: Mapped[Optional[str]] = mapped_column(String)
     face_crop_url: Mapped[Optional[str]] = mapped_column(String)
     skin_tone_hex: Mapped[Optional[str]] = mapped_column(String)
+    photo_status: Mapped[PhotoStatus] = mapped_column(Enum(PhotoStatus), default=PhotoStatus.NONE)
     
     profile_completed: Mapped[bool] = mapped_column(Boolean, default=False)
     
@@ -70,8 +98,21 @@ class UserProfile(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Keyset pagination of the public listing walks (name, id)
+        Index("ix_products_active_name_id", "name", "id", postgresql_where=text("is_active")),
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+        # Must match SEARCH_DOCUMENT in app/modules/catalog/service.py exactly
+        Index(
+            "ix_products_search_trgm",
+            text("(coalesce(name, '') || ' ' || coalesce(brand, '')) gin_trgm_ops"),
+            postgresql_using="gin",
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Merchant's own product key; bulk imports upsert on it
+    external_id: Mapped[Optional[str]] = mapped_column(String, unique=True)
     name: Mapped[str] = mapped_column(String, index=True)
     description: Mapped[Optional[str]] = mapped_column(String)
     brand: Mapped[Optional[str]] = mapped_column(String)
@@ -81,11 +122,27 @@ class Product(Base):
     
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq: Mapped[int] = change_seq_column()
+
+    # Full-text document maintained by Postgres: name > brand > description
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(brand, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'C')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
 
     variants: Mapped[List["ProductVariant"]] = relationship("ProductVariant", back_populates="product", cascade="all, delete-orphan")
     images: Mapped[List["ProductImage"]] = relationship("ProductImage", back_populates="product", cascade="all, delete-orphan")
     garment_assets: Mapped[List["GarmentAsset"]] = relationship("GarmentAsset", back_populates="product", cascade="all, delete-orphan")
 
+# The trigram index (and fuzzy search) need pg_trgm; migrations create it too
+event.listen(Product.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
 class ProductImage(Base):
     __tablename__ = "product_images"
     
@@ -98,12 +155,14 @@ class ProductImage(Base):
 
 class ProductVariant(Base):
     __tablename__ = "product_variants"
+    __table_args__ = (UniqueConstraint('product_id', 'size', name='_product_size_uc'),)
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    product_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("products.id"))
+    product_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("products.id"), index=True)
     size: Mapped[SizeEnum] = mapped_column(Enum(SizeEnum))
     sku: Mapped[Optional[str]] = mapped_column(String)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    change_seq: Mapped[int] = change_seq_column()
 
     product: Mapped["Product"] = relationship("Product", back_populates="variants")
 
@@ -116,6 +175,7 @@ class GarmentAsset(Base):
     asset_type: Mapped[AssetType] = mapped_column(Enum(AssetType))
     url: Mapped[str] = mapped_column(String)
     note: Mapped[Optional[str]] = mapped_column(String)
+    change_seq: Mapped[int] = change_seq_column()
 
     product: Mapped["Product"] = relationship("Product", back_populates="garment_assets")
 
@@ -130,6 +190,32 @@ class MannequinAsset(Base):
     duration_ms: Mapped[Optional[int]] = mapped_column(Integer)
     rotation_degrees: Mapped[int] = mapped_column(Integer, default=180)
 
+    # Filled by the ingestion job (app.worker.video) from the source video
+    video_status: Mapped[VideoStatus] = mapped_column(Enum(VideoStatus), default=VideoStatus.NONE)
+    fps: Mapped[Optional[float]] = mapped_column(Float)
+    width: Mapped[Optional[int]] = mapped_column(Integer)
+    height: Mapped[Optional[int]] = mapped_column(Integer)
+    poster_url: Mapped[Optional[str]] = mapped_column(String)
+
+    renditions: Mapped[List["MannequinRendition"]] = relationship(
+        "MannequinRendition", back_populates="mannequin", cascade="all, delete-orphan",
+        order_by="MannequinRendition.height.desc()"
+    )
+
+class MannequinRendition(Base):
+    """A downscaled copy of a mannequin video, for smaller viewports and slower links."""
+    __tablename__ = "mannequin_renditions"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    mannequin_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("mannequin_assets.id", ondelete="CASCADE"), index=True)
+    name: Mapped[str] = mapped_column(String)
+    width: Mapped[int] = mapped_column(Integer)
+    height: Mapped[int] = mapped_column(Integer)
+    bitrate_kbps: Mapped[int] = mapped_column(Integer)
+    url: Mapped[str] = mapped_column(String)
+
+    mannequin: Mapped["MannequinAsset"] = relationship("MannequinAsset", back_populates="renditions")
+
 class RenderJobStatus(str, PyEnum):
     QUEUED = "QUEUED"
     RUNNING = "RUNNING"
@@ -153,3 +239,44 @@ class RenderJob(Base):
 
     user: Mapped["User"] = relationship("User")
     product: Mapped["Product"] = relationship("Product")
+
+class StoredBlob(Base):
+    """
+    Content-addressed upload. Identical bytes are stored once; ref_count tracks
+    how many rows (profiles, garment assets, mannequins...) point at the URL.
+    """
+    __tablename__ = "stored_blobs"
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    url: Mapped[str] = mapped_column(String, unique=True)
+    size: Mapped[int] = mapped_column(BigInteger)
+    ref_count: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class PhotoAnalysis(Base):
+    """Face crop + skin tone memoized by the sha256 of the analyzed photo."""
+    __tablename__ = "photo_analyses"
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    face_crop_url: Mapped[Optional[str]] = mapped_column(String)
+    skin_tone_hex: Mapped[Optional[str]] = mapped_column(String)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+CATALOG_TABLES = (Product, ProductVariant, GarmentAsset)
+# Arbitrary key for pg_advisory_xact_lock
+CATALOG_WRITE_LOCK = 0x636174616C6F67
+
+def lock_catalog_writes(session: Session):
+    """
+    Serializes catalog writers until the end of the transaction. Taken before
+    change_seq values are drawn, so a reader that sees value N can never miss
+    a smaller value committed later. Call it before bulk Core statements; ORM
+    flushes take it automatically.
+    """
+    session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CATALOG_WRITE_LOCK})
+
+@event.listens_for(Session, "before_flush")
+def _lock_catalog_before_flush(session, flush_context, instances):
+    if any(isinstance(obj, CATALOG_TABLES) for obj in (*session.new, *session.dirty, *session.deleted)):
+        lock_catalog_writes(session)
@@ -1,17 +1,57 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import FastAPI, Response
 from fastapi.staticfiles import StaticFiles
-from app.core import config
+from app.core import config, metrics
+from app.core.database import engine
+from app.core.principals import principals
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.resources import resources
 from app.modules.auth import router as auth_router
 from app.modules.users import router as users_router
 from app.modules.catalog import router as catalog_router
 from app.modules.try_on import router as try_router
 from app.modules.renders import router as renders_router
+from app.modules.sizing import router as sizing_router
+from app.modules.media import router as media_router
+from app.modules.uploads import router as uploads_router
+from app.modules.users import service as users_service
+from app.modules.catalog.service import catalog_cache
+from app.modules.catalog.mannequins import mannequins
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy resources (Redis, RQ, OpenCV, the photo pool) are created lazily on
+    # first use; startup stays cheap and shutdown releases whatever was built
+    # Each listener loads its data once subscribed, then follows invalidations
+    listeners = [
+        asyncio.create_task(catalog_cache.listen()),
+        asyncio.create_task(mannequins.listen()),
+        asyncio.create_task(principals.listen()),
+    ]
+    yield
+    for listener in listeners:
+        listener.cancel()
+    for listener in listeners:
+        with suppress(asyncio.CancelledError):
+            await listener
+    users_service.shutdown()
+    await resources.close()
+    metrics.mark_process_dead()
 
 app = FastAPI(
     title=config.settings.PROJECT_NAME,
+    lifespan=lifespan,
     openapi_url=f"{config.settings.API_V1_STR}/openapi.json"
 )
 
+# Per-request SQL counts and timings (Server-Timing header, query budgets)
+app.add_middleware(QueryStatsMiddleware)
+# Outermost, so latencies cover every other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_pool(engine.sync_engine)
+
 # Mount Static
 app.mount("/static", StaticFiles(directory=config.settings.STATIC_DIR), name="static")
 
@@ -22,6 +62,14 @@ app.include_router(catalog_router.router, prefix=f"{config.settings.API_V1_STR}/
 app.include_router(catalog_router.admin_router, prefix=f"{config.settings.API_V1_STR}/admin", tags=["Admin"])
 app.include_router(try_router.router, prefix=f"{config.settings.API_V1_STR}/try", tags=["Try"])
 app.include_router(renders_router.router, prefix=f"{config.settings.API_V1_STR}/renders", tags=["Renders"])
+app.include_router(sizing_router.router, prefix=f"{config.settings.API_V1_STR}/sizing", tags=["Sizing"])
+app.include_router(media_router.router, prefix=f"{config.settings.API_V1_STR}/media", tags=["Media"])
+app.include_router(uploads_router.router, prefix=f"{config.settings.API_V1_STR}/uploads", tags=["Uploads"])
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus scrape endpoint (API, database pool, queues and workers)."""
+    return Response(metrics.latest(), media_type=metrics.CONTENT_TYPE_LATEST)
 
 @app.get("/")
 def root():
@@ -2,21 +2,50 @@ from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from jose import jwt, JWTError
 
 from app.core import security, config, deps
 from app.core.database import get_db
+from app.core.principals import Principal, principals
+from app.core.query_stats import query_budget
 from app.db.models import User, UserRole, UserProfile
 from app.modules.auth import schemas
 
 router = APIRouter()
 
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-ins in progress, retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+async def _access_token(db: AsyncSession, user: User) -> str:
+    """An access token carrying the user's principal as claims, when it has a token version."""
+    version = await principals.issue_token_version(user.id)
+    claims = None
+    if version is not None:
+        # From the database, never the principal cache: a replica that missed
+        # an invalidation would sign stale claims with the current version
+        profile_completed = await db.scalar(
+            select(UserProfile.profile_completed).where(UserProfile.user_id == user.id)
+        )
+        principal = Principal(id=user.id, email=user.email, role=user.role, profile_completed=bool(profile_completed))
+        claims = principal.claims(version)
+    return security.create_access_token(subject=user.id, claims=claims)
+
 @router.post("/register", response_model=schemas.UserResponse)
 async def register(
     user_in: schemas.UserCreate,
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
+    # Hashed before touching the database, so no pooled connection waits on bcrypt
+    try:
+        password_hash = await security.hash_password(user_in.password)
+    except security.PasswordHashingBusy:
+        raise _hashing_busy()
+
     # Check if user exists
     result = await db.execute(select(User).where(User.email == user_in.email))
     if result.scalars().first():
@@ -28,7 +57,7 @@ async def register(
     # Create user
     user = User(
         email=user_in.email,
-        password_hash=security.get_password_hash(user_in.password),
+        password_hash=password_hash,
         role=UserRole.CUSTOMER
     )
     db.add(user)
@@ -49,15 +78,27 @@ async def login(
 ):
     result = await db.execute(select(User).where(User.email == form_data.username))
     user = result.scalars().first()
+    # Give the connection back to the pool while bcrypt runs
+    await db.close()
 
-    if not user or not security.verify_password(form_data.password, user.password_hash):
+    verified, new_hash = False, None
+    if user:
+        try:
+            verified, new_hash = await security.verify_and_update_password(form_data.password, user.password_hash)
+        except security.PasswordHashingBusy:
+            raise _hashing_busy()
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # The hash predates the current BCRYPT_ROUNDS; upgrade it transparently
+        await db.execute(update(User).where(User.id == user.id).values(password_hash=new_hash))
+        await db.commit()
     
-    access_token = security.create_access_token(subject=user.id)
+    access_token = await _access_token(db, user)
     refresh_token = security.create_refresh_token(subject=user.id)
     
     return {
@@ -90,7 +131,7 @@ async def refresh_token(
     if user is None:
         raise credentials_exception
 
-    access_token = security.create_access_token(subject=user.id)
+    access_token = await _access_token(db, user)
     new_refresh = security.create_refresh_token(subject=user.id)
 
     return {
@@ -100,7 +141,8 @@ async def refresh_token(
     }
 
 @router.get("/me", response_model=schemas.UserResponse)
+@query_budget(1)
 async def read_users_me(
-    current_user: Annotated[User, Depends(deps.get_current_user)]
+    current_user: Annotated[Principal, Depends(deps.get_current_principal)]
 ):
     return current_user
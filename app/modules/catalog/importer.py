@@ -0,0 +1,253 @@
+"""
+Bulk catalog import from CSV or JSONL (see schemas.ImportRow for the columns).
+
+The file is parsed incrementally in a worker thread and written in batches:
+one INSERT ... ON CONFLICT statement per table and batch, each batch in its
+own transaction. Rows that fail validation are reported and skipped; if a
+batch fails in the database it is retried row by row so only the offending
+rows are lost. Re-importing the same file is a no-op: upserts only touch
+rows whose values changed, so the change feed stays quiet too.
+"""
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+from uuid import UUID
+
+from pydantic import ValidationError
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.db.models import (
+    AssetType, GarmentAsset, Product, ProductVariant, catalog_change_seq, lock_catalog_writes,
+)
+from app.modules.catalog import schemas
+from app.modules.catalog.service import catalog_cache
+from app.modules.sizing.service import size_charts
+from app.storage import blobs
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "jsonl")
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+PRODUCT_FIELDS = ("name", "description", "brand", "category", "fit_type", "is_active")
+OVERLAY_FIELDS = (("overlay_front_url", AssetType.OVERLAY_FRONT), ("overlay_back_url", AssetType.OVERLAY_BACK))
+
+Record = Tuple[int, Union[dict, str]]
+
+class InvalidImportFile(ValueError):
+    pass
+
+def format_for_filename(filename: Optional[str]) -> Optional[str]:
+    suffix = (filename or "").rsplit(".", 1)[-1].lower()
+    return {"csv": "csv", "jsonl": "jsonl", "ndjson": "jsonl"}.get(suffix)
+
+def iter_records(stream: BinaryIO, fmt: str) -> Iterator[Record]:
+    """
+    (line number, record) pairs read lazily from a binary stream. Lines that
+    cannot be decoded yield an error message instead of a dict.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            for record in reader:
+                # Empty cells mean "not set"; extra cells land under the None key
+                yield reader.line_num, {k: v for k, v in record.items() if k is not None and v not in ("", None)}
+        else:
+            for line_no, line in enumerate(text, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_no, f"Invalid JSON: {e.msg}"
+    finally:
+        # Leave the caller's stream open
+        text.detach()
+
+def iter_batches(stream: BinaryIO, fmt: str, batch_size: int) -> Iterator[List[Record]]:
+    batch = []
+    for record in iter_records(stream, fmt):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _format_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, err['loc']))}: {err['msg']}" if err["loc"] else err["msg"]
+        for err in e.errors()
+    )
+
+def _changed(table, excluded, fields) -> list:
+    return [getattr(table, field).is_distinct_from(getattr(excluded, field)) for field in fields]
+
+async def _upsert_products(db: AsyncSession, rows: List[schemas.ImportRow]) -> Tuple[Dict[str, UUID], int]:
+    """Returns external_id -> product id for every row, and how many rows were written."""
+    values = {}
+    for row in rows:
+        values[row.external_id] = {"external_id": row.external_id, **row.model_dump(include=set(PRODUCT_FIELDS))}
+    now = datetime.utcnow()
+    stmt = insert(Product)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Product.external_id],
+        set_={
+            **{field: getattr(stmt.excluded, field) for field in PRODUCT_FIELDS},
+            "updated_at": now,
+            "change_seq": catalog_change_seq.next_value(),
+        },
+        where=or_(*_changed(Product, stmt.excluded, PRODUCT_FIELDS)),
+    ).returning(Product.external_id, Product.id)
+    ids = dict((await db.execute(stmt, [{**v, "created_at": now, "updated_at": now} for v in values.values()])).all())
+    written = len(ids)
+    # Unchanged products are not returned by the upsert
+    missing = [external_id for external_id in values if external_id not in ids]
+    if missing:
+        ids.update((await db.execute(
+            select(Product.external_id, Product.id).where(Product.external_id.in_(missing))
+        )).all())
+    return ids, written
+
+async def _upsert_variants(db: AsyncSession, rows: List[schemas.ImportRow], ids: Dict[str, UUID]) -> int:
+    values = {}
+    for row in rows:
+        if row.size is not None:
+            values[(ids[row.external_id], row.size)] = {
+                "product_id": ids[row.external_id], "size": row.size, "sku": row.sku, "is_active": True
+            }
+    if not values:
+        return 0
+    stmt = insert(ProductVariant)
+    sku = func.coalesce(stmt.excluded.sku, ProductVariant.sku)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ProductVariant.product_id, ProductVariant.size],
+        set_={"sku": sku, "is_active": True, "change_seq": catalog_change_seq.next_value()},
+        where=or_(ProductVariant.sku.is_distinct_from(sku), ProductVariant.is_active == False),
+    ).returning(ProductVariant.id)
+    return len((await db.execute(stmt, list(values.values()))).all())
+
+async def _upsert_assets(db: AsyncSession, rows: List[schemas.ImportRow], ids: Dict[str, UUID]) -> int:
+    values = {}
+    for row in rows:
+        for field, asset_type in OVERLAY_FIELDS:
+            url = getattr(row, field)
+            if url:
+                key = (ids[row.external_id], row.size, asset_type)
+                values[key] = {"product_id": key[0], "size": key[1], "asset_type": asset_type, "url": url}
+    if not values:
+        return 0
+    # Imported URLs may point at stored blobs; keep their reference counts right
+    previous = {
+        (product_id, size, asset_type): url
+        for product_id, size, asset_type, url in await db.execute(
+            select(GarmentAsset.product_id, GarmentAsset.size, GarmentAsset.asset_type, GarmentAsset.url)
+            .where(GarmentAsset.product_id.in_({key[0] for key in values}))
+        )
+    }
+    stmt = insert(GarmentAsset)
+    stmt = stmt.on_conflict_do_update(
+        constraint="_product_size_asset_uc",
+        set_={"url": stmt.excluded.url, "change_seq": catalog_change_seq.next_value()},
+        where=GarmentAsset.url != stmt.excluded.url,
+    ).returning(GarmentAsset.id)
+    written = len((await db.execute(stmt, list(values.values()))).all())
+    for key, value in values.items():
+        if previous.get(key) != value["url"]:
+            await blobs.release(db, previous.get(key))
+            await blobs.retain(db, value["url"])
+    return written
+
+async def _write(db: AsyncSession, rows: List[schemas.ImportRow], report: schemas.ImportReport):
+    await db.run_sync(lock_catalog_writes)
+    ids, products = await _upsert_products(db, rows)
+    variants = await _upsert_variants(db, rows, ids)
+    assets = await _upsert_assets(db, rows, ids)
+    await db.commit()
+    report.products += products
+    report.variants += variants
+    report.garment_assets += assets
+    report.imported += len(rows)
+
+def _write_error(e: Exception) -> str:
+    return str(e.orig) if isinstance(e, DBAPIError) else str(e)
+
+def _add_error(report: schemas.ImportReport, line: int, error: str, external_id: Optional[str] = None):
+    if len(report.errors) < MAX_REPORTED_ERRORS:
+        report.errors.append(schemas.ImportRowError(line=line, external_id=external_id, error=error))
+    else:
+        report.errors_truncated = True
+
+async def _import_batch(db: AsyncSession, batch: List[Record], report: schemas.ImportReport):
+    valid: List[Tuple[int, schemas.ImportRow]] = []
+    for line, record in batch:
+        report.rows += 1
+        if isinstance(record, str):
+            _add_error(report, line, record)
+            continue
+        try:
+            valid.append((line, schemas.ImportRow.model_validate(record)))
+        except ValidationError as e:
+            external_id = record.get("external_id") if isinstance(record, dict) else None
+            _add_error(report, line, _format_error(e), external_id)
+    if not valid:
+        return
+    try:
+        await _write(db, [row for _, row in valid], report)
+        return
+    except (DBAPIError, blobs.BlobNotFound) as e:
+        await db.rollback()
+        logger.warning(f"Catalog import: batch failed ({_write_error(e)}), retrying row by row")
+    for line, row in valid:
+        try:
+            await _write(db, [row], report)
+        except (DBAPIError, blobs.BlobNotFound) as e:
+            await db.rollback()
+            _add_error(report, line, _write_error(e), row.external_id)
+
+async def import_catalog(
+    db: AsyncSession, stream: BinaryIO, fmt: str, batch_size: int = BATCH_SIZE
+) -> schemas.ImportReport:
+    """
+    Imports a CSV/JSONL stream and returns the per-row report. Each batch is
+    committed as it goes, so an interrupted import can simply be re-run.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported import format: {fmt}")
+    report = schemas.ImportReport()
+    batches = iter_batches(stream, fmt, batch_size)
+    try:
+        # Parsing blocks, so each batch is read off the event loop
+        while (batch := await run_in_threadpool(next, batches, None)) is not None:
+            await _import_batch(db, batch, report)
+            logger.info(f"Catalog import: {report.rows} rows read, {len(report.errors)} errors")
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Batches before the bad spot are committed; re-running is safe
+        await _after_import(db, report)
+        raise InvalidImportFile(f"Unreadable {fmt} after row {report.rows}: {e}") from e
+    except BaseException:
+        # The session may be unusable (failed transaction); the committed
+        # batches still have to reach the caches
+        await db.rollback()
+        await _after_import(db, report)
+        raise
+    finally:
+        batches.close()
+    await _after_import(db, report)
+    return report
+
+async def _after_import(db: AsyncSession, report: schemas.ImportReport):
+    """Refreshes what caches the catalog, once batches were committed."""
+    if report.imported:
+        if size_charts.loaded:
+            await size_charts.load(db)
+        await catalog_cache.invalidate(reload_size_charts=True)
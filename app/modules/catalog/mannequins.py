@@ -0,0 +1,170 @@
+"""
+In-memory registry of mannequin assets, shared by the API and the workers.
+
+There is at most one MannequinAsset per BodyType, read by every try-on and
+render, so each process keeps all of them in memory instead of querying per
+request. `upload_mannequin_video` calls `invalidate` after committing, which
+reloads the local copy and publishes on Redis; API processes reload when
+the message arrives.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.database import AsyncSessionLocal, standalone_session
+from app.core.resources import resources
+from app.db.models import BodyType, MannequinAsset
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "mannequins:invalidate"
+DEFAULT_ROTATION_DEGREES = 180
+
+@dataclass(frozen=True)
+class Rendition:
+    name: str
+    width: int
+    height: int
+    bitrate_kbps: int
+    url: str
+
+@dataclass(frozen=True)
+class Mannequin:
+    body_type: BodyType
+    video_url: str
+    duration_ms: Optional[int] = None
+    rotation_degrees: int = DEFAULT_ROTATION_DEGREES
+    fps: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    poster_url: Optional[str] = None
+    # Largest first
+    renditions: Tuple[Rendition, ...] = ()
+
+    @classmethod
+    def from_row(cls, row: MannequinAsset) -> "Mannequin":
+        return cls(
+            body_type=row.body_type,
+            video_url=row.video_url,
+            duration_ms=row.duration_ms,
+            rotation_degrees=row.rotation_degrees if row.rotation_degrees is not None else DEFAULT_ROTATION_DEGREES,
+            fps=row.fps,
+            width=row.width,
+            height=row.height,
+            poster_url=row.poster_url,
+            renditions=tuple(
+                Rendition(r.name, r.width, r.height, r.bitrate_kbps, r.url)
+                for r in sorted(row.renditions, key=lambda r: r.height, reverse=True)
+            ),
+        )
+
+    def url_for_width(self, viewport_width: Optional[int]) -> str:
+        """The smallest rendition at least as wide as the viewport, else the source video."""
+        if not viewport_width:
+            return self.video_url
+        fitting = [r for r in self.renditions if r.width >= viewport_width]
+        return fitting[-1].url if fitting else self.video_url
+
+class MannequinRegistry:
+    def __init__(self):
+        self._assets: Dict[BodyType, Mannequin] = {}
+        self.loaded = False
+        # Lets a process skip the invalidations it published itself
+        self.origin = uuid.uuid4().hex
+
+    def _replace(self, assets: Iterable[Mannequin]):
+        # Swapped in one assignment; readers never see a half-built dict
+        self._assets = {asset.body_type: asset for asset in assets}
+        self.loaded = True
+
+    async def load(self, db: AsyncSession):
+        rows = await db.scalars(select(MannequinAsset).options(selectinload(MannequinAsset.renditions)))
+        self._replace(Mannequin.from_row(row) for row in rows)
+
+    async def ensure_loaded(self, db: AsyncSession):
+        if not self.loaded:
+            await self.load(db)
+
+    def load_blocking(self):
+        """
+        load for processes without an event loop. RQ jobs that read the
+        registry call it themselves: work horses are forked per job, so a
+        copy kept fresh in the worker parent would need a thread there.
+        """
+        async def run():
+            async with standalone_session() as db:
+                await self.load(db)
+        asyncio.run(run())
+
+    def get(self, body_type: BodyType = BodyType.DEFAULT) -> Optional[Mannequin]:
+        return self._assets.get(body_type)
+
+    def video_url(self, body_type: BodyType = BodyType.DEFAULT) -> Optional[str]:
+        asset = self.get(body_type)
+        return asset.video_url if asset else None
+
+    def duration_ms(self, body_type: BodyType = BodyType.DEFAULT) -> Optional[int]:
+        asset = self.get(body_type)
+        return asset.duration_ms if asset else None
+
+    def rotation_degrees(self, body_type: BodyType = BodyType.DEFAULT) -> int:
+        asset = self.get(body_type)
+        return asset.rotation_degrees if asset else DEFAULT_ROTATION_DEGREES
+
+    async def invalidate(self, db: AsyncSession):
+        """Call after committing a change to mannequin assets."""
+        await self.load(db)
+        try:
+            await resources.get("redis_async").publish(INVALIDATION_CHANNEL, json.dumps({"origin": self.origin}))
+        except Exception as e:
+            logger.warning(f"Mannequin registry: cannot publish invalidation: {e}")
+
+    def publish_blocking(self):
+        """invalidate for workers that changed mannequin rows themselves."""
+        try:
+            resources.get("redis").publish(INVALIDATION_CHANNEL, json.dumps({"origin": self.origin}))
+        except Exception as e:
+            logger.warning(f"Mannequin registry: cannot publish invalidation: {e}")
+
+    async def listen(self):
+        """Reloads on invalidations from other processes. Runs for the life of the API."""
+        while True:
+            pubsub = resources.get("redis_async").pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Catch up on anything published while we were not subscribed
+                async with AsyncSessionLocal() as db:
+                    await self.load(db)
+                async for message in pubsub.listen():
+                    if message["type"] == "message" and json.loads(message["data"]).get("origin") != self.origin:
+                        async with AsyncSessionLocal() as db:
+                            await self.load(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Mannequin registry listener failed, retrying: {e}")
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.aclose()
+
+mannequins = MannequinRegistry()
+
+def _media_queue():
+    from rq import Queue
+    return Queue("media", connection=resources.get("redis"))
+
+# Created on the first enqueue, not when the API imports this module
+resources.register("media_queue", _media_queue)
+
+def enqueue_ingest(asset: MannequinAsset):
+    """Queues probing and renditions (app.worker.ingest) for the asset's current video."""
+    resources.get("media_queue").enqueue(
+        "app.worker.ingest.ingest_mannequin_video", str(asset.id), asset.video_url, job_timeout=30 * 60
+    )
@@ -1,67 +1,151 @@
+import logging
 from typing import Annotated, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, Header, HTTPException, Query, UploadFile, File
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import selectinload
 from uuid import UUID
 
 from app.core import deps
 from app.core.database import get_db
-from app.db.models import Product, ProductVariant, User, MannequinAsset, GarmentAsset, BodyType
-from app.modules.catalog import schemas
-from app.storage import local
+from app.core.http import SerializedBody, json_response
+from app.core.principals import Principal
+from app.core.query_stats import query_budget
+from app.db.models import (
+    Product, ProductVariant, MannequinAsset, MannequinRendition, GarmentAsset, AssetType, BodyType, SizeEnum,
+    VideoStatus, lock_catalog_writes,
+)
+from app.modules.catalog import importer, schemas, service
+from app.modules.catalog.mannequins import enqueue_ingest, mannequins
+from app.modules.catalog.service import catalog_cache
+from app.modules.sizing.service import size_charts
+from app.storage import blobs, derivatives, local, resumable
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 admin_router = APIRouter() # Mounted at /admin
 
+async def _store_media(db: AsyncSession, user: Principal, file: Optional[UploadFile], upload_id: Optional[UUID]) -> Optional[str]:
+    """Blob URL of an uploaded file or of a completed resumable upload (/uploads)."""
+    try:
+        if upload_id is not None:
+            return (await resumable.claim(db, upload_id, user.id)).url
+        if file is not None:
+            return (await blobs.store_upload(db, file)).url
+    except local.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except resumable.UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except resumable.UploadIncomplete as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return None
+
+product_list_adapter = TypeAdapter(List[schemas.ProductResponse])
+variant_list_adapter = TypeAdapter(List[schemas.VariantResponse])
+
 # --- PUBLIC ENDPOINTS ---
 
 @router.get("/products", response_model=List[schemas.ProductResponse])
+@query_budget(2)
 async def list_products(
     db: Annotated[AsyncSession, Depends(get_db)],
+    if_none_match: Annotated[Optional[str], Header()] = None,
     search: Optional[str] = None,
     fit_type: Optional[str] = None,
-    page: int = 1,
-    limit: int = 20
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    page: Annotated[Optional[int], Query(deprecated=True, description="Removed; use `cursor`")] = None
 ):
-    query = select(Product).where(Product.is_active == True)
-    if search:
-        query = query.where(Product.name.ilike(f"%{search}%"))
+    """
+    Products ordered by name. Pass the X-Next-Cursor header of a response as
+    `cursor` to get the following page; the last page has no such header.
+
+    With `search`, returns the `limit` most relevant matches on name, brand
+    and description instead (prefix and typo tolerant, not paginated).
+    """
+    # Offset paging is gone; old clients asking for page N must not silently get page 1
+    if page is not None and page != 1:
+        raise HTTPException(
+            status_code=400,
+            detail="`page` is no longer supported: pass the X-Next-Cursor header of the previous response as `cursor`",
+        )
+    try:
+        after = service.decode_cursor(cursor) if cursor and not search else None
+    except service.InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    filters = []
     if fit_type:
-        query = query.where(Product.fit_type == fit_type)
-        
-    query = query.offset((page - 1) * limit).limit(limit)
-    result = await db.execute(query)
-    # Using unique() if joined loading, but we are lazy loading variants in Pydantic or need selectinload.
-    # For simplicitly, let's rely on Pydantic's lazy load or explicit join if needed.
-    # Async lazy loading is tricky. Let's use explicit eager load options in a real app, 
-    # but for this snippet we'll let it slide or fix if errors pop up. 
-    # FIX: Add options(selectinload(Product.variants))
-    from sqlalchemy.orm import selectinload
-    query = query.options(selectinload(Product.variants))
-    
-    result = await db.execute(query)
-    return result.scalars().all()
+        filters.append(Product.fit_type == fit_type)
+    if category:
+        filters.append(Product.category == category)
+
+    async def load():
+        if search:
+            rows, next_cursor = await service.search_products(db, search, limit, filters), None
+        else:
+            query = service.product_listing_query(limit, after, filters)
+            rows, next_cursor = await service.list_products_page(db, query, limit)
+        body = product_list_adapter.dump_json(product_list_adapter.validate_python(rows))
+        return SerializedBody.from_bytes(body, {"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+    params = {"search": search, "fit_type": fit_type, "category": category, "cursor": cursor if after else None, "limit": limit}
+    return json_response(await catalog_cache.get_or_load("products", params, load), if_none_match)
+
+@router.get("/products/changes", response_model=schemas.CatalogChanges)
+@query_budget(3)
+async def get_catalog_changes(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    since: Annotated[str, Query(pattern=r"^\d+$")] = "0",
+    limit: Annotated[int, Query(ge=1, le=1000)] = 500
+):
+    """
+    Incremental sync: products, variants and garment assets changed since the
+    cursor. Start with since=0 for a full snapshot.
+    """
+    async def load():
+        changes = await service.catalog_changes(db, int(since), limit)
+        return schemas.CatalogChanges.model_validate(changes).model_dump_json().encode()
+
+    params = {"since": since, "limit": limit}
+    return json_response(await catalog_cache.get_or_load("changes", params, load), if_none_match)
 
 @router.get("/products/{id}", response_model=schemas.ProductResponse)
+@query_budget(2)
 async def get_product(
     id: UUID,
-    db: Annotated[AsyncSession, Depends(get_db)]
+    db: Annotated[AsyncSession, Depends(get_db)],
+    if_none_match: Annotated[Optional[str], Header()] = None
 ):
-    from sqlalchemy.orm import selectinload
-    query = select(Product).where(Product.id == id).options(selectinload(Product.variants))
-    product = await db.scalar(query)
-    if not product:
+    async def load():
+        query = select(Product).where(Product.id == id).options(selectinload(Product.variants))
+        product = await db.scalar(query)
+        if not product:
+            return None
+        return schemas.ProductResponse.model_validate(product).model_dump_json().encode()
+
+    product = await catalog_cache.get_or_load("product", {"id": id}, load)
+    if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    return json_response(product, if_none_match)
 
 @router.get("/products/{id}/variants", response_model=List[schemas.VariantResponse])
+@query_budget(1)
 async def get_product_variants(
     id: UUID,
-    db: Annotated[AsyncSession, Depends(get_db)]
+    db: Annotated[AsyncSession, Depends(get_db)],
+    if_none_match: Annotated[Optional[str], Header()] = None
 ):
-    query = select(ProductVariant).where(ProductVariant.product_id == id)
-    result = await db.execute(query)
-    return result.scalars().all()
+    async def load():
+        variants = await db.scalars(select(ProductVariant).where(ProductVariant.product_id == id))
+        return variant_list_adapter.dump_json(variant_list_adapter.validate_python(variants.all(), from_attributes=True))
+
+    return json_response(await catalog_cache.get_or_load("variants", {"id": id}, load), if_none_match)
 
 
 # --- ADMIN ENDPOINTS ---
@@ -69,20 +153,23 @@ async def get_product_variants(
 @admin_router.post("/products", response_model=schemas.ProductResponse)
 async def create_product(
     product_in: schemas.ProductCreate,
-    current_user: Annotated[User, Depends(deps.get_current_active_admin)],
+    current_user: Annotated[Principal, Depends(deps.get_current_active_admin)],
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
     product = Product(**product_in.model_dump())
     db.add(product)
     await db.commit()
-    await db.refresh(product)
+    # Loaded here: the response lists variants and async sessions cannot lazy-load
+    await db.refresh(product, ["variants"])
+    await size_charts.refresh_product(db, product.id)
+    await catalog_cache.invalidate(product.id)
     return product
 
 @admin_router.put("/products/{id}", response_model=schemas.ProductResponse)
 async def update_product(
     id: UUID,
     product_in: schemas.ProductCreate,
-    current_user: Annotated[User, Depends(deps.get_current_active_admin)],
+    current_user: Annotated[Principal, Depends(deps.get_current_active_admin)],
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
     product = await db.get(Product, id)
@@ -93,13 +180,16 @@ async def update_product(
         setattr(product, field, value)
         
     await db.commit()
-    await db.refresh(product)
+    # Loaded here: the response lists variants and async sessions cannot lazy-load
+    await db.refresh(product, ["variants"])
+    await size_charts.refresh_product(db, product.id)
+    await catalog_cache.invalidate(product.id)
     return product
 
 @admin_router.delete("/products/{id}")
 async def delete_product(
     id: UUID,
-    current_user: Annotated[User, Depends(deps.get_current_active_admin)],
+    current_user: Annotated[Principal, Depends(deps.get_current_active_admin)],
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
     product = await db.get(Product, id)
@@ -108,62 +198,132 @@ async def delete_product(
     
     product.is_active = False # Soft delete
     await db.commit()
+    size_charts.remove(id)
+    await catalog_cache.invalidate(id)
     return {"status": "deleted"}
 
 @admin_router.post("/products/{id}/variants")
 async def create_variants_bulk(
     id: UUID,
-    current_user: Annotated[User, Depends(deps.get_current_active_admin)],
+    current_user: Annotated[Principal, Depends(deps.get_current_active_admin)],
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
-    # Auto-generate XS-XL
-    from app.db.models import SizeEnum
-    variants = []
-    for size in SizeEnum:
-        v = ProductVariant(product_id=id, size=size, is_active=True)
-        db.add(v)
-        variants.append(v)
-    
+    # Auto-generate XS-XL; sizes that already exist are left alone, so re-runs are safe
+    await db.run_sync(lock_catalog_writes)
+    created = await db.scalars(
+        insert(ProductVariant)
+        .values([{"product_id": id, "size": size, "is_active": True} for size in SizeEnum])
+        .on_conflict_do_nothing(index_elements=[ProductVariant.product_id, ProductVariant.size])
+        .returning(ProductVariant.id)
+    )
+    count = len(created.all())
     await db.commit()
-    return {"message": "Variants created", "count": len(variants)}
+    await size_charts.refresh_product(db, id)
+    await catalog_cache.invalidate(id)
+    return {"message": "Variants created", "count": count}
+
+@admin_router.post("/products/import", response_model=schemas.ImportReport)
+async def import_products(
+    file: Annotated[UploadFile, File(...)],
+    current_user: Annotated[Principal, Depends(deps.get_current_active_admin)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    format: Annotated[Optional[str], Query(pattern="^(csv|jsonl)$")] = None,
+    batch_size: Annotated[int, Query(ge=1, le=5000)] = importer.BATCH_SIZE
+):
+    """
+    Creates or updates products, variants and overlay references from a CSV
+    or JSONL file (one line per product size, see ImportRow), upserting by
+    external_id. Invalid rows are listed in the report and skipped; the rest
+    is imported. The format is taken from the file extension unless given.
+    """
+    fmt = format or importer.format_for_filename(file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Cannot tell the file format, pass format=csv or format=jsonl")
+    try:
+        return await importer.import_catalog(db, file.file, fmt, batch_size)
+    except importer.InvalidImportFile as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @admin_router.post("/products/{id}/upload-garment-asset")
 async def upload_garment_asset(
     id: UUID,
     asset_data: Annotated[schemas.GarmentAssetCreate, Depends()],
-    file: UploadFile = File(...),
-    current_user: Annotated[User, Depends(deps.get_current_active_admin)],
-    db: Annotated[AsyncSession, Depends(get_db)]
+    current_user: Annotated[Principal, Depends(deps.get_current_active_admin)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    background_tasks: BackgroundTasks,
+    file: Optional[UploadFile] = File(None),
+    upload_id: Optional[UUID] = None # A completed resumable upload instead of a file
 ):
-    url = local.save_upload_file(file, f"garments/{id}/{asset_data.size.value}")
-    
-    asset = GarmentAsset(
-        product_id=id,
-        size=asset_data.size,
-        asset_type=asset_data.asset_type,
-        url=url,
-        note=asset_data.note
-    )
-    # Upsert logic could be better, but simple add for now
-    db.add(asset)
+    if (file is None) == (upload_id is None):
+        raise HTTPException(status_code=400, detail="Provide either file or upload_id")
+    if not await db.get(Product, id):
+        raise HTTPException(status_code=404, detail="Product not found")
+    url = await _store_media(db, current_user, file, upload_id)
+
+    # Replacing an overlay drops the reference to the old file
+    await service.upsert_garment_assets(db, id, [(asset_data.size, asset_data.asset_type, url, asset_data.note)])
     await db.commit()
+    await catalog_cache.invalidate()
+    # Overlays are fetched by every try-on; render their variants up front
+    background_tasks.add_task(derivatives.cache.warm, url)
     return {"status": "uploaded", "url": url}
 
+@admin_router.post("/products/{id}/garment-assets")
+async def upload_garment_assets(
+    id: UUID,
+    files: Annotated[List[UploadFile], File(...)],
+    sizes: Annotated[List[SizeEnum], Form(...)],
+    asset_types: Annotated[List[AssetType], Form(...)],
+    current_user: Annotated[Principal, Depends(deps.get_current_active_admin)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    background_tasks: BackgroundTasks
+):
+    """
+    Uploads several overlays of a product at once: the i-th file is the
+    overlay for sizes[i] and asset_types[i]. Existing overlays for those
+    slots are replaced.
+    """
+    slots = list(zip(sizes, asset_types))
+    if not (len(files) == len(sizes) == len(asset_types)):
+        raise HTTPException(status_code=400, detail="files, sizes and asset_types must have the same length")
+    if len(set(slots)) != len(slots):
+        raise HTTPException(status_code=400, detail="Each size and asset type may appear only once")
+    if not await db.get(Product, id):
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    try:
+        stored = await blobs.store_uploads(db, files)
+    except local.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    await service.upsert_garment_assets(
+        db, id, [(size, asset_type, f.url, None) for (size, asset_type), f in zip(slots, stored)]
+    )
+    await db.commit()
+    await catalog_cache.invalidate()
+    urls = [f.url for f in stored]
+    background_tasks.add_task(derivatives.cache.warm_many, urls)
+    return {
+        "status": "uploaded",
+        "assets": [
+            {"size": size, "asset_type": asset_type, "url": url}
+            for (size, asset_type), url in zip(slots, urls)
+        ],
+    }
+
 @admin_router.post("/mannequin/upload-video")
 async def upload_mannequin_video(
+    current_user: Annotated[Principal, Depends(deps.get_current_active_admin)],
+    db: Annotated[AsyncSession, Depends(get_db)],
     video_url: Optional[str] = None, # Allow passing direct URL
     file: Optional[UploadFile] = File(None), # Or uploading file
-    current_user: Annotated[User, Depends(deps.get_current_active_admin)],
-    db: Annotated[AsyncSession, Depends(get_db)]
+    upload_id: Optional[UUID] = None, # Or a completed resumable upload
 ):
     """
-    Uploads a file OR stores a URL for the DEFAULT mannequin.
+    Uploads a file OR stores a URL for the DEFAULT mannequin. Large videos
+    are better sent through /uploads and passed here as `upload_id`.
     """
-    final_url = video_url
-    
-    if file:
-        final_url = local.save_upload_file(file, "mannequin")
-    
+    final_url = await _store_media(db, current_user, file, upload_id) or video_url
+
     if not final_url:
          raise HTTPException(status_code=400, detail="Provide video_url or file")
 
@@ -175,7 +335,19 @@ async def upload_mannequin_video(
         asset = MannequinAsset(body_type=BodyType.DEFAULT, video_url=final_url)
         db.add(asset)
     else:
+        await blobs.release(db, asset.video_url)
         asset.video_url = final_url
-        
+        # Describes the previous video; the ingestion job fills it in again
+        asset.duration_ms = asset.fps = asset.width = asset.height = asset.poster_url = None
+        await db.execute(delete(MannequinRendition).where(MannequinRendition.mannequin_id == asset.id))
+    asset.video_status = VideoStatus.PROCESSING
     await db.commit()
-    return {"status": "updated", "video_url": final_url}
+
+    try:
+        enqueue_ingest(asset)
+    except Exception as e:
+        logger.error(f"Cannot queue ingestion of mannequin video {final_url}: {e}")
+        asset.video_status = VideoStatus.FAILED
+        await db.commit()
+    await mannequins.invalidate(db)
+    return {"status": "updated", "video_url": final_url, "video_status": asset.video_status}
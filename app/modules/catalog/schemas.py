@@ -1,6 +1,6 @@
 import uuid
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from app.db.models import FitType, SizeEnum, AssetType, BodyType
 
 class VariantBase(BaseModel):
@@ -45,3 +45,76 @@ class MannequinAssetCreate(BaseModel):
     video_url: str
     duration_ms: Optional[int] = None
     rotation_degrees: int = 180
+
+class ProductChange(ProductBase):
+    id: uuid.UUID
+    change_seq: int
+
+    class Config:
+        from_attributes = True
+
+class VariantChange(VariantResponse):
+    change_seq: int
+
+class GarmentAssetChange(BaseModel):
+    id: uuid.UUID
+    product_id: uuid.UUID
+    size: SizeEnum
+    asset_type: AssetType
+    url: str
+    note: Optional[str] = None
+    change_seq: int
+
+    class Config:
+        from_attributes = True
+
+class CatalogChanges(BaseModel):
+    """
+    Rows created or updated since the requested cursor, soft-deleted ones
+    included (is_active = false). Apply them in change_seq order and pass
+    next_cursor as `since` on the next call; repeat while has_more.
+    """
+    products: List[ProductChange] = []
+    variants: List[VariantChange] = []
+    garment_assets: List[GarmentAssetChange] = []
+    next_cursor: str
+    has_more: bool
+
+class ImportRow(BaseModel):
+    """
+    One line of a bulk import (CSV column or JSONL key names): a product
+    keyed by external_id, optionally one of its sizes with that size's
+    overlay URLs. A product with several sizes spans several lines; the
+    product fields of the last line win.
+    """
+    external_id: str = Field(min_length=1)
+    name: str
+    description: Optional[str] = None
+    brand: Optional[str] = None
+    category: str = "tshirt"
+    fit_type: FitType
+    is_active: bool = True
+    size: Optional[SizeEnum] = None
+    sku: Optional[str] = None
+    overlay_front_url: Optional[str] = None
+    overlay_back_url: Optional[str] = None
+
+    @model_validator(mode="after")
+    def overlays_need_size(self):
+        if (self.sku or self.overlay_front_url or self.overlay_back_url) and self.size is None:
+            raise ValueError("size is required with sku or overlay URLs")
+        return self
+
+class ImportRowError(BaseModel):
+    line: int
+    external_id: Optional[str] = None
+    error: str
+
+class ImportReport(BaseModel):
+    rows: int = 0
+    imported: int = 0
+    products: int = 0
+    variants: int = 0
+    garment_assets: int = 0
+    errors: List[ImportRowError] = []
+    errors_truncated: bool = False
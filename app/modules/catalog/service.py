@@ -0,0 +1,347 @@
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import re
+import uuid
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple, Union
+from uuid import UUID
+
+from sqlalchemy import JSON, Float, Select, Text, cast, func, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.http import SerializedBody
+from app.core.resources import resources
+from app.db.models import (
+    AssetType, GarmentAsset, Product, ProductVariant, SizeEnum, catalog_change_seq, lock_catalog_writes,
+)
+from app.modules.sizing.service import size_charts
+from app.storage import blobs
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "catalog:version"
+INVALIDATION_CHANNEL = "catalog:invalidate"
+
+class CatalogCache:
+    """
+    Two-tier cache for public catalog reads: an in-process TTL LRU in front of
+    Redis. Keys embed the catalog version, so bumping the version (on every
+    admin write) makes all older entries unreachable at once. The new version
+    is published over Redis pub/sub; every replica's listener clears its local
+    tier and refreshes its size chart row as soon as the message arrives.
+
+    Entries are JSON bodies encoded once by the loader plus their ETag, so a
+    hit costs no validation or serialization.
+
+    Redis is optional: if it is unreachable the in-process tier keeps
+    working and other replicas converge once their entries expire.
+    """
+
+    def __init__(self):
+        self.local = TTLCache(settings.CATALOG_CACHE_MAX_ENTRIES, settings.CATALOG_CACHE_TTL_SECONDS)
+        self.version: Optional[int] = None
+        # Lets a replica skip the invalidations it published itself
+        self.origin = uuid.uuid4().hex
+
+    def _redis(self):
+        return resources.get("redis_async")
+
+    async def _sync_version(self):
+        try:
+            version = int(await self._redis().get(VERSION_KEY) or 0)
+        except Exception as e:
+            logger.warning(f"Catalog cache: cannot read version from Redis: {e}")
+            version = self.version or 0
+        self._set_version(version)
+
+    def _set_version(self, version: int):
+        if version != self.version:
+            self.local.clear()
+            self.version = version
+
+    def _key(self, name: str, params: dict) -> str:
+        return f"catalog:{self.version}:{name}:{json.dumps(params, sort_keys=True, default=str)}"
+
+    async def get_or_load(
+        self, name: str, params: dict, loader: Callable[[], Awaitable[Union[bytes, SerializedBody, None]]]
+    ) -> Optional[SerializedBody]:
+        """
+        Returns the cached body for (name, params), calling `loader` on a miss.
+        Loaders return the encoded JSON (or a SerializedBody when extra headers
+        come with it), or None for "not found", which is not cached.
+        """
+        if self.version is None:
+            await self._sync_version()
+        key = self._key(name, params)
+
+        cached = self.local.get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            raw = await self._redis().get(key)
+        except Exception as e:
+            logger.warning(f"Catalog cache: Redis read failed: {e}")
+            raw = None
+        if raw is not None:
+            cached = SerializedBody.unpack(raw)
+            self.local.set(key, cached)
+            return cached
+
+        loaded = await loader()
+        if loaded is None:
+            return None
+        cached = loaded if isinstance(loaded, SerializedBody) else SerializedBody.from_bytes(loaded)
+        self.local.set(key, cached)
+        try:
+            await self._redis().set(key, cached.pack(), ex=settings.CATALOG_CACHE_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"Catalog cache: Redis write failed: {e}")
+        return cached
+
+    async def invalidate(self, product_id: Optional[UUID] = None, reload_size_charts: bool = False):
+        """
+        Call after committing an admin write to the catalog. Bulk writes that
+        touch many products pass reload_size_charts so other replicas rebuild
+        their size chart index instead of refreshing one product.
+        """
+        try:
+            version = int(await self._redis().incr(VERSION_KEY))
+            message = {
+                "version": version,
+                "origin": self.origin,
+                "product_id": str(product_id) if product_id else None,
+                "reload_size_charts": reload_size_charts,
+            }
+            await self._redis().publish(INVALIDATION_CHANNEL, json.dumps(message))
+        except Exception as e:
+            logger.warning(f"Catalog cache: cannot publish invalidation: {e}")
+            version = (self.version or 0) + 1
+        self._set_version(version)
+
+    async def _apply(self, message: dict):
+        self._set_version(int(message["version"]))
+        if message.get("origin") == self.origin:
+            # The publishing replica already refreshed its own index
+            return
+        if message.get("reload_size_charts") and size_charts.loaded:
+            async with AsyncSessionLocal() as db:
+                await size_charts.load(db)
+        elif message.get("product_id"):
+            async with AsyncSessionLocal() as db:
+                await size_charts.refresh_product(db, UUID(message["product_id"]))
+
+    async def listen(self):
+        """Applies invalidations from other replicas. Runs for the life of the app."""
+        while True:
+            pubsub = self._redis().pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Catch up on anything published while we were not subscribed
+                await self._sync_version()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await self._apply(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Catalog invalidation listener failed, retrying: {e}")
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.aclose()
+
+catalog_cache = CatalogCache()
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(name: str, product_id: UUID) -> str:
+    """Opaque listing cursor: the (name, id) of the last product on a page."""
+    raw = json.dumps([name, str(product_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        name, product_id = json.loads(raw)
+        return str(name), UUID(product_id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursor(cursor) from e
+
+def _variants_json():
+    """Correlated subquery aggregating a product's variants into a JSON array."""
+    variant = func.json_build_object(
+        "id", ProductVariant.id,
+        "product_id", ProductVariant.product_id,
+        "size", ProductVariant.size,
+        "sku", ProductVariant.sku,
+        "is_active", ProductVariant.is_active,
+    )
+    return (
+        select(func.coalesce(
+            func.json_agg(aggregate_order_by(variant, ProductVariant.size)),
+            literal_column("'[]'::json"),
+            type_=JSON,
+        ))
+        .where(ProductVariant.product_id == Product.id)
+        .scalar_subquery()
+    )
+
+def _product_columns():
+    """Only the columns ProductResponse needs, variants aggregated in Postgres."""
+    return (
+        Product.id, Product.name, Product.description, Product.brand,
+        Product.category, Product.fit_type, Product.is_active,
+        _variants_json().label("variants"),
+    )
+
+def product_listing_query(limit: int, after: Optional[Tuple[str, UUID]] = None, filters: Sequence = ()) -> Select:
+    """
+    Active products ordered by (name, id), starting after the cursor position.
+    One round trip; fetches one extra row to tell if a next page exists.
+    """
+    query = (
+        select(*_product_columns())
+        .where(Product.is_active == True, *filters)
+        .order_by(Product.name, Product.id)
+        .limit(limit + 1)
+    )
+    if after is not None:
+        query = query.where(tuple_(Product.name, Product.id) > tuple_(*after))
+    return query
+
+async def list_products_page(db: AsyncSession, query: Select, limit: int) -> Tuple[List[dict], Optional[str]]:
+    """Runs a product_listing_query; returns the rows and the next cursor, if any."""
+    rows = [dict(row) for row in (await db.execute(query)).mappings()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["name"], rows[-1]["id"])
+    return rows, next_cursor
+
+# Written out literally so Postgres matches it to ix_products_search_trgm
+SEARCH_DOCUMENT = literal_column("(coalesce(products.name, '') || ' ' || coalesce(products.brand, ''))")
+
+def prefix_tsquery(search: str) -> Optional[str]:
+    """'oversize te' -> 'oversize:* & te:*'; None if nothing searchable is left."""
+    terms = re.findall(r"\w+", search.lower())
+    if not terms:
+        return None
+    return " & ".join(f"{term}:*" for term in terms)
+
+def full_text_search_query(search: str, limit: int, filters: Sequence = ()) -> Optional[Select]:
+    """
+    Products where every word of `search` prefixes a word of the name, brand
+    or description (GIN on search_vector), ranked with name > brand >
+    description weights.
+    """
+    tsquery = prefix_tsquery(search)
+    if tsquery is None:
+        return None
+    ts_query = func.to_tsquery(literal_column("'simple'"), tsquery)
+    rank = func.ts_rank_cd(Product.search_vector, ts_query, type_=Float)
+    return (
+        select(*_product_columns())
+        .where(Product.is_active == True, Product.search_vector.op("@@", is_comparison=True)(ts_query), *filters)
+        .order_by(rank.desc(), Product.name, Product.id)
+        .limit(limit)
+    )
+
+def fuzzy_search_query(search: str, limit: int, filters: Sequence = (), exclude: Sequence[UUID] = ()) -> Select:
+    """
+    Products whose name + brand is close to `search` by trigram word
+    similarity (GIN on SEARCH_DOCUMENT), which tolerates typos.
+    """
+    term = cast(search, Text)
+    # <% is pg_trgm's "word similarity above threshold" operator
+    query = (
+        select(*_product_columns())
+        .where(Product.is_active == True, term.op("<%", is_comparison=True)(SEARCH_DOCUMENT), *filters)
+        .order_by(func.word_similarity(term, SEARCH_DOCUMENT).desc(), Product.name, Product.id)
+        .limit(limit)
+    )
+    if exclude:
+        query = query.where(Product.id.not_in(exclude))
+    return query
+
+async def search_products(db: AsyncSession, search: str, limit: int, filters: Sequence = ()) -> List[dict]:
+    """
+    The `limit` most relevant active products for `search`. Full-text matches
+    come first; fuzzy matches only fill the remaining slots, so the trigram
+    scan (the expensive part on broad terms) runs only for rare words and
+    typos.
+    """
+    search = search.strip()
+    rows = []
+    query = full_text_search_query(search, limit, filters)
+    if query is not None:
+        rows = [dict(row) for row in (await db.execute(query)).mappings()]
+    if len(rows) < limit and search:
+        query = fuzzy_search_query(search, limit - len(rows), filters, exclude=[row["id"] for row in rows])
+        rows += [dict(row) for row in (await db.execute(query)).mappings()]
+    return rows
+
+
+CHANGE_FEED_TABLES = (("products", Product), ("variants", ProductVariant), ("garment_assets", GarmentAsset))
+
+async def catalog_changes(db: AsyncSession, since: int, limit: int) -> dict:
+    """
+    Up to `limit` catalog rows with change_seq > since, oldest change first,
+    across products, variants and garment assets. Each table is read through
+    its change_seq index, so the cost follows churn, not catalog size.
+    """
+    changed = []
+    for key, model in CHANGE_FEED_TABLES:
+        rows = await db.scalars(
+            select(model).where(model.change_seq > since).order_by(model.change_seq).limit(limit + 1)
+        )
+        changed.extend((row.change_seq, key, row) for row in rows)
+    changed.sort(key=lambda item: item[0])
+
+    page = changed[:limit]
+    result = {key: [] for key, _ in CHANGE_FEED_TABLES}
+    for _, key, row in page:
+        result[key].append(row)
+    result["next_cursor"] = str(page[-1][0] if page else since)
+    result["has_more"] = len(changed) > limit
+    return result
+
+
+async def upsert_garment_assets(
+    db: AsyncSession, product_id: UUID, assets: Sequence[Tuple[SizeEnum, AssetType, str, Optional[str]]]
+):
+    """
+    Points each (size, asset_type) overlay of a product at a new URL in one
+    INSERT ... ON CONFLICT statement, and releases the files they replace.
+    The URLs must already hold a blob reference each (store_upload(s)).
+    A missing note keeps the current one. Part of the caller's transaction.
+    """
+    await db.run_sync(lock_catalog_writes)
+    previous = await db.execute(
+        select(GarmentAsset.url).where(
+            GarmentAsset.product_id == product_id,
+            tuple_(GarmentAsset.size, GarmentAsset.asset_type).in_([(size, asset_type) for size, asset_type, _, _ in assets]),
+        )
+    )
+    replaced = previous.scalars().all()
+    stmt = insert(GarmentAsset)
+    stmt = stmt.on_conflict_do_update(
+        constraint="_product_size_asset_uc",
+        set_={
+            "url": stmt.excluded.url,
+            "note": func.coalesce(stmt.excluded.note, GarmentAsset.note),
+            "change_seq": catalog_change_seq.next_value(),
+        },
+    )
+    await db.execute(stmt, [
+        {"product_id": product_id, "size": size, "asset_type": asset_type, "url": url, "note": note}
+        for size, asset_type, url, note in assets
+    ])
+    for url in replaced:
+        await blobs.release(db, url)
@@ -0,0 +1,47 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy import exists, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.database import get_db
+from app.db.models import PhotoAnalysis, UserProfile
+from app.storage import derivatives
+
+router = APIRouter()
+
+async def _is_user_photo(db: AsyncSession, url: str) -> bool:
+    return await db.scalar(select(
+        exists().where(or_(UserProfile.body_photo_url == url, UserProfile.face_crop_url == url))
+        | exists().where(PhotoAnalysis.face_crop_url == url)
+    ))
+
+@router.get("/{variant}.{fmt}/{source:path}")
+async def get_image_variant(
+    variant: str,
+    fmt: str,
+    source: str,
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    """
+    Serves a resized variant (thumb/medium/full, webp/jpg) of an uploaded image,
+    generating it on the first request.
+    """
+    # Blob sources are content-addressed, so their variants never change; but
+    # body photos and face crops must disappear with their owner's deletion,
+    # so shared caches may not keep them
+    cache_control = "public, max-age=3600"
+    if source.startswith("blobs/"):
+        if await _is_user_photo(db, f"/static/uploads/{source}"):
+            cache_control = "private, no-store"
+        else:
+            cache_control = "public, max-age=31536000, immutable"
+    await db.close()
+
+    try:
+        path = await run_in_threadpool(derivatives.cache.get, variant, fmt, source)
+    except derivatives.DerivativeNotFound:
+        raise HTTPException(status_code=404, detail="Image variant not found")
+    return FileResponse(path, headers={"Cache-Control": cache_control})
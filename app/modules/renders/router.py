@@ -1,51 +1,58 @@
+from typing import Annotated
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
-from app.modules.auth.router import get_current_user
-from app.db.models import User, Product, UserProfile
+from app.core.deps import get_current_principal, get_token_principal
+from app.core.principals import Principal
+from app.db.models import Product, UserProfile, UserRole
 from app.modules.renders import schemas, service
 
 router = APIRouter()
 
 @router.post("/", response_model=schemas.RenderJobResponse)
-def create_render_job(
+async def create_render_job(
     request: schemas.RenderJobCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Principal, Depends(get_current_principal)]
 ):
     # 1. Check Profile Completeness
-    if not current_user.profile:
-         raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail={"code": "PROFILE_MISSING", "message": "User profile not found."}
-        )
-    
-    # Simple completeness check based on required fields
-    # height_cm, chest_cm, shoulders_cm required
-    missing = []
-    if not current_user.profile.height_cm: missing.append("height_cm")
-    if not current_user.profile.chest_cm: missing.append("chest_cm")
-    if not current_user.profile.shoulders_cm: missing.append("shoulders_cm")
-    
-    if missing:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail={
-                "code": "PROFILE_INCOMPLETE", 
-                "message": "Complete your profile measurements first.",
-                "details": {"missing_fields": missing}
-            }
-        )
+    # The principal knows when the profile is complete; only look at the
+    # profile itself to explain what is missing
+    if not current_user.profile_completed:
+        profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == current_user.id))
+        if not profile:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"code": "PROFILE_MISSING", "message": "User profile not found."}
+            )
+
+        # Simple completeness check based on required fields
+        # height_cm, chest_cm, shoulders_cm required
+        missing = []
+        if not profile.height_cm: missing.append("height_cm")
+        if not profile.chest_cm: missing.append("chest_cm")
+        if not profile.shoulders_cm: missing.append("shoulders_cm")
+
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "code": "PROFILE_INCOMPLETE", 
+                    "message": "Complete your profile measurements first.",
+                    "details": {"missing_fields": missing}
+                }
+            )
 
     # 2. Check Product Exists
-    product = db.query(Product).filter(Product.id == request.product_id).first()
+    product = await db.get(Product, request.product_id)
     if not product or not product.is_active:
         raise HTTPException(status_code=404, detail="Product not found or inactive")
 
     # 3. Create Job
-    job = service.create_render_job(
+    job = await service.create_render_job(
         db=db,
         user_id=current_user.id,
         product_id=request.product_id,
@@ -54,17 +61,17 @@ def create_render_job(
     return job
 
 @router.get("/{job_id}", response_model=schemas.RenderJobResponse)
-def get_render_job(
+async def get_render_job(
     job_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Principal, Depends(get_token_principal)]
 ):
-    job = service.get_render_job(db, job_id)
+    job = await service.get_render_job(db, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
     # Ownership check
-    if job.user_id != current_user.id and current_user.role != "ADMIN":
+    if job.user_id != current_user.id and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized to view this job")
 
     return job
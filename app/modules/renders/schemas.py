@@ -1,7 +1,7 @@
 from uuid import UUID
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import AliasChoices, BaseModel, Field
 from app.db.models import SizeEnum, RenderJobStatus
 
 class RenderJobCreate(BaseModel):
@@ -9,7 +9,8 @@ class RenderJobCreate(BaseModel):
     size: SizeEnum
 
 class RenderJobResponse(BaseModel):
-    job_id: UUID
+    # RenderJob calls it `id`
+    job_id: UUID = Field(validation_alias=AliasChoices("job_id", "id"))
     product_id: UUID
     size: SizeEnum
     status: RenderJobStatus
@@ -1,15 +1,21 @@
+from typing import Optional
 from uuid import UUID
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import RenderJob, RenderJobStatus, SizeEnum
-from app.core import config
-from redis import Redis
-from rq import Queue
+from app.core.resources import resources
 
-# Initialize Redis and Queue
-redis_conn = Redis.from_url(config.settings.REDIS_URL)
-queue = Queue('renders', connection=redis_conn)
+def _render_queue():
+    from rq import Queue
+    return Queue('renders', connection=resources.get("redis"))
 
-def create_render_job(db: Session, user_id: UUID, product_id: UUID, size: SizeEnum) -> RenderJob:
+# Created on the first enqueue, not when the API imports this module
+resources.register("render_queue", _render_queue)
+
+def get_queue():
+    return resources.get("render_queue")
+
+async def create_render_job(db: AsyncSession, user_id: UUID, product_id: UUID, size: SizeEnum) -> RenderJob:
     job = RenderJob(
         user_id=user_id,
         product_id=product_id,
@@ -17,14 +23,14 @@ def create_render_job(db: Session, user_id: UUID, product_id: UUID, size: SizeEn
         status=RenderJobStatus.QUEUED
     )
     db.add(job)
-    db.commit()
-    db.refresh(job)
+    await db.commit()
+    await db.refresh(job)
 
     # Enqueue job
     # We pass the job.id (UUID) as a string to the worker task
-    queue.enqueue('app.worker.tasks.run_render_job', str(job.id))
+    get_queue().enqueue('app.worker.tasks.run_render_job', str(job.id))
 
     return job
 
-def get_render_job(db: Session, job_id: UUID) -> RenderJob:
-    return db.query(RenderJob).filter(RenderJob.id == job_id).first()
+async def get_render_job(db: AsyncSession, job_id: UUID) -> Optional[RenderJob]:
+    return await db.scalar(select(RenderJob).where(RenderJob.id == job_id))
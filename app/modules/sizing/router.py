@@ -0,0 +1,74 @@
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from uuid import UUID
+
+from app.core import deps
+from app.core.database import get_db
+from app.core.principals import Principal
+from app.core.query_stats import query_budget
+from app.db.models import UserProfile, Product, FitType
+from app.modules.sizing import schemas, service
+
+router = APIRouter()
+
+REQUIRED_MEASUREMENTS = ("height_cm", "chest_cm", "shoulders_cm")
+
+async def _measurements(db: AsyncSession, user: Principal):
+    profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == user.id))
+    missing = [f for f in REQUIRED_MEASUREMENTS if not profile or not getattr(profile, f)]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "code": "PROFILE_INCOMPLETE",
+                "message": "Complete your profile measurements first.",
+                "details": {"missing_fields": missing}
+            }
+        )
+    return service.measurement_vector(profile)
+
+@router.get("/", response_model=schemas.BulkSizeRecommendation)
+@query_budget(4)
+async def recommend_sizes(
+    current_user: Annotated[Principal, Depends(deps.get_token_principal)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    fit_type: Optional[FitType] = None
+):
+    """
+    Recommends a size for every active product in one pass over the catalog.
+    """
+    measurements = await _measurements(db, current_user)
+    await service.size_charts.ensure_loaded(db)
+
+    product_ids = None
+    if fit_type:
+        product_ids = list(await db.scalars(
+            select(Product.id).where(Product.is_active == True, Product.fit_type == fit_type)
+        ))
+
+    product_ids, scores = service.size_charts.score(measurements, product_ids)
+    return {"items": service.best_sizes(product_ids, scores)}
+
+@router.get("/{product_id}", response_model=schemas.ProductSizeRecommendation)
+@query_budget(3)
+async def recommend_size(
+    product_id: UUID,
+    current_user: Annotated[Principal, Depends(deps.get_token_principal)],
+    db: Annotated[AsyncSession, Depends(get_db)]
+):
+    measurements = await _measurements(db, current_user)
+    await service.size_charts.ensure_loaded(db)
+
+    product_ids, scores = service.size_charts.score(measurements, [product_id])
+    best = service.best_sizes(product_ids, scores)
+    if not best:
+        raise HTTPException(status_code=404, detail="Product not found or has no active sizes")
+
+    return {
+        **best[0],
+        "scores": {
+            size: float(score) for size, score in zip(service.SIZES, scores[0]) if score != float("inf")
+        }
+    }
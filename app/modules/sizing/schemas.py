@@ -0,0 +1,16 @@
+import uuid
+from typing import Dict, List
+from pydantic import BaseModel
+from app.db.models import SizeEnum
+
+class SizeRecommendation(BaseModel):
+    product_id: uuid.UUID
+    recommended_size: SizeEnum
+    score: float
+
+class ProductSizeRecommendation(SizeRecommendation):
+    # Misfit score per available size, lower is better
+    scores: Dict[SizeEnum, float]
+
+class BulkSizeRecommendation(BaseModel):
+    items: List[SizeRecommendation]
@@ -0,0 +1,192 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import FitType, Product, ProductVariant, SizeEnum
+
+MEASUREMENTS = ("height_cm", "chest_cm", "shoulders_cm", "waist_cm")
+SIZES = list(SizeEnum)
+FIT_TYPES = list(FitType)
+
+# Body measurements (cm) each size is cut for. Rows follow SizeEnum order,
+# columns follow MEASUREMENTS.
+BASE_SIZE_CHART = np.array([
+    [164.0, 86.0, 41.0, 72.0],   # XS
+    [170.0, 92.0, 43.0, 78.0],   # S
+    [176.0, 98.0, 45.0, 84.0],   # M
+    [182.0, 104.0, 47.0, 90.0],  # L
+    [188.0, 110.0, 49.0, 96.0],  # XL
+], dtype=np.float32)
+
+# How each fit shifts the body a size is meant for. An oversize M is cut like a
+# regular L, so the same body takes a smaller size; cropped cuts run short.
+FIT_OFFSETS = {
+    FitType.REGULAR: [0.0, 0.0, 0.0, 0.0],
+    FitType.OVERSIZE: [0.0, 6.0, 3.0, 6.0],
+    FitType.CROPPED: [-4.0, 0.0, 0.0, 0.0],
+    FitType.BOXY: [0.0, 4.0, 2.0, 3.0],
+}
+
+# Centimetres of difference that count as one unit of misfit per measurement.
+TOLERANCES = np.array([6.0, 4.0, 2.5, 5.0], dtype=np.float32)
+
+# Shape: (len(FIT_TYPES), len(SIZES), len(MEASUREMENTS))
+FIT_SIZE_CHARTS = np.stack([
+    BASE_SIZE_CHART + np.asarray(FIT_OFFSETS[fit], dtype=np.float32) for fit in FIT_TYPES
+])
+
+
+def measurement_vector(profile) -> np.ndarray:
+    """
+    Builds the user's measurement vector. Missing values are NaN and are
+    ignored by the scoring.
+    """
+    values = [getattr(profile, name, None) for name in MEASUREMENTS]
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float32)
+
+
+def score_charts(charts: np.ndarray, measurements: np.ndarray) -> np.ndarray:
+    """
+    Scores every size row of `charts` (..., n_sizes, n_measurements) against the
+    user's measurements. Lower is a better fit.
+    """
+    known = ~np.isnan(measurements)
+    diff = (charts[..., known] - measurements[known]) / TOLERANCES[known]
+    return np.sqrt(np.mean(diff * diff, axis=-1))
+
+
+class SizeChartIndex:
+    """
+    In-memory size charts for the whole active catalog, stored as dense matrices
+    so one user can be scored against every variant in a single pass.
+
+    Rows are kept in insertion order; removing a product moves the last row into
+    its slot so updates never rebuild the whole index.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.loaded = False
+        self._reset(capacity)
+
+    def _reset(self, capacity: int):
+        self._product_ids: List[UUID] = []
+        self._rows: Dict[UUID, int] = {}
+        self._fit_idx = np.zeros(capacity, dtype=np.intp)
+        self._available = np.zeros((capacity, len(SIZES)), dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self._product_ids)
+
+    def _grow(self):
+        capacity = max(1, len(self._fit_idx)) * 2
+        fit_idx = np.zeros(capacity, dtype=np.intp)
+        available = np.zeros((capacity, len(SIZES)), dtype=bool)
+        n = len(self._product_ids)
+        fit_idx[:n] = self._fit_idx[:n]
+        available[:n] = self._available[:n]
+        self._fit_idx, self._available = fit_idx, available
+
+    def upsert(self, product_id: UUID, fit_type: FitType, sizes: Iterable[SizeEnum]):
+        sizes = set(sizes)
+        if not sizes:
+            self.remove(product_id)
+            return
+
+        row = self._rows.get(product_id)
+        if row is None:
+            if len(self._product_ids) == len(self._fit_idx):
+                self._grow()
+            row = len(self._product_ids)
+            self._product_ids.append(product_id)
+            self._rows[product_id] = row
+
+        self._fit_idx[row] = FIT_TYPES.index(FitType(fit_type))
+        self._available[row] = [size in sizes for size in SIZES]
+
+    def remove(self, product_id: UUID):
+        row = self._rows.pop(product_id, None)
+        if row is None:
+            return
+        last = len(self._product_ids) - 1
+        if row != last:
+            moved = self._product_ids[last]
+            self._product_ids[row] = moved
+            self._rows[moved] = row
+            self._fit_idx[row] = self._fit_idx[last]
+            self._available[row] = self._available[last]
+        self._product_ids.pop()
+        self._available[last] = False
+
+    def score(self, measurements: np.ndarray, product_ids: Optional[List[UUID]] = None) -> Tuple[List[UUID], np.ndarray]:
+        """
+        Returns (product_ids, scores) where scores has shape (n_products, n_sizes).
+        Sizes without an active variant score +inf.
+        """
+        if product_ids is None:
+            product_ids = list(self._product_ids)
+            rows = np.arange(len(product_ids))
+        else:
+            product_ids = [pid for pid in product_ids if pid in self._rows]
+            rows = np.array([self._rows[pid] for pid in product_ids], dtype=np.intp)
+
+        charts = FIT_SIZE_CHARTS[self._fit_idx[rows]]
+        scores = score_charts(charts, measurements)
+        scores[~self._available[rows]] = np.inf
+        return product_ids, scores
+
+    async def load(self, db: AsyncSession):
+        """Full rebuild from the database."""
+        self._reset(len(self._fit_idx))
+        rows = await db.execute(
+            select(Product.id, Product.fit_type, ProductVariant.size)
+            .join(ProductVariant, ProductVariant.product_id == Product.id)
+            .where(Product.is_active == True, ProductVariant.is_active == True)
+        )
+        grouped: Dict[UUID, Tuple[FitType, set]] = {}
+        for product_id, fit_type, size in rows:
+            grouped.setdefault(product_id, (fit_type, set()))[1].add(size)
+        for product_id, (fit_type, sizes) in grouped.items():
+            self.upsert(product_id, fit_type, sizes)
+        self.loaded = True
+
+    async def ensure_loaded(self, db: AsyncSession):
+        if not self.loaded:
+            await self.load(db)
+
+    async def refresh_product(self, db: AsyncSession, product_id: UUID):
+        """
+        Re-reads a single product after an admin edit. No-op until the index has
+        been loaded, since the first load picks the change up anyway.
+        """
+        if not self.loaded:
+            return
+        product = await db.get(Product, product_id)
+        if not product or not product.is_active:
+            self.remove(product_id)
+            return
+        sizes = await db.scalars(
+            select(ProductVariant.size).where(
+                ProductVariant.product_id == product_id,
+                ProductVariant.is_active == True
+            )
+        )
+        self.upsert(product_id, product.fit_type, sizes.all())
+
+
+size_charts = SizeChartIndex()
+
+
+def best_sizes(product_ids: List[UUID], scores: np.ndarray) -> List[dict]:
+    """Picks the lowest-scoring size per product, skipping products with no sizes."""
+    if not product_ids:
+        return []
+    best = np.argmin(scores, axis=1)
+    best_scores = scores[np.arange(len(product_ids)), best]
+    return [
+        {"product_id": pid, "recommended_size": SIZES[idx], "score": float(score)}
+        for pid, idx, score in zip(product_ids, best, best_scores)
+        if np.isfinite(score)
+    ]
@@ -1,85 +1,65 @@
 from typing import Annotated, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
 from app.core import deps
 from app.core.database import get_db
-from app.db.models import User, UserProfile, Product, GarmentAsset, MannequinAsset, BodyType, SizeEnum, AssetType
+from app.core.http import json_response
+from app.core.principals import Principal
+from app.core.query_stats import query_budget
+from app.db.models import BodyType, SizeEnum, UserProfile
+from app.modules.catalog.mannequins import mannequins
+from app.modules.try_on import service
 
 router = APIRouter()
 
 @router.get("/{product_id}")
+# A warm call runs one statement (the profile); the rest is the cold
+# allowance: catalog version and garment rows on a catalog cache miss, the
+# mannequins and their renditions on a process's first call
+@query_budget(5)
 async def try_product(
     product_id: UUID,
     size: SizeEnum,
-    current_user: Annotated[User, Depends(deps.get_current_user)],
-    db: Annotated[AsyncSession, Depends(get_db)]
+    current_user: Annotated[Principal, Depends(deps.get_token_principal)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    viewport_width: Annotated[Optional[int], Query(ge=1)] = None
 ):
+    """
+    Everything the try-on player needs for one product size. The user comes
+    from the token's claims and the profile from a single query; product and
+    overlays from the catalog cache and the mannequin from the in-process
+    registry, so a warm call costs one round trip (the query budget also
+    covers a cold cache). Pass `viewport_width` (in pixels) to get the
+    mannequin rendition that fits the player.
+    """
     # 1. Validate Profile
     profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == current_user.id))
+    # The row, not the claim: it is loaded anyway and can't be stale
     if not profile or not profile.profile_completed:
-        missing = []
-        if not profile: missing = ["all"]
-        else:
-            if not profile.height_cm: missing.append("height_cm")
-            if not profile.chest_cm: missing.append("chest_cm")
-            if not profile.shoulders_cm: missing.append("shoulders_cm")
-            if not profile.body_photo_url: missing.append("body_photo_url")
-            
-        return HTTPException(
-            status_code=409, 
+        raise HTTPException(
+            status_code=409,
             detail={
                 "error": {
-                    "code": "PROFILE_INCOMPLETE", 
+                    "code": "PROFILE_INCOMPLETE",
                     "message": "User profile is incomplete.",
-                    "details": {"missing_fields": missing}
+                    "details": {"missing_fields": service.missing_profile_fields(profile)}
                 }
             }
         )
 
-    # 2. Get Product & Size
-    product = await db.get(Product, product_id)
-    if not product:
+    # 2. Product & garment overlays for the size
+    garment = await service.garment_manifest(db, product_id, size)
+    if garment is None:
         raise HTTPException(status_code=404, detail="Product not found")
-        
-    # 3. Get Mannequin (Default)
-    mannequin = await db.scalar(select(MannequinAsset).where(MannequinAsset.body_type == BodyType.DEFAULT))
-    if not mannequin:
-         # Check if seed or fallback exists
-         # In MVP, this might be null if not seeded.
-         pass 
 
-    # 4. Get Garment Assets
-    assets_query = select(GarmentAsset).where(
-        GarmentAsset.product_id == product_id,
-        GarmentAsset.size == size
-    )
-    assets = (await db.execute(assets_query)).scalars().all()
-    
-    front_clean = next((a.url for a in assets if a.asset_type == AssetType.OVERLAY_FRONT), None)
-    back_clean = next((a.url for a in assets if a.asset_type == AssetType.OVERLAY_BACK), None)
+    # 3. Mannequin (Default), from the in-memory registry
+    await mannequins.ensure_loaded(db)
+    mannequin = service.mannequin_manifest(mannequins.get(BodyType.DEFAULT), viewport_width)
 
-    return {
-        "product": {
-            "id": product.id,
-            "name": product.name,
-            "fit_type": product.fit_type
-        },
-        "selected_size": size,
-        "mannequin": {
-            "body_type": mannequin.body_type if mannequin else "DEFAULT",
-            "video_url": mannequin.video_url if mannequin else None,
-            "rotation_degrees": mannequin.rotation_degrees if mannequin else 180,
-            "duration_ms": mannequin.duration_ms if mannequin else None
-        },
-        "personalization": {
-            "skin_tone_hex": profile.skin_tone_hex,
-            "face_crop_url": profile.face_crop_url
-        },
-        "garment": {
-            "overlay_front_url": front_clean,
-            "overlay_back_url": back_clean
-        }
-    }
+    # Personalized, so only the user's own client may keep it
+    manifest = service.build_manifest(profile, garment, mannequin, size)
+    return json_response(manifest, if_none_match, cache_control="private, no-cache")
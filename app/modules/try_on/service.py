@@ -0,0 +1,96 @@
+import json
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.http import SerializedBody
+from app.db.models import AssetType, BodyType, GarmentAsset, Product, SizeEnum, UserProfile
+from app.modules.catalog.mannequins import DEFAULT_ROTATION_DEGREES, Mannequin
+from app.modules.catalog.service import catalog_cache
+from app.storage.derivatives import variant_urls
+
+async def garment_manifest(db: AsyncSession, product_id: UUID, size: SizeEnum) -> Optional[dict]:
+    """
+    The product and its overlays for one size, or None if the product does
+    not exist. Lives in the catalog cache, so any admin write to the product
+    or its overlays (which bumps the catalog version) refreshes it.
+    """
+    async def load():
+        rows = (await db.execute(
+            select(Product.id, Product.name, Product.fit_type, GarmentAsset.asset_type, GarmentAsset.url)
+            .outerjoin(GarmentAsset, and_(GarmentAsset.product_id == Product.id, GarmentAsset.size == size))
+            .where(Product.id == product_id)
+        )).all()
+        if not rows:
+            return None
+        urls = {row.asset_type: row.url for row in rows if row.asset_type is not None}
+        front = urls.get(AssetType.OVERLAY_FRONT)
+        back = urls.get(AssetType.OVERLAY_BACK)
+        return json.dumps({
+            "product": {"id": str(rows[0].id), "name": rows[0].name, "fit_type": rows[0].fit_type},
+            "garment": {
+                "overlay_front_url": front,
+                "overlay_back_url": back,
+                "overlay_front_variants": variant_urls(front),
+                "overlay_back_variants": variant_urls(back),
+            },
+        }).encode()
+
+    cached = await catalog_cache.get_or_load("try_garment", {"product_id": product_id, "size": size}, load)
+    return json.loads(cached.body) if cached is not None else None
+
+def missing_profile_fields(profile: Optional[UserProfile]) -> List[str]:
+    if not profile:
+        return ["all"]
+    missing = []
+    if not profile.height_cm: missing.append("height_cm")
+    if not profile.chest_cm: missing.append("chest_cm")
+    if not profile.shoulders_cm: missing.append("shoulders_cm")
+    if not profile.body_photo_url: missing.append("body_photo_url")
+    return missing
+
+def mannequin_manifest(
+    mannequin: Optional[Mannequin], viewport_width: Optional[int] = None, body_type: BodyType = BodyType.DEFAULT
+) -> dict:
+    """
+    `video_url` is the rendition that best fits `viewport_width` (the source
+    video without one); all renditions are listed for clients that adapt.
+    """
+    if not mannequin:
+        return {
+            "body_type": body_type,
+            "video_url": None,
+            "rotation_degrees": DEFAULT_ROTATION_DEGREES,
+            "duration_ms": None,
+            "poster_url": None,
+            "poster_variants": {},
+            "renditions": [],
+        }
+    return {
+        "body_type": body_type,
+        "video_url": mannequin.url_for_width(viewport_width),
+        "rotation_degrees": mannequin.rotation_degrees,
+        "duration_ms": mannequin.duration_ms,
+        "poster_url": mannequin.poster_url,
+        "poster_variants": variant_urls(mannequin.poster_url),
+        "renditions": [
+            {"name": r.name, "width": r.width, "height": r.height, "bitrate_kbps": r.bitrate_kbps, "url": r.url}
+            for r in mannequin.renditions
+        ],
+    }
+
+def build_manifest(profile: UserProfile, garment: dict, mannequin: dict, size: SizeEnum) -> SerializedBody:
+    manifest = {
+        "product": garment["product"],
+        "selected_size": size,
+        "mannequin": mannequin,
+        "personalization": {
+            "skin_tone_hex": profile.skin_tone_hex,
+            "face_crop_url": profile.face_crop_url,
+            "face_crop_variants": variant_urls(profile.face_crop_url),
+        },
+        "garment": garment["garment"],
+    }
+    return SerializedBody.from_bytes(json.dumps(manifest).encode())
@@ -0,0 +1,135 @@
+import re
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import ClientDisconnect
+from uuid import UUID
+
+from app.core import deps
+from app.core.database import get_db
+from app.core.principals import Principal
+from app.modules.uploads import schemas
+from app.storage import local, resumable
+
+router = APIRouter()
+
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+def _status(session: resumable.UploadSession, offset: int) -> schemas.UploadStatus:
+    return schemas.UploadStatus(
+        upload_id=session.id,
+        filename=session.filename,
+        size=session.size,
+        offset=offset,
+        complete=session.sha256 is not None,
+    )
+
+def _offset_response(status: schemas.UploadStatus, response: Response) -> schemas.UploadStatus:
+    response.headers["Upload-Offset"] = str(status.offset)
+    return status
+
+async def _session(upload_id: UUID, owner: UUID) -> resumable.UploadSession:
+    try:
+        return await resumable.get(upload_id, owner)
+    except resumable.UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+def _offset_conflict(offset: int) -> HTTPException:
+    return HTTPException(
+        status_code=409, detail=f"Upload is at offset {offset}", headers={"Upload-Offset": str(offset)}
+    )
+
+@router.post("", response_model=schemas.UploadStatus, status_code=201)
+async def create_upload(
+    upload_in: schemas.UploadCreate,
+    response: Response,
+    current_user: Annotated[Principal, Depends(deps.get_current_active_admin)]
+):
+    """
+    Starts a resumable upload of `size` bytes. Send the content with PUT
+    requests carrying `Content-Range: bytes <start>-<end>/<size>`, then POST
+    /complete with the sha256 of the whole file. Pass the returned
+    `upload_id` to an upload endpoint (mannequin video, garment overlay)
+    instead of a file.
+    """
+    try:
+        session = await resumable.create(current_user.id, upload_in.filename, upload_in.size)
+    except local.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return _offset_response(_status(session, 0), response)
+
+@router.get("/{upload_id}", response_model=schemas.UploadStatus)
+async def get_upload(
+    upload_id: UUID,
+    response: Response,
+    current_user: Annotated[Principal, Depends(deps.get_current_active_admin)]
+):
+    """The offset to resume from after an interrupted chunk."""
+    session = await _session(upload_id, current_user.id)
+    return _offset_response(_status(session, resumable.offset(session)), response)
+
+@router.put("/{upload_id}", response_model=schemas.UploadStatus)
+async def upload_chunk(
+    upload_id: UUID,
+    request: Request,
+    response: Response,
+    content_range: Annotated[str, Header()],
+    current_user: Annotated[Principal, Depends(deps.get_current_active_admin)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    x_chunk_sha256: Annotated[Optional[str], Header()] = None
+):
+    """
+    Appends the request body at `start`, which must be the current offset
+    (409 with the actual `Upload-Offset` otherwise). With `X-Chunk-Sha256`
+    the chunk is only kept if it arrives whole and matches.
+    """
+    match = CONTENT_RANGE.match(content_range)
+    if not match:
+        raise HTTPException(status_code=400, detail="Content-Range must be 'bytes <start>-<end>/<size>'")
+    start, end = int(match.group(1)), int(match.group(2))
+    session = await _session(upload_id, current_user.id)
+    if end < start or match.group(3) not in ("*", str(session.size)):
+        raise HTTPException(status_code=400, detail="Content-Range does not fit this upload")
+    # The chunk may take a while; don't hold a pooled connection meanwhile
+    await db.close()
+
+    async def body():
+        received = 0
+        async for data in request.stream():
+            received += len(data)
+            if received > end - start + 1:
+                raise resumable.ChunkRejected("Body is longer than its Content-Range")
+            yield data
+
+    try:
+        offset = await resumable.append(session, start, body(), x_chunk_sha256)
+    except resumable.OffsetMismatch as e:
+        raise _offset_conflict(e.offset)
+    except resumable.UploadBusy:
+        raise HTTPException(status_code=409, detail="Another chunk of this upload is in progress")
+    except resumable.ChunkRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientDisconnect:
+        # Nobody is listening; what arrived is kept and GET reports it
+        return Response(status_code=400)
+    return _offset_response(_status(session, offset), response)
+
+@router.post("/{upload_id}/complete", response_model=schemas.UploadStatus)
+async def complete_upload(
+    upload_id: UUID,
+    complete_in: schemas.UploadComplete,
+    response: Response,
+    current_user: Annotated[Principal, Depends(deps.get_current_active_admin)]
+):
+    """
+    Verifies the whole file against `sha256`. A mismatch discards the upload
+    (start a new one); missing bytes are a 409 with the current offset.
+    """
+    session = await _session(upload_id, current_user.id)
+    try:
+        session = await resumable.complete(session, complete_in.sha256)
+    except resumable.UploadIncomplete:
+        raise _offset_conflict(resumable.offset(session))
+    except resumable.ChunkRejected as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return _offset_response(_status(session, session.size), response)
@@ -0,0 +1,16 @@
+from uuid import UUID
+from pydantic import BaseModel, Field
+
+class UploadCreate(BaseModel):
+    filename: str = Field(min_length=1, max_length=255)
+    size: int = Field(gt=0)
+
+class UploadComplete(BaseModel):
+    sha256: str = Field(pattern=r"^[0-9a-fA-F]{64}$")
+
+class UploadStatus(BaseModel):
+    upload_id: UUID
+    filename: str
+    size: int
+    offset: int
+    complete: bool
@@ -1,19 +1,21 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, UploadFile, File, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from app.core import deps
+from app.core import config, deps
 from app.core.database import get_db
-from app.db.models import User, UserProfile
-from app.modules.users import schemas, utils
-from app.storage import local
+from app.core.principals import Principal, principals
+from app.core.query_stats import query_budget
+from app.db.models import UserProfile, PhotoStatus
+from app.modules.users import schemas, service
+from app.storage import blobs, local
 
 router = APIRouter()
 
 @router.get("/", response_model=schemas.ProfileResponse)
 async def get_profile(
-    current_user: Annotated[User, Depends(deps.get_current_user)],
+    current_user: Annotated[Principal, Depends(deps.get_current_principal)],
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
     profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == current_user.id))
@@ -27,7 +29,7 @@ async def get_profile(
 @router.put("/", response_model=schemas.ProfileResponse)
 async def update_profile(
     profile_in: schemas.ProfileUpdate,
-    current_user: Annotated[User, Depends(deps.get_current_user)],
+    current_user: Annotated[Principal, Depends(deps.get_current_principal)],
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
     profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == current_user.id))
@@ -39,62 +41,86 @@ async def update_profile(
     check_completion(profile)
     
     await db.commit()
+    await principals.invalidate(current_user.id)
     await db.refresh(profile)
     return profile
 
-@router.post("/upload-body-photo", response_model=schemas.ProfileResponse)
+@router.post(
+    "/upload-body-photo",
+    response_model=schemas.ProfileResponse,
+    responses={202: {"description": "Photo stored, analysis still running"}}
+)
 async def upload_body_photo(
     file: Annotated[UploadFile, File(...)],
-    current_user: Annotated[User, Depends(deps.get_current_user)],
-    db: Annotated[AsyncSession, Depends(get_db)]
+    current_user: Annotated[Principal, Depends(deps.get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    response: Response,
+    background_tasks: BackgroundTasks,
+    defer_processing: bool = False
 ):
-    # 1. Read bytes
-    content = await file.read()
-    
-    # 2. Save Original
-    # Reset cursor for saving if needed, but we pass bytes to processing
-    # Actually save_upload_file usually takes the file object. Let's just use bytes for both to be safe or reset.
-    # We will use our util which takes bytes for processing, but for saving original we can use the bytes too.
-    
-    filename = file.filename or "photo.jpg"
-    body_photo_url = local.save_file_from_bytes(content, f"body_{current_user.id}_{filename}", "bodies")
-    
-    # 3. Process
+    """
+    Stores the body photo and analyzes it (face crop + skin tone) in the photo
+    process pool. Photos analyzed before (same bytes) reuse the stored result.
+    With `defer_processing=true` a new photo returns 202 right after it is
+    stored; poll `GET /profile/body-photo/status` for the result.
+    """
+    # 1. Store the original (content-addressed, size-limited)
     try:
-        face_crop_url, skin_tone_hex = utils.process_body_photo(content)
-    except Exception as e:
-        # Fallback if processing fails? Or error?
-        # User requirement says "Attempt basic face detection", implied soft fail or specific logic.
-        print(f"Error processing photo: {e}")
-        face_crop_url = None
-        skin_tone_hex = "#DZC5B3" # Fallback
-
-    # 4. Update Profile
-    profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == current_user.id))
+        stored = await blobs.store_upload(db, file, max_bytes=config.settings.PHOTO_MAX_UPLOAD_BYTES)
+    except local.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     
-    profile.body_photo_url = body_photo_url
-    if face_crop_url:
-        profile.face_crop_url = face_crop_url
-    if skin_tone_hex:
-        profile.skin_tone_hex = skin_tone_hex
-        
+    # 2. Update Profile
+    profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == current_user.id))
+    await blobs.release(db, profile.body_photo_url)
+    profile.body_photo_url = stored.url
+    profile.face_crop_url = None
     check_completion(profile)
-    
+
+    # 3. Known photos skip decoding entirely; new ones are analyzed once the
+    # photo is committed, so no connection or blob lock waits on the pool
+    result = await service.cached_photo_analysis(db, stored.sha256)
+    if result is not None:
+        service.apply_photo_result(profile, result)
+    else:
+        profile.photo_status = PhotoStatus.PROCESSING
     await db.commit()
+    await principals.invalidate(current_user.id)
+
+    if result is None:
+        if defer_processing:
+            background_tasks.add_task(service.process_body_photo, current_user.id, stored)
+            response.status_code = status.HTTP_202_ACCEPTED
+        else:
+            await service.process_body_photo(current_user.id, stored)
     await db.refresh(profile)
     return profile
 
+@router.get("/body-photo/status", response_model=schemas.PhotoStatusResponse)
+@query_budget(2)
+async def get_body_photo_status(
+    current_user: Annotated[Principal, Depends(deps.get_token_principal)],
+    db: Annotated[AsyncSession, Depends(get_db)]
+):
+    profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == current_user.id))
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
 @router.delete("/body-photo", response_model=schemas.ProfileResponse)
 async def delete_body_photo(
-    current_user: Annotated[User, Depends(deps.get_current_user)],
+    current_user: Annotated[Principal, Depends(deps.get_current_principal)],
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
     profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == current_user.id))
+    await blobs.release(db, profile.body_photo_url)
     profile.body_photo_url = None
     profile.face_crop_url = None
+    profile.photo_status = PhotoStatus.NONE
     profile.profile_completed = False
     
     await db.commit()
+    await principals.invalidate(current_user.id)
     await db.refresh(profile)
     return profile
 
@@ -1,5 +1,7 @@
-from typing import Optional
-from pydantic import BaseModel, HttpUrl
+from typing import Dict, Optional
+from pydantic import BaseModel, HttpUrl, computed_field
+from app.db.models import PhotoStatus
+from app.storage.derivatives import variant_urls
 
 class ProfileUpdate(BaseModel):
     full_name: Optional[str] = None
@@ -18,7 +20,28 @@ class ProfileResponse(BaseModel):
     body_photo_url: Optional[str] = None
     face_crop_url: Optional[str] = None
     skin_tone_hex: Optional[str] = None
+    photo_status: PhotoStatus = PhotoStatus.NONE
     profile_completed: bool
 
+    # Resized variants (thumb/medium/full) for clients that don't need originals
+    @computed_field
+    @property
+    def body_photo_variants(self) -> Dict[str, str]:
+        return variant_urls(self.body_photo_url)
+
+    @computed_field
+    @property
+    def face_crop_variants(self) -> Dict[str, str]:
+        return variant_urls(self.face_crop_url)
+
+    class Config:
+        from_attributes = True
+
+class PhotoStatusResponse(BaseModel):
+    photo_status: PhotoStatus
+    body_photo_url: Optional[str] = None
+    face_crop_url: Optional[str] = None
+    skin_tone_hex: Optional[str] = None
+
     class Config:
         from_attributes = True
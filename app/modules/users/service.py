@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.db.models import UserProfile, PhotoStatus, PhotoAnalysis
+from app.storage import blobs
+from app.storage.local import StoredFile
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_SKIN_TONE = "#DZC5B3"
+
+# (face_crop_url, skin_tone_hex)
+PhotoResult = Tuple[Optional[str], str]
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: forking a process that runs an event loop and threads is unsafe
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.PHOTO_PROCESSING_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.PHOTO_PROCESSING_MAX_CONCURRENCY)
+    return _slots
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+async def analyze_body_photo(file_path: str) -> Optional[Tuple[Optional[bytes], str]]:
+    """
+    Runs utils.process_body_photo_file on a stored photo in the process pool so
+    OpenCV never blocks the event loop. Only the path crosses the process
+    boundary; the worker maps the file itself. At most
+    PHOTO_PROCESSING_MAX_CONCURRENCY photos are in flight per API process;
+    extra callers wait for a slot.
+    Returns (face_crop_jpeg, skin_tone_hex), or None if processing failed.
+    """
+    # OpenCV is only imported by the API process once a photo needs analysis
+    from app.modules.users import utils
+
+    loop = asyncio.get_running_loop()
+    async with _get_slots():
+        try:
+            return await loop.run_in_executor(_get_executor(), utils.process_body_photo_file, file_path)
+        except BrokenProcessPool as e:
+            # A worker died (e.g. OOM on a huge image); start a fresh pool next time
+            logger.error(f"Photo process pool broken: {e}")
+            shutdown()
+            return None
+        except Exception as e:
+            logger.warning(f"Error processing photo: {e}")
+            return None
+
+async def cached_photo_analysis(db: AsyncSession, sha256: str) -> Optional[PhotoResult]:
+    analysis = await db.get(PhotoAnalysis, sha256)
+    if analysis is None:
+        return None
+    return analysis.face_crop_url, analysis.skin_tone_hex
+
+async def record_photo_analysis(
+    db: AsyncSession, sha256: str, raw: Optional[Tuple[Optional[bytes], str]]
+) -> Optional[PhotoResult]:
+    """
+    Memoizes an analysis (from analyze_body_photo) by the photo's sha256, so
+    the same bytes are never decoded twice. The face crop blob is owned by the
+    memo row. Photos released meanwhile are not memoized: nothing would ever
+    drop the row or its crop.
+    """
+    if raw is None:
+        return None
+    face_crop_jpeg, skin_tone_hex = raw
+    if not await blobs.hold(db, sha256):
+        return None
+
+    face_crop_url = None
+    if face_crop_jpeg:
+        face_crop_url = (await blobs.store_bytes(db, face_crop_jpeg, ".jpg")).url
+
+    recorded = await db.scalar(
+        insert(PhotoAnalysis)
+        .values(sha256=sha256, face_crop_url=face_crop_url, skin_tone_hex=skin_tone_hex)
+        .on_conflict_do_nothing()
+        .returning(PhotoAnalysis.sha256)
+    )
+    if recorded is None:
+        # A concurrent upload of the same photo recorded it first
+        await blobs.release(db, face_crop_url)
+        return await cached_photo_analysis(db, sha256)
+    return face_crop_url, skin_tone_hex
+
+def apply_photo_result(profile: UserProfile, result: Optional[PhotoResult]):
+    if result is None:
+        face_crop_url, skin_tone_hex = None, FALLBACK_SKIN_TONE
+        profile.photo_status = PhotoStatus.FAILED
+    else:
+        face_crop_url, skin_tone_hex = result
+        profile.photo_status = PhotoStatus.DONE
+
+    profile.face_crop_url = face_crop_url
+    if skin_tone_hex:
+        profile.skin_tone_hex = skin_tone_hex
+
+async def process_body_photo(user_id: UUID, stored: StoredFile):
+    """
+    Analyzes a photo already committed as the user's body photo and applies
+    the result. No transaction is open during the analysis, which can wait
+    seconds for a pool slot; the result is recorded in a short one of its
+    own. Results are only applied if the profile still points at the photo
+    that was analyzed, so a newer upload is never overwritten by an older
+    one finishing late.
+    """
+    raw = await analyze_body_photo(str(stored.path))
+    async with AsyncSessionLocal() as db:
+        result = await record_photo_analysis(db, stored.sha256, raw)
+        profile = await db.scalar(
+            select(UserProfile).where(UserProfile.user_id == user_id).with_for_update()
+        )
+        if profile and profile.body_photo_url == stored.url:
+            apply_photo_result(profile, result)
+        await db.commit()
@@ -1,64 +1,152 @@
 import cv2
+import mmap
 import numpy as np
-import uuid
-import os
-from pathlib import Path
-from tempfile import NamedTemporaryFile
-from app.storage.local import save_file_from_bytes
-
-# Load Haar Cascade
-# In a real build, we'd ensure this file exists. 
-# OpenCV usually bundles it, or we can use the one from cv2.data
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-
-def process_body_photo(file_bytes: bytes):
+import struct
+from typing import Optional, Tuple
+from app.core.config import settings
+from app.core.resources import resources
+
+def _load_face_cascade():
+    # OpenCV bundles the Haar cascades under cv2.data
+    return cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+# Loaded on first detection, once per process
+resources.register("face_cascade", _load_face_cascade)
+
+def face_cascade() -> cv2.CascadeClassifier:
+    return resources.get("face_cascade")
+
+# JPEG decoders can downscale by 1/2, 1/4 and 1/8 while decoding, which is far
+# cheaper than decoding the full image and resizing it afterwards.
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+    (1, cv2.IMREAD_COLOR),
+)
+
+# Face crops are stored at most this size; no point decoding more pixels for them
+FACE_CROP_MAX_SIDE = 512
+
+class ImageTooLarge(ValueError):
+    pass
+
+def read_image_size(data) -> Optional[Tuple[int, int]]:
     """
-    1. Detect face -> crop -> save
-    2. Extract skin tone
-    Returns: (face_crop_url, skin_tone_hex)
+    Reads (width, height) from a JPEG, PNG or WebP header without decoding
+    pixels. Accepts bytes or an mmap. Returns None for anything else.
     """
-    # Convert bytes to numpy array
-    nparr = np.frombuffer(file_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    if img is None:
-        raise ValueError("Could not decode image")
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        width, height = struct.unpack(">II", data[16:24])
+        return width, height
+
+    if data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+                i += 1 if marker == 0xFF else 2
+                continue
+            (segment_length,) = struct.unpack(">H", data[i + 2:i + 4])
+            # SOF0..SOF15 except DHT (C4), JPG (C8) and DAC (CC)
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", data[i + 5:i + 9])
+                return width, height
+            i += 2 + segment_length
+        return None
 
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L":
+            bits = int.from_bytes(data[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+
+    return None
+
+def check_image_size(data) -> Tuple[int, int]:
+    """
+    Rejects images we can't size from the header, and images whose header
+    declares more pixels than we are willing to decode (decompression bombs).
+    """
+    size = read_image_size(data)
+    if size is None:
+        raise ValueError("Unsupported image format")
+    width, height = size
+    if width <= 0 or height <= 0:
+        raise ValueError("Invalid image dimensions")
+    if max(width, height) > settings.PHOTO_MAX_SIDE or width * height > settings.PHOTO_MAX_PIXELS:
+        raise ImageTooLarge(f"Image is {width}x{height}, above the allowed size")
+    return width, height
+
+def decode_reduced(nparr: np.ndarray, longest_side: int, min_side: int):
+    """
+    Decodes at the largest JPEG reduction factor that still leaves at least
+    `min_side` pixels on the longest side. Non-JPEG formats ignore the reduced
+    flags and decode at full size.
+    """
+    for factor, flag in REDUCED_DECODE_FLAGS:
+        if factor == 1 or longest_side // factor >= min_side:
+            return cv2.imdecode(nparr, flag)
+
+def cap_size(img: np.ndarray, max_side: int) -> np.ndarray:
+    h, w = img.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1:
+        return img
+    return cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+
+def detect_face(img: np.ndarray):
+    """Returns the largest face box (x, y, w, h) in `img` coordinates, or None."""
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, 1.1, 4)
-    
-    face_crop_url = None
+    faces = face_cascade().detectMultiScale(gray, 1.1, 4)
+    if len(faces) == 0:
+        return None
+    return max(faces, key=lambda r: r[2] * r[3])
+
+def crop_face(nparr: np.ndarray, longest_side: int, detection_img: np.ndarray, box) -> Optional[np.ndarray]:
+    """
+    Crops the face found on the detection image from a higher resolution decode.
+    Only as much resolution as the stored crop needs is decoded.
+    """
+    x, y, w, h = box
+    det_h, det_w = detection_img.shape[:2]
+    # Smallest decode in which the face is at least FACE_CROP_MAX_SIDE wide
+    needed_side = -(-FACE_CROP_MAX_SIDE * max(det_w, det_h) // max(int(w), 1))
+    img = decode_reduced(nparr, longest_side, min(needed_side, longest_side))
+    if img is None:
+        return None
+
+    # Map the box using the decoded shapes (EXIF rotation may swap axes)
+    sy, sx = img.shape[0] / det_h, img.shape[1] / det_w
+    x0, y0 = int(x * sx), int(y * sy)
+    x1, y1 = int((x + w) * sx), int((y + h) * sy)
+    return cap_size(img[y0:y1, x0:x1], FACE_CROP_MAX_SIDE)
+
+def sample_skin_tone(img: np.ndarray, face) -> str:
+    """Mean colour of the face centre, or of the upper body when no face was found."""
     skin_tone_hex = "#DZC5B3" # Default fallback
-    
-    skin_sample_region = None
-    
-    if len(faces) > 0:
-        # Pick largest face
-        (x, y, w, h) = max(faces, key=lambda r: r[2] * r[3])
-        
-        # Crop face
-        face_img = img[y:y+h, x:x+w]
-        
-        # Save face crop
-        # Encode back to jpg
-        success, buffer = cv2.imencode(".jpg", face_img)
-        if success:
-            face_filename = f"face_{uuid.uuid4()}.jpg"
-            face_crop_url = save_file_from_bytes(buffer.tobytes(), face_filename, "faces")
-            
+
+    if face is not None:
         # Sample region for skin tone: center of the face
-        center_x, center_y = w // 2, h // 2
+        (x, y, w, h) = face
+        center_x, center_y = x + w // 2, y + h // 2
         sw, sh = w // 4, h // 4 # small window
-        skin_sample_region = face_img[center_y-sh:center_y+sh, center_x-sw:center_x+sw]
-        
     else:
         # No face, fallback to center of upper body
         h, w, _ = img.shape
         center_x, center_y = w // 2, h // 4
         sw, sh = w // 8, h // 8
-        skin_sample_region = img[center_y-sh:center_y+sh, center_x-sw:center_x+sw]
+    skin_sample_region = img[center_y-sh:center_y+sh, center_x-sw:center_x+sw]
 
-    if skin_sample_region is not None and skin_sample_region.size > 0:
+    if skin_sample_region.size > 0:
         # Calculate mean color
         avg_color_per_row = np.average(skin_sample_region, axis=0)
         avg_color = np.average(avg_color_per_row, axis=0)
@@ -66,4 +154,54 @@ def process_body_photo(file_bytes: bytes):
         b, g, r = int(avg_color[0]), int(avg_color[1]), int(avg_color[2])
         skin_tone_hex = "#{:02x}{:02x}{:02x}".format(r, g, b)
 
-    return face_crop_url, skin_tone_hex
+    return skin_tone_hex
+
+def process_body_photo_file(file_path: str):
+    """
+    process_body_photo on a stored upload, read through mmap so the file is
+    paged in on demand instead of copied into memory. The mapping is released
+    together with its last reference.
+    """
+    with open(file_path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return process_body_photo(data)
+
+def process_body_photo(file_bytes):
+    """
+    1. Detect face -> crop -> encode
+    2. Extract skin tone
+    Returns: (face_crop_jpeg, skin_tone_hex)
+
+    Nothing is written to storage here so the function stays pure and can run
+    in any worker process; the caller stores the crop.
+
+    Detection and skin sampling run on a reduced decode capped at
+    PHOTO_DETECTION_MAX_SIDE; only the face crop is taken at higher resolution.
+    """
+    width, height = check_image_size(file_bytes)
+    longest_side = max(width, height)
+
+    # Convert bytes to numpy array
+    nparr = np.frombuffer(file_bytes, np.uint8)
+    img = decode_reduced(nparr, longest_side, settings.PHOTO_DETECTION_MAX_SIDE)
+
+    if img is None:
+        raise ValueError("Could not decode image")
+
+    img = cap_size(img, settings.PHOTO_DETECTION_MAX_SIDE)
+    face = detect_face(img)
+
+    face_crop_jpeg = None
+    if face is not None:
+        # Crop face at the resolution the stored crop needs
+        face_img = crop_face(nparr, longest_side, img, face)
+
+        # Encode back to jpg
+        if face_img is not None and face_img.size > 0:
+            success, buffer = cv2.imencode(".jpg", face_img)
+            if success:
+                face_crop_jpeg = buffer.tobytes()
+
+    skin_tone_hex = sample_skin_tone(img, face)
+
+    return face_crop_jpeg, skin_tone_hex
@@ -0,0 +1,225 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+from fastapi import UploadFile
+from sqlalchemy import delete, event, exists, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.db.models import PhotoAnalysis, StoredBlob
+from app.storage import derivatives, local
+
+INCOMING_FOLDER = "blobs/.incoming"
+
+BLOB_URL_PREFIX = "/static/uploads/blobs/"
+
+class BlobNotFound(Exception):
+    pass
+
+def blob_url(sha256: str, extension: str) -> str:
+    return f"{BLOB_URL_PREFIX}{sha256[:2]}/{sha256}{extension.lower()}"
+
+def is_blob_url(url: Optional[str]) -> bool:
+    return bool(url) and url.startswith(BLOB_URL_PREFIX)
+
+def _place(dest: Path, tmp_path: Optional[Path] = None, data: Optional[bytes] = None):
+    """Moves new content into its blob path, or drops it if already stored."""
+    if dest.exists():
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+        return
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if data is not None:
+        fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix=".blob-")
+        with os.fdopen(fd, "wb") as buffer:
+            buffer.write(data)
+        tmp_path = Path(tmp)
+    os.replace(tmp_path, dest)
+
+async def _lock(db: AsyncSession, *sha256s: str):
+    """
+    Serializes acquiring and releasing the same content until the transaction
+    ends, so a release can't unlink a file a concurrent upload just re-acquired.
+    Sorted to keep batch uploads from deadlocking each other.
+    """
+    for sha256 in sorted(set(sha256s)):
+        await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:sha256))"), {"sha256": sha256})
+
+async def _acquire(db: AsyncSession, sha256: str, extension: str, size: int) -> str:
+    await _lock(db, sha256)
+    stmt = insert(StoredBlob).values(
+        sha256=sha256, url=blob_url(sha256, extension), size=size, ref_count=1
+    ).on_conflict_do_update(
+        index_elements=[StoredBlob.sha256],
+        set_={"ref_count": StoredBlob.ref_count + 1}
+    ).returning(StoredBlob.url)
+    return await db.scalar(stmt)
+
+async def store_upload(db: AsyncSession, upload_file: UploadFile, max_bytes: Optional[int] = None) -> local.StoredFile:
+    """
+    Streams an upload into the content-addressed store and takes one reference
+    on it. Re-uploading known bytes keeps the existing file and URL.
+    The reference is part of the caller's transaction.
+    """
+    incoming = await local.stream_upload_file(upload_file, INCOMING_FOLDER, max_bytes=max_bytes)
+    extension = Path(upload_file.filename or "").suffix
+    try:
+        url = await _acquire(db, incoming.sha256, extension, incoming.size)
+    except BaseException:
+        await run_in_threadpool(incoming.path.unlink, missing_ok=True)
+        raise
+    dest = local.url_to_path(url)
+    await run_in_threadpool(_place, dest, incoming.path)
+    return local.StoredFile(url=url, path=dest, sha256=incoming.sha256, size=incoming.size)
+
+async def store_uploads(
+    db: AsyncSession, upload_files: List[UploadFile], max_bytes: Optional[int] = None
+) -> List[local.StoredFile]:
+    """
+    store_upload for several files at once: all files are streamed to disk
+    concurrently, then one statement takes a reference per file (identical
+    files in the batch count once each). Results follow the input order.
+    """
+    results = await asyncio.gather(
+        *(local.stream_upload_file(f, INCOMING_FOLDER, max_bytes=max_bytes) for f in upload_files),
+        return_exceptions=True,
+    )
+    incoming = [r for r in results if isinstance(r, local.StoredFile)]
+    failed = next((r for r in results if isinstance(r, BaseException)), None)
+    try:
+        if failed is not None:
+            raise failed
+        extensions = [Path(f.filename or "").suffix for f in upload_files]
+        refs = Counter(stored.sha256 for stored in incoming)
+        first = {}
+        for stored, extension in zip(incoming, extensions):
+            first.setdefault(stored.sha256, (stored.size, extension))
+        await _lock(db, *first)
+        stmt = insert(StoredBlob)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[StoredBlob.sha256],
+            set_={"ref_count": StoredBlob.ref_count + stmt.excluded.ref_count}
+        ).returning(StoredBlob.sha256, StoredBlob.url)
+        urls = dict((await db.execute(stmt, [
+            {"sha256": sha256, "url": blob_url(sha256, extension), "size": size, "ref_count": refs[sha256]}
+            for sha256, (size, extension) in first.items()
+        ])).all())
+    except BaseException:
+        for stored in incoming:
+            await run_in_threadpool(stored.path.unlink, missing_ok=True)
+        raise
+
+    placed = []
+    for stored in incoming:
+        url = urls[stored.sha256]
+        placed.append(local.StoredFile(url=url, path=local.url_to_path(url), sha256=stored.sha256, size=stored.size))
+    # Sequential on purpose: duplicates in the batch share a destination
+    for stored, final in zip(incoming, placed):
+        await run_in_threadpool(_place, final.path, stored.path)
+    return placed
+
+async def store_file(db: AsyncSession, path: Path, sha256: str, size: int, extension: str) -> local.StoredFile:
+    """
+    store_upload for a file already on the upload volume whose hash is known
+    (e.g. a finished resumable upload). The file is moved, not copied.
+    """
+    url = await _acquire(db, sha256, extension, size)
+    dest = local.url_to_path(url)
+    await run_in_threadpool(_place, dest, path)
+    return local.StoredFile(url=url, path=dest, sha256=sha256, size=size)
+
+async def store_bytes(db: AsyncSession, data: bytes, extension: str) -> local.StoredFile:
+    """store_upload for content produced in-process (e.g. face crops)."""
+    sha256 = hashlib.sha256(data).hexdigest()
+    url = await _acquire(db, sha256, extension, len(data))
+    dest = local.url_to_path(url)
+    await run_in_threadpool(_place, dest, data=data)
+    return local.StoredFile(url=url, path=dest, sha256=sha256, size=len(data))
+
+async def hold(db: AsyncSession, sha256: str) -> bool:
+    """
+    Keeps a stored blob from being released until the transaction ends, for
+    rows about to depend on it without a reference. False if it is gone.
+    """
+    await _lock(db, sha256)
+    return await db.scalar(select(exists().where(StoredBlob.sha256 == sha256)))
+
+async def retain(db: AsyncSession, url: Optional[str]):
+    """
+    Takes one more reference on an already stored blob URL, for rows that
+    point at it without uploading (e.g. bulk imports). Other URLs are ignored.
+    Raises BlobNotFound if the blob was released (or never stored).
+    """
+    if not is_blob_url(url):
+        return
+    await _lock(db, Path(url).stem)
+    retained = await db.scalar(
+        update(StoredBlob).where(StoredBlob.url == url)
+        .values(ref_count=StoredBlob.ref_count + 1)
+        .returning(StoredBlob.url)
+    )
+    if retained is None:
+        raise BlobNotFound(f"{url} is not a stored file")
+
+async def release(db: AsyncSession, url: Optional[str]):
+    """
+    Drops one reference to a blob URL. When the last reference goes, the row is
+    deleted and the file is moved aside while the blob lock is held, then
+    unlinked once the transaction commits (or put back on rollback). URLs
+    that are not blobs (legacy uploads, external links) are ignored.
+    """
+    if not is_blob_url(url):
+        return
+    sha256 = Path(url).stem
+    await _lock(db, sha256)
+    ref_count = await db.scalar(
+        update(StoredBlob)
+        .where(StoredBlob.url == url, StoredBlob.ref_count > 0)
+        .values(ref_count=StoredBlob.ref_count - 1)
+        .returning(StoredBlob.ref_count)
+    )
+    if ref_count != 0:
+        return
+    deleted = await db.scalar(
+        delete(StoredBlob)
+        .where(StoredBlob.url == url, StoredBlob.ref_count == 0)
+        .returning(StoredBlob.url)
+    )
+    if not deleted:
+        return
+    # A photo's analysis memo owns a reference to its face crop; neither
+    # outlives the photo
+    face_crop_url = await db.scalar(
+        delete(PhotoAnalysis).where(PhotoAnalysis.sha256 == sha256).returning(PhotoAnalysis.face_crop_url)
+    )
+    await release(db, face_crop_url)
+    # Once the lock is released, an upload of the same content must find the
+    # path free and place its own copy, not one we are about to unlink
+    path = local.url_to_path(url)
+    released = path.with_name(f".released-{uuid.uuid4().hex}-{path.name}")
+    try:
+        await run_in_threadpool(os.replace, path, released)
+    except FileNotFoundError:
+        released = None
+    db.sync_session.info.setdefault("released_blobs", []).append((url, path, released))
+
+@event.listens_for(Session, "after_commit")
+def _unlink_released_blobs(session: Session):
+    for url, _, released in session.info.pop("released_blobs", []):
+        if released is not None:
+            released.unlink(missing_ok=True)
+        derivatives.cache.purge(url)
+
+@event.listens_for(Session, "after_rollback")
+def _keep_released_blobs(session: Session):
+    for _, path, released in session.info.pop("released_blobs", []):
+        if released is not None:
+            # A concurrent upload may have placed the same bytes meanwhile
+            os.replace(released, path)
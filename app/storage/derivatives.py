@@ -0,0 +1,184 @@
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from app.core.config import settings
+
+# Longest side in pixels per variant; "full" only re-encodes (capped for sanity)
+VARIANTS = {"thumb": 160, "medium": 640, "full": 2048}
+# Extension, encoder quality flag (looked up on cv2 when rendering), quality
+FORMATS = {
+    "webp": (".webp", "IMWRITE_WEBP_QUALITY", 80),
+    "jpg": (".jpg", "IMWRITE_JPEG_QUALITY", 82),
+}
+SOURCE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+DERIVATIVES_FOLDER = "derivatives"
+
+class DerivativeNotFound(Exception):
+    pass
+
+def variant_urls(url: Optional[str], fmt: str = "webp") -> Dict[str, str]:
+    """
+    URLs of every resized variant of an uploaded image. Variants are generated
+    on first request by the media endpoint, so this never touches the disk.
+    """
+    if not url or not url.startswith("/static/uploads/"):
+        return {}
+    if Path(url).suffix.lower() not in SOURCE_EXTENSIONS:
+        return {}
+    source = url[len("/static/uploads/"):]
+    return {
+        variant: f"{settings.API_V1_STR}/media/{variant}.{fmt}/{source}"
+        for variant in VARIANTS
+    }
+
+def _source_path(source: str) -> Path:
+    root = Path(settings.UPLOAD_DIR).resolve()
+    path = (root / source).resolve()
+    if root not in path.parents or path.suffix.lower() not in SOURCE_EXTENSIONS:
+        raise DerivativeNotFound(source)
+    if source.startswith(DERIVATIVES_FOLDER + "/"):
+        raise DerivativeNotFound(source)
+    return path
+
+def _check_source_size(source_path: Path):
+    """Refuses sources whose header declares more pixels than uploads may have."""
+    import mmap
+
+    from app.modules.users.utils import check_image_size
+
+    with open(source_path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        check_image_size(data)
+    except ValueError:
+        # Also raised for ImageTooLarge: never decode what we can't size
+        raise DerivativeNotFound(str(source_path))
+    finally:
+        data.close()
+
+def _render(source_path: Path, dest: Path, max_side: int, fmt: str):
+    # OpenCV is imported on the first miss, not when the API starts
+    import cv2
+    import numpy as np
+
+    _check_source_size(source_path)
+    img = cv2.imread(str(source_path), cv2.IMREAD_UNCHANGED)
+    if img is None:
+        raise DerivativeNotFound(str(source_path))
+
+    h, w = img.shape[:2]
+    scale = max_side / max(h, w)
+    if scale < 1:
+        img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+
+    if fmt == "jpg" and img.ndim == 3 and img.shape[2] == 4:
+        # JPEG has no alpha: flatten garment overlays onto white
+        alpha = img[..., 3:4].astype(np.float32) / 255
+        img = (img[..., :3] * alpha + 255 * (1 - alpha)).astype(np.uint8)
+
+    extension, quality_flag, quality = FORMATS[fmt]
+    success, buffer = cv2.imencode(extension, img, [getattr(cv2, quality_flag), quality])
+    if not success:
+        raise DerivativeNotFound(str(source_path))
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix=".derivative-")
+    with os.fdopen(fd, "wb") as out:
+        out.write(buffer.tobytes())
+    os.replace(tmp, dest)
+    return dest.stat().st_size
+
+class DerivativeCache:
+    """
+    On-disk cache of resized variants, bounded to DERIVATIVE_CACHE_MAX_BYTES.
+    Hits refresh the file mtime; when a new variant pushes the total over the
+    limit the least recently used files are evicted. The total is tracked per
+    process and re-synced from disk on every eviction pass.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._total: Optional[int] = None
+
+    @property
+    def root(self) -> Path:
+        return Path(settings.UPLOAD_DIR) / DERIVATIVES_FOLDER
+
+    def _files(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = Path(dirpath) / name
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                yield path, st
+
+    def _evict(self, keep: Path):
+        files = sorted(self._files(), key=lambda f: f[1].st_mtime)
+        total = sum(st.st_size for _, st in files)
+        limit = settings.DERIVATIVE_CACHE_MAX_BYTES
+        for path, st in files:
+            if total <= limit:
+                break
+            if path == keep:
+                # Never evict the variant about to be served
+                continue
+            path.unlink(missing_ok=True)
+            total -= st.st_size
+        self._total = total
+
+    def get(self, variant: str, fmt: str, source: str) -> Path:
+        """Returns the variant file, generating it on a miss. Blocking; run in a thread."""
+        if variant not in VARIANTS or fmt not in FORMATS:
+            raise DerivativeNotFound(variant)
+        source_path = _source_path(source)
+        dest = self.root / variant / f"{source}{FORMATS[fmt][0]}"
+
+        # Checked first: variants of a deleted source must stop being served
+        if not source_path.exists():
+            raise DerivativeNotFound(source)
+        if dest.exists():
+            os.utime(dest)
+            return dest
+
+        size = _render(source_path, dest, VARIANTS[variant], fmt)
+        with self._lock:
+            if self._total is None:
+                self._evict(keep=dest)
+            else:
+                self._total += size
+                if self._total > settings.DERIVATIVE_CACHE_MAX_BYTES:
+                    self._evict(keep=dest)
+        return dest
+
+    def purge(self, url: Optional[str]):
+        """Deletes every cached variant of an upload (e.g. once its blob is released)."""
+        if not url or not url.startswith("/static/uploads/"):
+            return
+        source = url[len("/static/uploads/"):]
+        for variant in VARIANTS:
+            for extension, _, _ in FORMATS.values():
+                (self.root / variant / f"{source}{extension}").unlink(missing_ok=True)
+
+    def warm(self, url: Optional[str], fmt: str = "webp"):
+        """Generates every variant of an upload ahead of the first request."""
+        if not url or not url.startswith("/static/uploads/"):
+            return
+        source = url[len("/static/uploads/"):]
+        for variant in VARIANTS:
+            try:
+                self.get(variant, fmt, source)
+            except DerivativeNotFound:
+                return
+
+    def warm_many(self, urls: Iterable[Optional[str]], fmt: str = "webp"):
+        """warm for a batch of uploads, each distinct URL once."""
+        for url in dict.fromkeys(urls):
+            self.warm(url, fmt)
+
+cache = DerivativeCache()
@@ -1,32 +1,104 @@
-import shutil
+import hashlib
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
 
-def save_upload_file(upload_file: UploadFile, sub_folder: str) -> str:
+CHUNK_SIZE = 1024 * 1024
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+@dataclass
+class StoredFile:
+    url: str
+    path: Path
+    sha256: str
+    size: int
+
+def _write_chunk(buffer, hasher, chunk: bytes):
+    # hashlib releases the GIL for large buffers, so hashing in the worker
+    # thread keeps it off the event loop along with the write
+    hasher.update(chunk)
+    buffer.write(chunk)
+
+def _discard(tmp_path: str):
+    try:
+        os.unlink(tmp_path)
+    except FileNotFoundError:
+        pass
+
+async def stream_upload_file(
+    upload_file: UploadFile,
+    sub_folder: str,
+    filename: Optional[str] = None,
+    max_bytes: Optional[int] = None
+) -> StoredFile:
+    """
+    Copies an upload to disk chunk by chunk without blocking the event loop.
+    The content is hashed and size-checked while streaming into a temp file in
+    the destination folder, which is then atomically renamed into place, so a
+    failed or oversized upload never leaves a partial file behind.
+    """
+    max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
     path = Path(settings.UPLOAD_DIR) / sub_folder
-    path.mkdir(parents=True, exist_ok=True)
-    
-    # Generate unique filename to avoid collisions? For now just use original name as per req implying simplicity or prepend UUID.
-    # Safe simple approach: timestamp or uuid prepend
-    import uuid
-    extension = Path(upload_file.filename).suffix
-    new_filename = f"{uuid.uuid4()}{extension}"
-    dest_path = path / new_filename
-    
-    with dest_path.open("wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
-        
+    await run_in_threadpool(path.mkdir, parents=True, exist_ok=True)
+
+    if filename is None:
+        extension = Path(upload_file.filename or "").suffix
+        filename = f"{uuid.uuid4()}{extension}"
+    # Never let a client-supplied name escape the folder
+    filename = Path(filename).name
+
+    fd, tmp_path = tempfile.mkstemp(dir=path, prefix=".upload-")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := await upload_file.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                await run_in_threadpool(_write_chunk, buffer, hasher, chunk)
+        dest_path = path / filename
+        await run_in_threadpool(os.replace, tmp_path, dest_path)
+    except BaseException:
+        await run_in_threadpool(_discard, tmp_path)
+        raise
+
     # Return relative URL compliant with StaticFiles mount
     # Mounted at /static/uploads
-    return f"/static/uploads/{sub_folder}/{new_filename}"
+    return StoredFile(
+        url=f"/static/uploads/{sub_folder}/{filename}",
+        path=dest_path,
+        sha256=hasher.hexdigest(),
+        size=size
+    )
+
+async def save_upload_file(upload_file: UploadFile, sub_folder: str) -> str:
+    stored = await stream_upload_file(upload_file, sub_folder)
+    return stored.url
+
+def url_to_path(url: str) -> Optional[Path]:
+    """Maps a /static/uploads/... URL back to its file, or None for other URLs."""
+    prefix = "/static/uploads/"
+    if not url or not url.startswith(prefix):
+        return None
+    return Path(settings.UPLOAD_DIR) / url[len(prefix):]
 
 def save_file_from_bytes(data: bytes, filename: str, sub_folder: str) -> str:
     path = Path(settings.UPLOAD_DIR) / sub_folder
     path.mkdir(parents=True, exist_ok=True)
-    
+
     dest_path = path / filename
     with dest_path.open("wb") as buffer:
         buffer.write(data)
-        
+
     return f"/static/uploads/{sub_folder}/{filename}"
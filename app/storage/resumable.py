@@ -0,0 +1,233 @@
+"""
+Resumable uploads: create a session with the final size, append chunks at
+the current offset (one request per chunk, any size), then complete with
+the sha256 of the whole file. A dropped connection only loses the chunk in
+flight; the client asks for the offset and carries on from there.
+
+State lives next to the data on the upload volume (a JSON file and the
+partial file), so every API replica sharing the volume can take the next
+chunk, and the offset is simply the size of the partial file.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.storage import blobs, local
+
+SESSIONS_FOLDER = "blobs/.resumable"
+
+class UploadNotFound(Exception):
+    pass
+
+class UploadBusy(Exception):
+    """Another request is appending to this upload right now."""
+
+class OffsetMismatch(Exception):
+    def __init__(self, offset: int):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+class ChunkRejected(Exception):
+    pass
+
+class UploadIncomplete(Exception):
+    pass
+
+@dataclass
+class UploadSession:
+    id: str
+    owner: str
+    filename: str
+    size: int
+    created_at: float
+    # Set once complete() has verified the content
+    sha256: Optional[str] = None
+
+    @property
+    def extension(self) -> str:
+        return Path(self.filename).suffix
+
+def _folder() -> Path:
+    return Path(settings.UPLOAD_DIR) / SESSIONS_FOLDER
+
+def _meta_path(upload_id: str) -> Path:
+    return _folder() / f"{upload_id}.json"
+
+def _data_path(upload_id: str) -> Path:
+    return _folder() / f"{upload_id}.part"
+
+def _save(session: UploadSession):
+    tmp = _meta_path(session.id).with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(asdict(session)))
+    os.replace(tmp, _meta_path(session.id))
+
+def _load(upload_id: UUID, owner: UUID) -> UploadSession:
+    try:
+        session = UploadSession(**json.loads(_meta_path(str(upload_id)).read_text()))
+    except FileNotFoundError:
+        raise UploadNotFound(upload_id)
+    if session.owner != str(owner) or _expired(session):
+        raise UploadNotFound(upload_id)
+    return session
+
+def _expired(session: UploadSession) -> bool:
+    return time.time() - session.created_at > settings.RESUMABLE_UPLOAD_TTL_SECONDS
+
+def _discard(upload_id: str):
+    _data_path(upload_id).unlink(missing_ok=True)
+    _meta_path(upload_id).unlink(missing_ok=True)
+
+def purge_expired():
+    """Drops abandoned sessions. Cheap; runs whenever a session is created."""
+    folder = _folder()
+    if not folder.exists():
+        return
+    for meta in folder.glob("*.json"):
+        try:
+            session = UploadSession(**json.loads(meta.read_text()))
+        except (FileNotFoundError, ValueError, TypeError):
+            continue
+        if _expired(session):
+            _discard(session.id)
+
+def offset(session: UploadSession) -> int:
+    try:
+        return _data_path(session.id).stat().st_size
+    except FileNotFoundError:
+        return 0
+
+async def create(owner: UUID, filename: str, size: int) -> UploadSession:
+    if size > settings.MAX_UPLOAD_BYTES:
+        raise local.UploadTooLarge(settings.MAX_UPLOAD_BYTES)
+    session = UploadSession(
+        id=str(uuid.uuid4()), owner=str(owner), filename=Path(filename).name, size=size, created_at=time.time()
+    )
+
+    def setup():
+        _folder().mkdir(parents=True, exist_ok=True)
+        purge_expired()
+        _data_path(session.id).touch()
+        _save(session)
+
+    await run_in_threadpool(setup)
+    return session
+
+async def get(upload_id: UUID, owner: UUID) -> UploadSession:
+    return await run_in_threadpool(_load, upload_id, owner)
+
+def _open_for_append(session: UploadSession):
+    fd = os.open(_data_path(session.id), os.O_WRONLY | os.O_APPEND)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        raise UploadBusy(session.id)
+    return os.fdopen(fd, "ab")
+
+def _truncate(buffer, length: int):
+    buffer.flush()
+    os.ftruncate(buffer.fileno(), length)
+
+async def append(
+    session: UploadSession, start: int, chunks: AsyncIterator[bytes], chunk_sha256: Optional[str] = None
+) -> int:
+    """
+    Appends a streamed chunk that must begin at the current offset and
+    returns the new offset. Without `chunk_sha256`, bytes received before a
+    dropped connection are kept (the client resumes after them); with it,
+    the chunk is kept only if it arrives whole and matches.
+    """
+    if session.sha256 is not None:
+        raise ChunkRejected("Upload is already complete")
+    buffer = await run_in_threadpool(_open_for_append, session)
+    try:
+        current = await run_in_threadpool(os.fstat, buffer.fileno())
+        if start != current.st_size:
+            raise OffsetMismatch(current.st_size)
+        hasher = hashlib.sha256()
+        written = start
+        try:
+            async for data in chunks:
+                written += len(data)
+                if written > session.size:
+                    raise ChunkRejected(f"Chunk goes past the declared size of {session.size} bytes")
+                await run_in_threadpool(local._write_chunk, buffer, hasher, data)
+            if chunk_sha256 is not None and hasher.hexdigest() != chunk_sha256.lower():
+                raise ChunkRejected("Chunk sha256 does not match")
+        except BaseException as e:
+            if chunk_sha256 is not None or isinstance(e, ChunkRejected):
+                await run_in_threadpool(_truncate, buffer, start)
+            raise
+        await run_in_threadpool(buffer.flush)
+        return written
+    finally:
+        await run_in_threadpool(buffer.close)
+
+def _file_sha256(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(local.CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+async def complete(session: UploadSession, sha256: str) -> UploadSession:
+    """Checks that every byte arrived and matches `sha256`; the upload can then be claimed."""
+    if session.sha256 is not None:
+        return session
+    received = offset(session)
+    if received != session.size:
+        raise UploadIncomplete(f"Received {received} of {session.size} bytes")
+    actual = await run_in_threadpool(_file_sha256, _data_path(session.id))
+    if actual != sha256.lower():
+        # The content is wrong somewhere; start over rather than keep bad bytes
+        await run_in_threadpool(_discard, session.id)
+        raise ChunkRejected("File sha256 does not match, upload discarded")
+    session.sha256 = actual
+    await run_in_threadpool(_save, session)
+    return session
+
+def _claim_link(upload_id: str) -> Path:
+    link = _folder() / f"{upload_id}.claim-{uuid.uuid4().hex}"
+    os.link(_data_path(upload_id), link)
+    return link
+
+async def claim(db: AsyncSession, upload_id: UUID, owner: UUID) -> local.StoredFile:
+    """
+    Puts a completed upload into the blob store with one reference, like
+    blobs.store_upload. Part of the caller's transaction: the session ends
+    when it commits, and stays claimable if it rolls back.
+    """
+    session = await get(upload_id, owner)
+    if session.sha256 is None:
+        raise UploadIncomplete("Upload is not complete")
+    # The blob store takes a hard link, so the partial file survives a rollback
+    link = await run_in_threadpool(_claim_link, session.id)
+    try:
+        stored = await blobs.store_file(db, link, session.sha256, session.size, session.extension)
+    except BaseException:
+        await run_in_threadpool(link.unlink, missing_ok=True)
+        raise
+    db.sync_session.info.setdefault("claimed_uploads", []).append(session.id)
+    return stored
+
+@event.listens_for(Session, "after_commit")
+def _discard_claimed_uploads(session: Session):
+    for upload_id in session.info.pop("claimed_uploads", []):
+        _discard(upload_id)
+
+@event.listens_for(Session, "after_rollback")
+def _keep_claimed_uploads(session: Session):
+    session.info.pop("claimed_uploads", None)
@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import logging
+import shutil
+from pathlib import Path
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.core.database import standalone_session
+from app.db.models import MannequinAsset, MannequinRendition, VideoStatus
+from app.modules.catalog.mannequins import mannequins
+from app.storage import local
+from app.worker import video
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_FOLDER = "renditions"
+
+def _source_key(video_url: str) -> str:
+    # Blob URLs are named by content hash already; other URLs get hashed
+    if video_url.startswith("/static/uploads/blobs/"):
+        return Path(video_url).stem
+    return hashlib.sha256(video_url.encode()).hexdigest()[:32]
+
+async def _load(db, mannequin_id: UUID, for_update: bool = False) -> MannequinAsset:
+    query = (
+        select(MannequinAsset).where(MannequinAsset.id == mannequin_id)
+        .options(selectinload(MannequinAsset.renditions))
+    )
+    if for_update:
+        query = query.with_for_update(of=MannequinAsset)
+    return await db.scalar(query)
+
+async def _set_status(mannequin_id: UUID, video_url: str, status: VideoStatus) -> bool:
+    """Returns False if the mannequin is gone or points at another video by now."""
+    async with standalone_session() as db:
+        asset = await _load(db, mannequin_id)
+        if not asset or asset.video_url != video_url:
+            return False
+        asset.video_status = status
+        await db.commit()
+        return True
+
+async def _ingest(mannequin_id: UUID, video_url: str):
+    if not await _set_status(mannequin_id, video_url, VideoStatus.PROCESSING):
+        logger.info(f"Mannequin {mannequin_id} no longer uses {video_url}, skipping")
+        return
+
+    path = local.url_to_path(video_url)
+    # Remote URLs are read by OpenCV's FFmpeg backend directly
+    source = str(path) if path is not None else video_url
+    mannequin_dir = Path(settings.UPLOAD_DIR) / RENDITIONS_FOLDER / str(mannequin_id)
+    dest_dir = mannequin_dir / _source_key(video_url)
+    try:
+        info = video.probe(source)
+        renditions, poster, frames = video.transcode(source, dest_dir, info)
+    except Exception as e:
+        logger.error(f"Mannequin {mannequin_id}: ingestion of {video_url} failed: {e}")
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        await _set_status(mannequin_id, video_url, VideoStatus.FAILED)
+        mannequins.publish_blocking()
+        return
+
+    def url(file: Path) -> str:
+        return f"/static/uploads/{file.relative_to(Path(settings.UPLOAD_DIR)).as_posix()}"
+
+    async with standalone_session() as db:
+        # Locked until commit: a re-upload can't change video_url (and start a
+        # newer job) while we decide which renditions are stale
+        asset = await _load(db, mannequin_id, for_update=True)
+        if not asset or asset.video_url != video_url:
+            # Replaced while we were transcoding; the newer job takes over
+            shutil.rmtree(dest_dir, ignore_errors=True)
+            return
+        info.frame_count = frames
+        asset.duration_ms = info.duration_ms
+        asset.fps = info.fps
+        asset.width = info.width
+        asset.height = info.height
+        asset.poster_url = url(poster)
+        asset.renditions = [
+            MannequinRendition(name=r.name, width=r.width, height=r.height, bitrate_kbps=r.bitrate_kbps, url=url(r.path))
+            for r in renditions
+        ]
+        asset.video_status = VideoStatus.DONE
+        # Renditions of videos this mannequin no longer uses. Jobs for them
+        # are stale: they bail out at their own final check
+        for old in mannequin_dir.iterdir():
+            if old != dest_dir:
+                shutil.rmtree(old, ignore_errors=True)
+        await db.commit()
+
+    mannequins.publish_blocking()
+    logger.info(
+        f"Mannequin {mannequin_id}: {info.width}x{info.height} {info.duration_ms} ms, "
+        f"renditions {[r.name for r in renditions]}"
+    )
+
+def ingest_mannequin_video(mannequin_id: str, video_url: str):
+    """
+    RQ task: probes a mannequin video, fills duration/fps/size, and records
+    its renditions and poster frame. Stale jobs (the mannequin got another
+    video since) do nothing.
+    """
+    asyncio.run(_ingest(UUID(mannequin_id), video_url))
@@ -2,7 +2,7 @@ import sys
 import os
 from redis import Redis
 from rq import Worker, Queue, Connection
-from app.core import config
+from app.core import config, metrics
 import logging
 
 # Ensure python path includes app
@@ -11,7 +11,17 @@ sys.path.append(os.getcwd())
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-listen = ['renders']
+listen = ['renders', 'media']
+
+class MetricsWorker(Worker):
+    """Folds each work horse's metric files into the worker's once it exits."""
+
+    def monitor_work_horse(self, job, queue):
+        horse_pid = self.horse_pid
+        try:
+            super().monitor_work_horse(job, queue)
+        finally:
+            metrics.fold_process(horse_pid, into=f"worker-{self.name}")
 
 if __name__ == '__main__':
     logger.info("Starting Worker...")
@@ -19,5 +29,5 @@ if __name__ == '__main__':
     conn = Redis.from_url(redis_url)
 
     with Connection(conn):
-        worker = Worker(list(map(Queue, listen)))
+        worker = MetricsWorker(list(map(Queue, listen)))
         worker.work()
@@ -1,47 +1,59 @@
+import asyncio
 import logging
-import time
+import os
+from datetime import datetime
 from uuid import UUID
 from app.db.models import RenderJob, RenderJobStatus
-from app.core.database import SessionLocal
+from app.core import config
+from app.core.database import standalone_session
+from app.core.metrics import RENDER_JOBS, RENDER_OUTPUT_BYTES, RENDER_QUEUE_WAIT, render_stage
 from app.worker.renderer import process_render
 
 logger = logging.getLogger(__name__)
 
+async def _finish(job_id: UUID, status: RenderJobStatus, **values):
+    async with standalone_session() as db:
+        job = await db.get(RenderJob, job_id)
+        if job:
+            job.status = status
+            for name, value in values.items():
+                setattr(job, name, value)
+            await db.commit()
+    RENDER_JOBS.labels(status=status.value).inc()
+
+async def _run(job_id: UUID):
+    with render_stage("claim"):
+        async with standalone_session() as db:
+            job = await db.get(RenderJob, job_id)
+            if not job:
+                logger.error(f"Job {job_id} not found in DB")
+                return
+            RENDER_QUEUE_WAIT.observe(max((datetime.utcnow() - job.created_at).total_seconds(), 0))
+
+            # Update status -> RUNNING
+            job.status = RenderJobStatus.RUNNING
+            await db.commit()
+
+    # Run Render (Phase 1: Copy)
+    try:
+        with render_stage("render"):
+            filename = process_render(str(job_id))
+    except Exception as e:
+        logger.error(f"Render failed for {job_id}: {e}")
+        await _finish(job_id, RenderJobStatus.FAILED, error_message=str(e))
+        return
+
+    RENDER_OUTPUT_BYTES.observe(os.path.getsize(os.path.join(config.settings.RENDER_OUTPUT_DIR, filename)))
+    with render_stage("finalize"):
+        # Assuming api serves /static/renders
+        await _finish(job_id, RenderJobStatus.DONE, progress=100, video_url=f"/static/renders/{filename}")
+
 def run_render_job(job_id_str: str):
     """
-    RQ Task to process a render job.
+    RQ Task to process a render job. Time spent queued, each stage and the
+    output size are recorded in the worker metrics (app.core.metrics).
     """
-    db = SessionLocal()
-    job_id = UUID(job_id_str)
-    
     try:
-        job = db.query(RenderJob).filter(RenderJob.id == job_id).first()
-        if not job:
-            logger.error(f"Job {job_id} not found in DB")
-            return
-
-        # Update status -> RUNNING
-        job.status = RenderJobStatus.RUNNING
-        db.commit()
-
-        # Run Render (Phase 1: Copy)
-        try:
-            filename = process_render(job_id_str)
-            
-            # Update status -> DONE
-            job.status = RenderJobStatus.DONE
-            job.progress = 100
-            # Assuming api serves /static/renders
-            job.video_url = f"/static/renders/{filename}"
-            db.commit()
-            
-        except Exception as e:
-            logger.error(f"Render failed for {job_id}: {e}")
-            job.status = RenderJobStatus.FAILED
-            job.error_message = str(e)
-            db.commit()
-
+        asyncio.run(_run(UUID(job_id_str)))
     except Exception as e:
-        logger.error(f"Critical worker error check job {job_id}: {e}")
-    finally:
-        db.close()
+        logger.error(f"Critical worker error check job {job_id_str}: {e}")
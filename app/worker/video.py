@@ -0,0 +1,134 @@
+"""
+Mannequin video ingestion with OpenCV: probing, a ladder of downscaled
+renditions and a poster frame. The source is decoded once and every
+rendition is written from that single pass.
+"""
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rendition heights, only those below the source height are produced
+RENDITION_HEIGHTS = (1080, 720, 480, 360)
+# The first encoder this OpenCV build can open wins. H.264 needs an FFmpeg
+# with an H.264 encoder; VP9 in MP4 plays in current browsers; MPEG-4 Part 2
+# is the last resort.
+CODECS = ("avc1", "vp09", "mp4v")
+POSTER_MAX_SIDE = 1280
+POSTER_QUALITY = 85
+
+class VideoError(Exception):
+    pass
+
+@dataclass
+class VideoProbe:
+    width: int
+    height: int
+    fps: float
+    frame_count: int
+
+    @property
+    def duration_ms(self) -> int:
+        return round(self.frame_count / self.fps * 1000) if self.fps else 0
+
+@dataclass
+class RenditionFile:
+    name: str
+    width: int
+    height: int
+    path: Path
+    bitrate_kbps: int = 0
+
+_codec: Optional[str] = None
+
+def probe(source: str) -> VideoProbe:
+    import cv2
+
+    cap = cv2.VideoCapture(source)
+    try:
+        if not cap.isOpened():
+            raise VideoError(f"Cannot open video: {source}")
+        result = VideoProbe(
+            width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            fps=float(cap.get(cv2.CAP_PROP_FPS) or 0),
+            frame_count=int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0),
+        )
+    finally:
+        cap.release()
+    if not result.width or not result.height:
+        raise VideoError(f"No video stream in {source}")
+    return result
+
+def ladder(width: int, height: int) -> List[Tuple[str, int, int]]:
+    """(name, width, height) per rendition; widths keep the aspect ratio, rounded to even."""
+    return [
+        (f"{h}p", max(2, round(width * h / height / 2) * 2), h)
+        for h in RENDITION_HEIGHTS if h < height
+    ]
+
+def _open_writer(path: Path, fps: float, size: Tuple[int, int]):
+    import cv2
+
+    global _codec
+    for codec in ([_codec] if _codec else CODECS):
+        writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*codec), fps, size)
+        if writer.isOpened():
+            _codec = codec
+            return writer
+        writer.release()
+    raise VideoError(f"No usable video encoder among {CODECS}")
+
+def _write_poster(frame, path: Path):
+    import cv2
+
+    h, w = frame.shape[:2]
+    scale = POSTER_MAX_SIDE / max(h, w)
+    if scale < 1:
+        frame = cv2.resize(frame, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+    if not cv2.imwrite(str(path), frame, [cv2.IMWRITE_JPEG_QUALITY, POSTER_QUALITY]):
+        raise VideoError(f"Cannot write poster {path}")
+
+def transcode(source: str, dest_dir: Path, info: VideoProbe) -> Tuple[List[RenditionFile], Path, int]:
+    """
+    Writes every rendition of the ladder plus poster.jpg into dest_dir.
+    Returns the renditions, the poster path and the number of decoded frames
+    (container frame counts are estimates; this one is exact).
+    """
+    import cv2
+
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    fps = info.fps or 30.0
+    renditions = [RenditionFile(name, w, h, dest_dir / f"{name}.mp4") for name, w, h in ladder(info.width, info.height)]
+    poster = dest_dir / "poster.jpg"
+
+    cap = cv2.VideoCapture(source)
+    writers = []
+    frames = 0
+    try:
+        if not cap.isOpened():
+            raise VideoError(f"Cannot open video: {source}")
+        writers = [_open_writer(r.path, fps, (r.width, r.height)) for r in renditions]
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if frames == 0:
+                _write_poster(frame, poster)
+            for rendition, writer in zip(renditions, writers):
+                writer.write(cv2.resize(frame, (rendition.width, rendition.height), interpolation=cv2.INTER_AREA))
+            frames += 1
+    finally:
+        cap.release()
+        for writer in writers:
+            writer.release()
+
+    if frames == 0:
+        raise VideoError(f"No frames decoded from {source}")
+    duration_s = frames / fps
+    for rendition in renditions:
+        rendition.bitrate_kbps = round(os.path.getsize(rendition.path) * 8 / duration_s / 1000)
+    return renditions, poster, frames
@@ -0,0 +1,103 @@
+"""
+Benchmark: login throughput and the latency of other requests during a
+login burst, with bcrypt on the event loop ("inline", the old behaviour)
+vs on the bounded hashing executor.
+
+Runs the app in-process against the configured database. One user is
+registered, then `--logins` logins are sent with `--concurrency` in flight
+while a probe keeps requesting GET / and records its latency. Logins shed
+with 503 are counted, not retried.
+
+Usage:
+    python -m benchmarks.login [--logins 64] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from httpx import ASGITransport, AsyncClient
+
+from app.core import security
+from app.main import app
+
+PASSWORD = "benchmark-password"
+
+
+def _percentile(values, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))] if values else 0.0
+
+
+async def _inline_hasher(fn, *args):
+    return fn(*args)
+
+
+async def run(mode: str, logins: int, concurrency: int) -> dict:
+    original = security._run_hasher
+    if mode == "inline":
+        security._run_hasher = _inline_hasher
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+            (await client.post("/api/v1/auth/register", json={"email": email, "password": PASSWORD})).raise_for_status()
+
+            login_ms, probe_ms, statuses = [], [], []
+            done = asyncio.Event()
+            slots = asyncio.Semaphore(concurrency)
+
+            async def login():
+                async with slots:
+                    t = time.perf_counter()
+                    res = await client.post("/api/v1/auth/login", data={"username": email, "password": PASSWORD})
+                    login_ms.append((time.perf_counter() - t) * 1000)
+                    statuses.append(res.status_code)
+
+            async def probe():
+                while not done.is_set():
+                    t = time.perf_counter()
+                    (await client.get("/")).raise_for_status()
+                    probe_ms.append((time.perf_counter() - t) * 1000)
+                    await asyncio.sleep(0.005)
+
+            probe_task = asyncio.create_task(probe())
+            start = time.perf_counter()
+            await asyncio.gather(*(login() for _ in range(logins)))
+            elapsed = time.perf_counter() - start
+            done.set()
+            await probe_task
+    finally:
+        security._run_hasher = original
+
+    return {
+        "mode": mode,
+        "logins_per_s": statuses.count(200) / elapsed,
+        "shed": statuses.count(503),
+        "login_p50": statistics.median(login_ms),
+        "login_p95": _percentile(login_ms, 0.95),
+        "probe_p50": statistics.median(probe_ms),
+        "probe_p95": _percentile(probe_ms, 0.95),
+        "probe_max": max(probe_ms),
+    }
+
+
+async def main_async(args):
+    results = [await run(mode, args.logins, args.concurrency) for mode in ("inline", "executor")]
+    print(f"{'mode':>9} {'logins/s':>9} {'shed':>5} {'login p50':>10} {'login p95':>10} "
+          f"{'GET / p50':>10} {'GET / p95':>10} {'GET / max':>10}")
+    for r in results:
+        print(f"{r['mode']:>9} {r['logins_per_s']:9.1f} {r['shed']:5d} {r['login_p50']:10.1f} {r['login_p95']:10.1f} "
+              f"{r['probe_p50']:10.1f} {r['probe_p95']:10.1f} {r['probe_max']:10.1f}")
+    print("(latencies in ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
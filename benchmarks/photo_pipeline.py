@@ -0,0 +1,94 @@
+"""
+Benchmark: full-resolution vs resolution-aware body photo analysis.
+
+Generates synthetic phone-sized JPEGs and times each stage of the old
+(full decode + full-size detection) and new (header check + reduced decode +
+capped detection) pipelines. Each run happens in a fresh process so the
+reported peak RSS belongs to that pipeline alone.
+
+Usage:
+    python -m benchmarks.photo_pipeline [--megapixels 12 24 48] [--repeat 3]
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.modules.users import utils
+from benchmarks.synthetic import synthetic_photo
+
+
+def _timed(timings: dict, stage: str, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+    return result
+
+
+def run_full(data: bytes) -> dict:
+    timings = {}
+    nparr = np.frombuffer(data, np.uint8)
+    img = _timed(timings, "decode", cv2.imdecode, nparr, cv2.IMREAD_COLOR)
+    gray = _timed(timings, "grayscale", cv2.cvtColor, img, cv2.COLOR_BGR2GRAY)
+    _timed(timings, "detect", utils.face_cascade().detectMultiScale, gray, 1.1, 4)
+    return timings
+
+
+def run_reduced(data: bytes) -> dict:
+    timings = {}
+    width, height = _timed(timings, "header", utils.check_image_size, data)
+    nparr = np.frombuffer(data, np.uint8)
+    img = _timed(timings, "decode", utils.decode_reduced, nparr, max(width, height), settings.PHOTO_DETECTION_MAX_SIDE)
+    img = _timed(timings, "resize", utils.cap_size, img, settings.PHOTO_DETECTION_MAX_SIDE)
+    gray = _timed(timings, "grayscale", cv2.cvtColor, img, cv2.COLOR_BGR2GRAY)
+    _timed(timings, "detect", utils.face_cascade().detectMultiScale, gray, 1.1, 4)
+    return timings
+
+
+PIPELINES = {"full": run_full, "reduced": run_reduced}
+
+
+def _child(pipeline: str, data: bytes, repeat: int, out):
+    totals = {}
+    utils.face_cascade()
+    for _ in range(repeat):
+        for stage, ms in PIPELINES[pipeline](data).items():
+            totals[stage] = totals.get(stage, 0.0) + ms
+    # ru_maxrss is KiB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    out.send(({k: v / repeat for k, v in totals.items()}, peak_mb))
+
+
+def measure(pipeline: str, data: bytes, repeat: int):
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=_child, args=(pipeline, data, repeat, child))
+    proc.start()
+    # Only the child holds the sending end, so a crash surfaces as EOFError
+    child.close()
+    result = parent.recv()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[12, 24, 48])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'MP':>5} {'pipeline':>8} {'total ms':>9} {'peak MB':>8}  stages (ms)")
+    for mp in args.megapixels:
+        data = synthetic_photo(mp)
+        for pipeline in PIPELINES:
+            timings, peak_mb = measure(pipeline, data, args.repeat)
+            stages = " ".join(f"{k}={v:.1f}" for k, v in timings.items())
+            print(f"{mp:>5g} {pipeline:>8} {sum(timings.values()):>9.1f} {peak_mb:>8.1f}  {stages}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Benchmark suite for the body photo hot path (app.modules.users.utils).
+
+For every resolution, a workload of synthetic photos (a configurable share
+with a detectable face) is run in two modes:
+
+- single: one process analyzes the photos one after another, timing each
+  stage separately (header, decode, resize, grayscale, detect, crop_encode,
+  skin, storage_write)
+- pool: the production path, utils.process_body_photo_file fanned out over a
+  spawn process pool, measured end to end
+
+Every mode runs in a fresh process and reports throughput and peak RSS.
+Results are written as JSON so releases can be compared.
+
+Usage:
+    python -m benchmarks.photo_suite [--megapixels 2 12 24] [--photos 8]
+        [--face-ratio 0.5] [--workers 4] [--output results.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.modules.users import utils
+from app.storage import local
+from benchmarks.synthetic import synthetic_photo
+
+STAGES = ("header", "decode", "resize", "grayscale", "detect", "crop_encode", "skin", "storage_write")
+
+
+def _peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def analyze_staged(data: bytes, timings: dict) -> bool:
+    """
+    The steps of utils.process_body_photo, timed one by one.
+    Returns True if a face was found.
+    """
+    def timed(stage, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings[stage].append((time.perf_counter() - start) * 1000)
+        return result
+
+    width, height = timed("header", utils.check_image_size, data)
+    longest_side = max(width, height)
+    nparr = np.frombuffer(data, np.uint8)
+    img = timed("decode", utils.decode_reduced, nparr, longest_side, settings.PHOTO_DETECTION_MAX_SIDE)
+    img = timed("resize", utils.cap_size, img, settings.PHOTO_DETECTION_MAX_SIDE)
+    gray = timed("grayscale", cv2.cvtColor, img, cv2.COLOR_BGR2GRAY)
+    faces = timed("detect", utils.face_cascade().detectMultiScale, gray, 1.1, 4)
+    face = max(faces, key=lambda r: r[2] * r[3]) if len(faces) else None
+
+    crop = None
+    if face is not None:
+        def crop_encode():
+            face_img = utils.crop_face(nparr, longest_side, img, face)
+            return cv2.imencode(".jpg", face_img)[1].tobytes()
+        crop = timed("crop_encode", crop_encode)
+    timed("skin", utils.sample_skin_tone, img, face)
+    if crop is not None:
+        timed("storage_write", local.save_file_from_bytes, crop, "face.jpg", "bench")
+    return face is not None
+
+
+def run_single(paths, out):
+    timings = {stage: [] for stage in STAGES}
+    faces = 0
+    # Load the cascade outside the timed stages
+    utils.face_cascade()
+    start = time.perf_counter()
+    for path in paths:
+        faces += analyze_staged(Path(path).read_bytes(), timings)
+    elapsed = time.perf_counter() - start
+    out.send({
+        "elapsed_s": elapsed,
+        "faces_found": faces,
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": {
+            stage: {
+                "mean_ms": statistics.fmean(values),
+                "p95_ms": float(np.percentile(values, 95)),
+                "count": len(values),
+            }
+            for stage, values in timings.items() if values
+        },
+    })
+
+
+def _worker_ready(_):
+    return os.getpid()
+
+
+def run_pool(paths, workers, out):
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+        # Start the workers (and load the cascade) before timing
+        list(executor.map(_worker_ready, range(workers)))
+        start = time.perf_counter()
+        results = list(executor.map(utils.process_body_photo_file, paths))
+        elapsed = time.perf_counter() - start
+    out.send({
+        "elapsed_s": elapsed,
+        "faces_found": sum(1 for face, _ in results if face is not None),
+        # Parent plus the largest worker
+        "peak_rss_mb": _peak_rss_mb() + _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    })
+
+
+def measure(target, *args) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=target, args=(*args, child))
+    proc.start()
+    # Only the child holds the sending end, so a crash surfaces as EOFError
+    child.close()
+    result = parent.recv()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[2, 12, 24])
+    parser.add_argument("--photos", type=int, default=8, help="Photos per resolution")
+    parser.add_argument("--face-ratio", type=float, default=0.5, help="Share of photos with a face")
+    parser.add_argument("--workers", type=int, default=settings.PHOTO_PROCESSING_WORKERS)
+    parser.add_argument("--output", type=Path, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "cpu_count": os.cpu_count(),
+            "detection_max_side": settings.PHOTO_DETECTION_MAX_SIDE,
+            "workers": args.workers,
+        },
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Storage writes go to a scratch dir, never the real uploads
+        os.environ["UPLOAD_DIR"] = str(Path(tmp) / "uploads")
+        for mp in args.megapixels:
+            with_face = round(args.photos * args.face_ratio)
+            paths = []
+            for i in range(args.photos):
+                path = Path(tmp) / f"{mp:g}mp_{i}.jpg"
+                path.write_bytes(synthetic_photo(mp, face=i < with_face, seed=i))
+                paths.append(str(path))
+
+            for mode, result in (
+                ("single", measure(run_single, paths)),
+                ("pool", measure(run_pool, paths, args.workers)),
+            ):
+                result.update({
+                    "megapixels": mp,
+                    "mode": mode,
+                    "photos": len(paths),
+                    "photos_with_face": with_face,
+                    "throughput_per_s": len(paths) / result["elapsed_s"],
+                })
+                report["results"].append(result)
+                print(
+                    f"{mp:>5g} MP {mode:>6}: {result['throughput_per_s']:.2f} photos/s, "
+                    f"peak {result['peak_rss_mb']:.0f} MB, faces {result['faces_found']}/{with_face}",
+                    file=sys.stderr,
+                )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
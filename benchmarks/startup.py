@@ -0,0 +1,60 @@
+"""
+Benchmark: API cold start.
+
+Each run starts a fresh interpreter and measures
+- import: `import app.main`
+- startup: entering the FastAPI lifespan
+- first request: the first GET / and the first GET of the OpenAPI schema
+  (which is generated lazily on first access)
+and lists which heavy modules (OpenCV, Redis, RQ, NumPy) ended up loaded.
+The medians over all runs are printed.
+
+Usage:
+    python -m benchmarks.startup [--runs 5]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ("cv2", "numpy", "redis", "rq")
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+from app.core import config
+timings = {"import_ms": (imported - start) * 1000}
+with TestClient(app.main.app) as client:
+    timings["startup_ms"] = (time.perf_counter() - imported) * 1000
+    for name, url in (("first_root_ms", "/"), ("first_openapi_ms", f"{config.settings.API_V1_STR}/openapi.json")):
+        t = time.perf_counter()
+        client.get(url).raise_for_status()
+        timings[name] = (time.perf_counter() - t) * 1000
+timings["loaded"] = [m for m in %r if m in sys.modules]
+print(json.dumps(timings))
+""" % (HEAVY_MODULES,)
+
+
+def run_once() -> dict:
+    out = subprocess.run([sys.executable, "-c", CHILD], check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    for key in ("import_ms", "startup_ms", "first_root_ms", "first_openapi_ms"):
+        values = [r[key] for r in runs]
+        print(f"{key:>18}: median {statistics.median(values):8.1f}  min {min(values):8.1f}  max {max(values):8.1f}")
+    print(f"{'heavy modules':>18}: {', '.join(runs[-1]['loaded']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Synthetic phone-like photos for the photo benchmarks."""
+import cv2
+import numpy as np
+
+
+def _draw_face(img: np.ndarray, cx: int, cy: int, size: int):
+    """A flat cartoon face that the frontal Haar cascade reliably detects."""
+    cv2.ellipse(img, (cx, cy), (int(size * 0.8), size), 0, 0, 360, (140, 170, 215), -1)
+    for dx in (-0.35, 0.35):
+        eye_x = int(cx + dx * size)
+        cv2.ellipse(img, (eye_x, int(cy - 0.25 * size)), (int(0.18 * size), int(0.08 * size)), 0, 0, 360, (40, 40, 40), -1)
+        cv2.rectangle(img, (int(eye_x - 0.22 * size), int(cy - 0.45 * size)),
+                      (int(eye_x + 0.22 * size), int(cy - 0.40 * size)), (50, 50, 60), -1)
+    cv2.line(img, (cx, int(cy - 0.15 * size)), (cx, int(cy + 0.2 * size)), (110, 140, 190), max(1, int(0.05 * size)))
+    cv2.ellipse(img, (cx, int(cy + 0.5 * size)), (int(0.3 * size), int(0.08 * size)), 0, 0, 360, (60, 60, 140), -1)
+
+
+def synthetic_photo(megapixels: float, face: bool = False, seed: int = 0) -> bytes:
+    """
+    A 3:4 portrait JPEG with gradients and noise, roughly like a phone photo.
+    With `face=True` a face is drawn in the upper third, sized like a
+    full-body shot (about a tenth of the image height).
+    """
+    width = int((megapixels * 1e6 * 3 / 4) ** 0.5)
+    height = int(width * 4 / 3)
+    rng = np.random.default_rng(seed)
+    gy = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    gx = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[..., 0] = (gy * 0.6 + gx * 0.2).astype(np.uint8)
+    img[..., 1] = (gy * 0.3 + gx * 0.5).astype(np.uint8)
+    img[..., 2] = 180
+    if face:
+        _draw_face(img, width // 2, height // 5, height // 20)
+        img = cv2.GaussianBlur(img, (0, 0), max(1, height // 1000))
+    img += rng.integers(0, 12, size=(height, width, 1), dtype=np.uint8)
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    assert ok
+    return buf.tobytes()
@@ -0,0 +1,11 @@
+#!/bin/sh
+set -e
+
+# prometheus_client's multiprocess mode needs an empty directory on start:
+# files left by earlier runs would be added to the new process's counters
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+exec "$@"
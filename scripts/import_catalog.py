@@ -0,0 +1,67 @@
+"""
+Imports products, variants and overlay references from a CSV or JSONL file,
+the same way as POST /api/v1/admin/products/import, without going through
+HTTP. Safe to re-run: rows are upserted by external_id.
+
+Usage:
+    python scripts/import_catalog.py catalog.csv [--format csv|jsonl] [--batch-size 1000] [--report report.json]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.core import config
+from app.core.resources import resources
+from app.modules.catalog import importer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main_async(args) -> int:
+    fmt = args.format or importer.format_for_filename(args.path)
+    if fmt is None:
+        logger.error("Cannot tell the file format from the extension, pass --format")
+        return 2
+    engine = create_async_engine(config.settings.DATABASE_URL)
+    async_session = async_sessionmaker(engine, expire_on_commit=False)
+    started = time.perf_counter()
+    try:
+        with open(args.path, "rb") as stream:
+            async with async_session() as db:
+                report = await importer.import_catalog(db, stream, fmt, args.batch_size)
+    except importer.InvalidImportFile as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        await resources.close()
+        await engine.dispose()
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"{report.imported}/{report.rows} rows imported in {elapsed:.1f}s "
+        f"({report.rows / max(elapsed, 1e-9):.0f} rows/s): {report.products} products, "
+        f"{report.variants} variants, {report.garment_assets} overlays written"
+    )
+    for error in report.errors:
+        logger.warning(f"line {error.line} ({error.external_id or '-'}): {error.error}")
+    if report.errors_truncated:
+        logger.warning(f"Only the first {importer.MAX_REPORTED_ERRORS} errors are listed")
+    if args.report:
+        with open(args.report, "w") as out:
+            out.write(report.model_dump_json(indent=2))
+    return 1 if report.errors else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=importer.FORMATS)
+    parser.add_argument("--batch-size", type=int, default=importer.BATCH_SIZE)
+    parser.add_argument("--report", help="Also write the full report as JSON to this path")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+if __name__ == "__main__":
+    main()
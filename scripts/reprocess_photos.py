@@ -0,0 +1,205 @@
+"""
+Recomputes face_crop_url / skin_tone_hex for every profile with a body photo,
+e.g. after tuning the detector in app/modules/users/utils.py.
+
+Profiles are streamed in id order through a server-side cursor, photos are
+analyzed in a process pool and results are written back with one batched
+UPDATE per batch. Progress is checkpointed after every committed batch, so an
+interrupted run resumes where it stopped.
+
+Usage:
+    python scripts/reprocess_photos.py [--workers 8] [--batch-size 500]
+                                       [--checkpoint PATH] [--restart]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import mmap
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from uuid import UUID
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.core import config
+from app.db.models import UserProfile, PhotoAnalysis, PhotoStatus, StoredBlob
+from app.modules.users import utils
+from app.storage import blobs, local
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = "./data/reprocess_photos.checkpoint.json"
+
+def analyze(path: str):
+    """Pool worker: (sha256, face_crop_jpeg, skin_tone_hex) or None on failure."""
+    try:
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        sha256 = hashlib.sha256(data).hexdigest()
+        face_crop_jpeg, skin_tone_hex = utils.process_body_photo(data)
+        return sha256, face_crop_jpeg, skin_tone_hex
+    except Exception:
+        return None
+
+async def analyze_batch(loop, executor, rows):
+    async def one(url):
+        path = local.url_to_path(url)
+        if path is None:
+            # External URL, nothing on disk to analyze
+            return None
+        return await loop.run_in_executor(executor, analyze, str(path))
+    return await asyncio.gather(*(one(url) for _, url in rows))
+
+def load_checkpoint(path: Path) -> dict:
+    if path.exists():
+        return json.loads(path.read_text())
+    return {"last_id": None, "processed": 0, "failed": 0}
+
+def save_checkpoint(path: Path, state: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, path)
+
+async def record_results(db, rows, results):
+    """
+    Stores new face crops, refreshes the photo_analyses memo and updates all
+    profiles of the batch, and any other profile with one of its photos, with
+    executemany UPDATEs.
+    """
+    by_sha = {}
+    for result in results:
+        if result is not None:
+            by_sha[result[0]] = result
+
+    updates = []
+    face_urls = {}
+    if by_sha:
+        old = dict((await db.execute(
+            select(PhotoAnalysis.sha256, PhotoAnalysis.face_crop_url)
+            .where(PhotoAnalysis.sha256.in_(by_sha))
+        )).all())
+
+        for sha256, face_crop_jpeg, skin_tone_hex in by_sha.values():
+            face_crop_url = None
+            if face_crop_jpeg:
+                face_crop_url = (await blobs.store_bytes(db, face_crop_jpeg, ".jpg")).url
+            # The memo owns one reference to its face crop
+            await blobs.release(db, old.get(sha256))
+            face_urls[sha256] = face_crop_url
+
+        stmt = insert(PhotoAnalysis).values([
+            {"sha256": sha, "face_crop_url": face_urls[sha], "skin_tone_hex": tone}
+            for sha, _, tone in by_sha.values()
+        ])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[PhotoAnalysis.sha256],
+            set_={"face_crop_url": stmt.excluded.face_crop_url, "skin_tone_hex": stmt.excluded.skin_tone_hex}
+        ))
+
+        # The old crops are released in this transaction, so every profile
+        # with one of these photos must move off them now, not when (or if)
+        # its own batch comes
+        photo_urls = (await db.execute(
+            select(StoredBlob.sha256, StoredBlob.url).where(StoredBlob.sha256.in_(by_sha))
+        )).all()
+        if photo_urls:
+            profiles = UserProfile.__table__
+            await db.execute(
+                update(profiles)
+                .where(profiles.c.body_photo_url == bindparam("photo_url"))
+                .values(
+                    face_crop_url=bindparam("new_face_crop_url"),
+                    skin_tone_hex=bindparam("new_skin_tone_hex"),
+                    photo_status=PhotoStatus.DONE,
+                ),
+                [
+                    {"photo_url": url, "new_face_crop_url": face_urls[sha], "new_skin_tone_hex": by_sha[sha][2]}
+                    for sha, url in photo_urls
+                ],
+            )
+
+    for (profile_id, _), result in zip(rows, results):
+        if result is None:
+            continue
+        sha256, _, skin_tone_hex = result
+        updates.append({
+            "id": profile_id,
+            "face_crop_url": face_urls[sha256],
+            "skin_tone_hex": skin_tone_hex,
+            "photo_status": PhotoStatus.DONE,
+        })
+
+    if updates:
+        # ORM bulk UPDATE by primary key -> one executemany round trip
+        await db.execute(update(UserProfile), updates)
+    await db.commit()
+    return len(updates)
+
+async def reprocess(workers: int, batch_size: int, checkpoint_path: Path, restart: bool):
+    engine = create_async_engine(config.settings.DATABASE_URL)
+    async_session = async_sessionmaker(engine, expire_on_commit=False)
+    state = {"last_id": None, "processed": 0, "failed": 0} if restart else load_checkpoint(checkpoint_path)
+    if state["last_id"]:
+        logger.info(f"Resuming after profile {state['last_id']} ({state['processed']} done)")
+
+    loop = asyncio.get_running_loop()
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    started = time.perf_counter()
+    run_processed = 0
+
+    query = (
+        select(UserProfile.id, UserProfile.body_photo_url)
+        .where(UserProfile.body_photo_url.is_not(None))
+        .order_by(UserProfile.id)
+        .execution_options(yield_per=batch_size)
+    )
+    if state["last_id"]:
+        query = query.where(UserProfile.id > UUID(state["last_id"]))
+
+    try:
+        # Reads and writes use separate sessions: the server-side cursor keeps
+        # its transaction open while each batch commits independently
+        async with async_session() as reader, async_session() as writer:
+            result = await reader.stream(query)
+            async for partition in result.partitions(batch_size):
+                rows = [(profile_id, url) for profile_id, url in partition]
+                results = await analyze_batch(loop, executor, rows)
+
+                updated = await record_results(writer, rows, results)
+                state["last_id"] = str(rows[-1][0])
+                state["processed"] += updated
+                state["failed"] += len(rows) - updated
+                save_checkpoint(checkpoint_path, state)
+
+                run_processed += len(rows)
+                elapsed = time.perf_counter() - started
+                logger.info(
+                    f"{state['processed']} updated, {state['failed']} failed, "
+                    f"{run_processed / elapsed:.1f} profiles/s"
+                )
+    finally:
+        executor.shutdown(cancel_futures=True)
+        await engine.dispose()
+
+    logger.info(f"Reprocessing complete: {state['processed']} updated, {state['failed']} failed.")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--checkpoint", type=Path, default=Path(DEFAULT_CHECKPOINT))
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    args = parser.parse_args()
+    asyncio.run(reprocess(args.workers, args.batch_size, args.checkpoint, args.restart))
+
+if __name__ == "__main__":
+    main()
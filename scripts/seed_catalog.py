@@ -0,0 +1,102 @@
+"""
+Seeds a large synthetic catalog (products with all five sizes) for load and
+search testing, then runs EXPLAIN ANALYZE for a few searches so you can see
+which indexes Postgres picks.
+
+Do not run against a database that holds real data.
+
+Usage:
+    python scripts/seed_catalog.py [--products 200000] [--batch-size 5000] [--explain-only]
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+import uuid
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.core import config
+from app.db.models import Product, ProductVariant, FitType, SizeEnum
+from app.modules.catalog import service
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ADJECTIVES = ["Classic", "Street", "Summer", "Heavy", "Vintage", "Essential", "Washed", "Organic", "Relaxed", "Graphic", "Pocket", "Ribbed"]
+NOUNS = ["Tee", "Crew", "Henley", "Polo", "Longsleeve", "Tank", "Raglan", "Muscle Tee"]
+BRANDS = ["Fittsee", "Northwind", "Kōhaku", "Basecamp", "Lumen", "Atelier Nord", "Sandbar", "Mercer & Co"]
+MATERIALS = ["cotton", "linen blend", "merino", "jersey", "slub cotton", "bamboo"]
+COLOURS = ["black", "white", "sage", "navy", "sand", "rust", "heather grey", "ecru"]
+
+SEARCHES = ["oversize", "vintge tee", "northwind hen", "merino", "kohaku"]
+
+def fake_product(rng: random.Random) -> dict:
+    fit = rng.choice(list(FitType))
+    colour = rng.choice(COLOURS)
+    return {
+        "id": uuid.uuid4(),
+        "name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {colour.title()}",
+        "brand": rng.choice(BRANDS),
+        "description": f"{fit.value.title()} fit {rng.choice(MATERIALS)} t-shirt in {colour}.",
+        "category": "tshirt",
+        "fit_type": fit,
+        "is_active": rng.random() > 0.05,
+    }
+
+async def seed(async_session, products: int, batch_size: int):
+    rng = random.Random(0)
+    started = time.perf_counter()
+    async with async_session() as db:
+        for offset in range(0, products, batch_size):
+            batch = [fake_product(rng) for _ in range(min(batch_size, products - offset))]
+            await db.execute(insert(Product), batch)
+            await db.execute(insert(ProductVariant), [
+                {"id": uuid.uuid4(), "product_id": p["id"], "size": size, "is_active": True}
+                for p in batch for size in SizeEnum
+            ])
+            await db.commit()
+            done = offset + len(batch)
+            logger.info(f"{done}/{products} products ({done / (time.perf_counter() - started):.0f}/s)")
+        await db.execute(text("ANALYZE products"))
+        await db.execute(text("ANALYZE product_variants"))
+        await db.commit()
+
+async def explain(async_session):
+    async with async_session() as db:
+        for search in SEARCHES:
+            started = time.perf_counter()
+            rows = await service.search_products(db, search, 20)
+            elapsed = (time.perf_counter() - started) * 1000
+            logger.info(f"search={search!r}: {len(rows)} results in {elapsed:.1f} ms, top={[r['name'] for r in rows[:3]]}")
+            for kind, query in (
+                ("full-text", service.full_text_search_query(search, 20)),
+                ("fuzzy", service.fuzzy_search_query(search, 20)),
+            ):
+                if query is None:
+                    continue
+                sql = str(query.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}))
+                plan = (await db.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"))).scalars().all()
+                logger.info(f"{kind} plan:\n" + "\n".join(plan))
+
+async def main_async(args):
+    engine = create_async_engine(config.settings.DATABASE_URL)
+    async_session = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        if not args.explain_only:
+            await seed(async_session, args.products, args.batch_size)
+        await explain(async_session)
+    finally:
+        await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--explain-only", action="store_true", help="Skip seeding, only explain the sample searches")
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,9 @@ from app.core import security
 # Actually, for the demo code, we'll configure it to use the main DB but usually you'd want isolation.
 # Let's try to use valid logic for AsyncClient.
 
+# Endpoints running more SQL than their @query_budget fail the test
+settings.SQL_QUERY_BUDGET_STRICT = True
+
 @pytest.fixture(scope="session")
 def event_loop():
     loop = asyncio.new_event_loop()
@@ -58,12 +61,15 @@ async def db_session(db_engine) -> AsyncGenerator[AsyncSession, None]:
         await session.commit()
 
 @pytest.fixture(scope="function")
-async def client(db_session) -> AsyncGenerator[AsyncClient, None]:
+async def client(db_session, db_engine, monkeypatch) -> AsyncGenerator[AsyncClient, None]:
     # Override generic get_db
     async def override_get_db():
         yield db_session
 
     app.dependency_overrides[get_db] = override_get_db
+    # Photo analysis records its results in a session of its own
+    from app.modules.users import service as users_service
+    monkeypatch.setattr(users_service, "AsyncSessionLocal", async_sessionmaker(db_engine, expire_on_commit=False))
     
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
         yield c
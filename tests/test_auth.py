@@ -1,3 +1,4 @@
+import uuid
 import pytest
 from httpx import AsyncClient
 
@@ -54,3 +55,81 @@ async def test_read_users_me(client: AsyncClient):
     )
     assert response.status_code == 200
     assert response.json()["email"] == email
+
+@pytest.mark.asyncio
+async def test_principal_cached_until_invalidated(client: AsyncClient, db_session):
+    from sqlalchemy import update
+    from app.core.principals import principals
+    from app.db.models import User, UserRole
+
+    email = "principal@example.com"
+    user = (await client.post("/api/v1/auth/register", json={"email": email, "password": "password123"})).json()
+    login_res = await client.post("/api/v1/auth/login", data={"username": email, "password": "password123"})
+    headers = {"Authorization": f"Bearer {login_res.json()['access_token']}"}
+    assert (await client.get("/api/v1/auth/me", headers=headers)).json()["role"] == "CUSTOMER"
+
+    # Role changes outside the API are only seen once invalidated
+    await db_session.execute(update(User).where(User.id == user["id"]).values(role=UserRole.ADMIN))
+    await db_session.commit()
+    assert (await client.get("/api/v1/auth/me", headers=headers)).json()["role"] == "CUSTOMER"
+    await principals.invalidate(uuid.UUID(user["id"]))
+    assert (await client.get("/api/v1/auth/me", headers=headers)).json()["role"] == "ADMIN"
+
+@pytest.mark.asyncio
+async def test_token_claims_trusted_until_version_changes(client: AsyncClient, monkeypatch):
+    from jose import jwt
+    from app.core import config, deps
+    from app.core.principals import principals
+
+    # Stands in for the Redis nonce
+    versions = {"current": "a1"}
+
+    async def token_version(user_id):
+        return versions["current"]
+
+    monkeypatch.setattr(principals, "token_version", token_version)
+    monkeypatch.setattr(principals, "issue_token_version", token_version)
+    email = "claims@example.com"
+    await client.post("/api/v1/auth/register", json={"email": email, "password": "password123"})
+    token = (await client.post(
+        "/api/v1/auth/login", data={"username": email, "password": "password123"}
+    )).json()["access_token"]
+    claims = jwt.decode(token, config.settings.JWT_SECRET, algorithms=[config.settings.ALGORITHM])
+    assert (claims["role"], claims["pc"], claims["ver"]) == ("CUSTOMER", False, "a1")
+
+    async def no_lookup(db, user_id):
+        raise AssertionError("looked up a principal")
+
+    monkeypatch.setattr(principals, "get", no_lookup)
+    principal = await deps.get_token_principal(token, None)
+    assert principal.email == email and not principal.profile_completed
+
+    # Once the version moves on, or is lost with Redis, the same token needs a lookup again
+    for versions["current"] in ("b2", None):
+        with pytest.raises(AssertionError, match="looked up"):
+            await deps.get_token_principal(token, None)
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password_hash(client: AsyncClient, db_session):
+    from passlib.context import CryptContext
+    from sqlalchemy import select
+    from app.db.models import User
+
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4).hash("password123")
+    db_session.add(User(email="rehash@example.com", password_hash=old_hash))
+    await db_session.commit()
+
+    response = await client.post("/api/v1/auth/login", data={"username": "rehash@example.com", "password": "password123"})
+    assert response.status_code == 200
+    new_hash = await db_session.scalar(select(User.password_hash).where(User.email == "rehash@example.com"))
+    assert new_hash != old_hash and new_hash.startswith("$2b$12$")
+
+@pytest.mark.asyncio
+async def test_login_sheds_load_when_hashing_is_saturated(client: AsyncClient, monkeypatch):
+    from app.core import security
+
+    monkeypatch.setattr(security.settings, "PASSWORD_HASH_MAX_PENDING", 0)
+    response = await client.post("/api/v1/auth/login", data={"username": "nobody@example.com", "password": "x"})
+    assert response.status_code == 401  # Unknown users never reach the hasher
+    response = await client.post("/api/v1/auth/register", json={"email": "busy@example.com", "password": "x"})
+    assert response.status_code == 503 and response.headers["retry-after"] == "1"
@@ -0,0 +1,64 @@
+import asyncio
+from unittest.mock import patch
+
+from app.core.cache import TTLCache
+from app.core.http import SerializedBody, json_response
+from app.modules.catalog.service import CatalogCache
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=2, ttl=60)
+    with patch("app.core.cache.time.monotonic", return_value=0):
+        cache.set("a", 1)
+    with patch("app.core.cache.time.monotonic", return_value=61):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_catalog_cache_without_redis_invalidates_locally():
+    # REDIS_URL points at a closed port in the test env; the local tier still works
+    cache = CatalogCache()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return b'[{"name":"Tee"}]'
+
+    async def scenario():
+        cached = await cache.get_or_load("products", {"page": 1}, load)
+        assert cached.body == b'[{"name":"Tee"}]'
+        await cache.get_or_load("products", {"page": 1}, load)
+        assert len(calls) == 1
+        await cache.invalidate()
+        await cache.get_or_load("products", {"page": 1}, load)
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+def test_json_response_returns_304_for_matching_etag():
+    serialized = SerializedBody.from_bytes(b'{"a":1}')
+
+    full = json_response(serialized)
+    assert full.status_code == 200
+    assert full.body == b'{"a":1}'
+    assert full.headers["etag"] == serialized.etag
+
+    for header in (serialized.etag, f'"other", W/{serialized.etag}', "*"):
+        not_modified = json_response(serialized, header)
+        assert not_modified.status_code == 304
+        assert not_modified.body == b""
+    assert json_response(serialized, '"other"').status_code == 200
+
+def test_serialized_body_round_trips_headers():
+    serialized = SerializedBody.from_bytes(b"[]", {"X-Next-Cursor": "abc"})
+    assert SerializedBody.unpack(serialized.pack()) == serialized
+    assert serialized.etag != SerializedBody.from_bytes(b"[]").etag
+    assert json_response(serialized).headers["x-next-cursor"] == "abc"
@@ -0,0 +1,315 @@
+import io
+import uuid
+
+import pytest
+
+from app.modules.catalog import importer, service
+
+def test_cursor_round_trip():
+    product_id = uuid.uuid4()
+    cursor = service.encode_cursor("Oversize Tee", product_id)
+    assert service.decode_cursor(cursor) == ("Oversize Tee", product_id)
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "WzFd", "WyJhIiwgIm5vdC1hLXV1aWQiXQ"])
+def test_invalid_cursor_rejected(cursor):
+    with pytest.raises(service.InvalidCursor):
+        service.decode_cursor(cursor)
+
+def test_prefix_tsquery_keeps_only_words():
+    assert service.prefix_tsquery("Oversize te") == "oversize:* & te:*"
+    assert service.prefix_tsquery("tee's & (boxy)") == "tee:* & s:* & boxy:*"
+    assert service.prefix_tsquery(" !? ") is None
+
+def test_import_records_stream_csv_and_jsonl():
+    csv_data = b'\xef\xbb\xbfexternal_id,name,fit_type,size\nA1,"Two\nLines",BOXY,\nA2,Tee,REGULAR,M\n'
+    records = list(importer.iter_records(io.BytesIO(csv_data), "csv"))
+    assert records == [
+        (3, {"external_id": "A1", "name": "Two\nLines", "fit_type": "BOXY"}),
+        (4, {"external_id": "A2", "name": "Tee", "fit_type": "REGULAR", "size": "M"}),
+    ]
+    jsonl_data = b'{"external_id": "A1"}\n\n{broken\n'
+    records = list(importer.iter_records(io.BytesIO(jsonl_data), "jsonl"))
+    assert records[0] == (1, {"external_id": "A1"})
+    assert records[1][0] == 3 and records[1][1].startswith("Invalid JSON")
+
+async def admin_headers(client, db_session, email: str) -> dict:
+    from app.core.security import get_password_hash
+    from app.db.models import User, UserRole
+
+    db_session.add(User(email=email, password_hash=get_password_hash("pass"), role=UserRole.ADMIN))
+    await db_session.commit()
+    login = await client.post("/api/v1/auth/login", data={"username": email, "password": "pass"})
+    return {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+@pytest.mark.asyncio
+async def test_change_feed_follows_admin_writes(client, db_session):
+    from app.modules.catalog.service import catalog_cache
+
+    await catalog_cache.invalidate()
+    headers = await admin_headers(client, db_session, "feed-admin@test.com")
+
+    res = await client.get("/api/v1/products/products/changes")
+    cursor = res.json()["next_cursor"]
+
+    product = (await client.post(
+        "/api/v1/admin/products", headers=headers, json={"name": "Feed Tee", "fit_type": "REGULAR"}
+    )).json()
+    await client.post(f"/api/v1/admin/products/{product['id']}/variants", headers=headers)
+
+    changes = (await client.get(f"/api/v1/products/products/changes?since={cursor}")).json()
+    assert [p["name"] for p in changes["products"]] == ["Feed Tee"]
+    assert len(changes["variants"]) == 5
+    assert not changes["has_more"]
+    cursor = changes["next_cursor"]
+
+    await client.delete(f"/api/v1/admin/products/{product['id']}", headers=headers)
+    changes = (await client.get(f"/api/v1/products/products/changes?since={cursor}")).json()
+    assert [(p["id"], p["is_active"]) for p in changes["products"]] == [(product["id"], False)]
+    assert changes["variants"] == []
+
+    paged = (await client.get("/api/v1/products/products/changes?since=0&limit=2")).json()
+    assert paged["has_more"]
+    assert len(paged["products"]) + len(paged["variants"]) == 2
+
+@pytest.mark.asyncio
+async def test_offset_paging_points_to_cursors(client):
+    # Old clients asking for page 2 must not quietly get page 1
+    res = await client.get("/api/v1/products/products?page=2")
+    assert res.status_code == 400 and "cursor" in res.json()["detail"]
+    assert (await client.get("/api/v1/products/products?page=1")).status_code == 200
+
+@pytest.mark.asyncio
+async def test_search_matches_prefixes_and_typos(client, db_session):
+    from app.modules.catalog.service import catalog_cache
+
+    await catalog_cache.invalidate()
+    headers = await admin_headers(client, db_session, "search-admin@test.com")
+    for name, brand, fit_type, category in [
+        ("Oversize Tee", "Acme", "OVERSIZE", "tshirt"),
+        ("Boxy Tee", "Northwind", "BOXY", "tshirt"),
+        ("Oversize Hoodie", "Acme", "OVERSIZE", "hoodie"),
+    ]:
+        res = await client.post("/api/v1/admin/products", headers=headers, json={
+            "name": name, "brand": brand, "fit_type": fit_type, "category": category,
+        })
+        assert res.status_code == 200, res.text
+
+    async def search(query):
+        res = await client.get(f"/api/v1/products/products?{query}")
+        assert res.status_code == 200, res.text
+        return [p["name"] for p in res.json()]
+
+    # Every word prefixes a word of the name, brand or description
+    assert sorted(await search("search=overs%20te")) == ["Oversize Tee"]
+    assert sorted(await search("search=acme")) == ["Oversize Hoodie", "Oversize Tee"]
+    # No full-text match: trigram similarity catches the typo
+    assert await search("search=northwnd") == ["Boxy Tee"]
+    assert "Boxy Tee" in await search("search=teee")
+    # Filters apply to both
+    assert await search("search=oversize&category=hoodie") == ["Oversize Hoodie"]
+    assert await search("search=teee&fit_type=BOXY") == ["Boxy Tee"]
+
+IMPORT_CSV = b"""external_id,name,brand,fit_type,size,sku,overlay_front_url
+TEE-1,Import Tee,Acme,OVERSIZE,S,TEE-1-S,https://cdn.example.com/tee-1-s.png
+TEE-1,Import Tee,Acme,OVERSIZE,M,TEE-1-M,
+TEE-2,Second Tee,,BOXY,XXL,,
+TEE-3,,Acme,REGULAR,L,,
+TEE-4,Fourth Tee,,CROPPED,,,
+"""
+
+@pytest.mark.asyncio
+async def test_bulk_import_upserts_and_reports_bad_rows(client, db_session):
+    headers = await admin_headers(client, db_session, "import-admin@test.com")
+
+    async def run_import():
+        res = await client.post(
+            "/api/v1/admin/products/import?batch_size=2", headers=headers,
+            files={"file": ("catalog.csv", IMPORT_CSV, "text/csv")},
+        )
+        assert res.status_code == 200
+        return res.json()
+
+    report = await run_import()
+    assert (report["rows"], report["imported"]) == (5, 3)
+    assert (report["products"], report["variants"], report["garment_assets"]) == (2, 2, 1)
+    assert [(e["line"], e["external_id"]) for e in report["errors"]] == [(4, "TEE-2"), (5, "TEE-3")]
+
+    products = (await client.get("/api/v1/products/products?limit=100")).json()
+    tee = next(p for p in products if p["name"] == "Import Tee")
+    assert sorted(v["sku"] for v in tee["variants"]) == ["TEE-1-M", "TEE-1-S"]
+    assert "Fourth Tee" in [p["name"] for p in products]
+
+    # Unchanged rows are not written again
+    report = await run_import()
+    assert (report["imported"], report["products"], report["variants"], report["garment_assets"]) == (3, 0, 0, 0)
+
+    # Adding the remaining sizes keeps the imported ones
+    res = await client.post(f"/api/v1/admin/products/{tee['id']}/variants", headers=headers)
+    assert res.json()["count"] == 3
+    res = await client.post(f"/api/v1/admin/products/{tee['id']}/variants", headers=headers)
+    assert res.json()["count"] == 0
+
+    res = await client.post(
+        "/api/v1/admin/products/import", headers=headers, files={"file": ("catalog.txt", b"", "text/plain")}
+    )
+    assert res.status_code == 400
+
+@pytest.mark.asyncio
+async def test_import_failure_keeps_the_original_error(db_session, monkeypatch):
+    from sqlalchemy import text
+    from sqlalchemy.exc import DBAPIError
+    from app.modules.sizing.service import size_charts
+
+    await size_charts.load(db_session)
+    import_batch = importer._import_batch
+    calls = []
+
+    async def failing_second_batch(db, batch, report):
+        calls.append(batch)
+        if len(calls) == 1:
+            return await import_batch(db, batch, report)
+        await db.execute(text("SELECT 1 / 0"))
+
+    monkeypatch.setattr(importer, "_import_batch", failing_second_batch)
+    with pytest.raises(DBAPIError, match="division by zero"):
+        await importer.import_catalog(db_session, io.BytesIO(IMPORT_CSV), "csv", batch_size=1)
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_import_reports_released_blob_overlays(client, db_session):
+    headers = await admin_headers(client, db_session, "blob-import-admin@test.com")
+    gone = f"/static/uploads/blobs/ee/{'ee' * 32}.png"
+    csv_data = f"external_id,name,fit_type,size,overlay_front_url\nBLOB-1,Blob Tee,BOXY,M,{gone}\n".encode()
+
+    res = await client.post(
+        "/api/v1/admin/products/import", headers=headers, files={"file": ("catalog.csv", csv_data, "text/csv")}
+    )
+    report = res.json()
+    assert report["imported"] == 0
+    assert [(e["line"], e["external_id"]) for e in report["errors"]] == [(2, "BLOB-1")]
+    assert "not a stored file" in report["errors"][0]["error"]
+
+@pytest.mark.asyncio
+async def test_bulk_garment_upload_replaces_overlays(client, db_session, tmp_path, monkeypatch):
+    from sqlalchemy import select
+    from app.db.models import GarmentAsset, StoredBlob
+    from app.storage import local
+
+    monkeypatch.setattr(local.settings, "UPLOAD_DIR", str(tmp_path))
+    headers = await admin_headers(client, db_session, "overlay-admin@test.com")
+    product = (await client.post(
+        "/api/v1/admin/products", headers=headers, json={"name": "Overlay Tee", "fit_type": "BOXY"}
+    )).json()
+
+    async def upload(*files):
+        res = await client.post(
+            f"/api/v1/admin/products/{product['id']}/garment-assets", headers=headers,
+            files=[("files", (f"{i}.png", data, "image/png")) for i, (_, _, data) in enumerate(files)],
+            data={"sizes": [size for size, _, _ in files], "asset_types": [kind for _, kind, _ in files]},
+        )
+        assert res.status_code == 200, res.text
+        return res.json()["assets"]
+
+    first = await upload(("M", "OVERLAY_FRONT", b"front"), ("M", "OVERLAY_BACK", b"back"), ("L", "OVERLAY_FRONT", b"front"))
+    assert first[0]["url"] == first[2]["url"]
+    blobs = dict((await db_session.execute(select(StoredBlob.url, StoredBlob.ref_count))).all())
+    assert blobs == {first[0]["url"]: 2, first[1]["url"]: 1}
+
+    second = await upload(("M", "OVERLAY_FRONT", b"new front"))
+    db_session.expire_all()
+    assets = dict((await db_session.execute(
+        select(GarmentAsset.size, GarmentAsset.url).where(GarmentAsset.asset_type == "OVERLAY_FRONT")
+    )).all())
+    assert assets == {"M": second[0]["url"], "L": first[0]["url"]}
+    blobs = dict((await db_session.execute(select(StoredBlob.url, StoredBlob.ref_count))).all())
+    assert blobs[first[0]["url"]] == 1 and blobs[second[0]["url"]] == 1
+
+    res = await client.post(
+        f"/api/v1/admin/products/{product['id']}/garment-assets", headers=headers,
+        files=[("files", ("a.png", b"a", "image/png")), ("files", ("b.png", b"b", "image/png"))],
+        data={"sizes": ["M", "M"], "asset_types": ["OVERLAY_BACK", "OVERLAY_BACK"]},
+    )
+    assert res.status_code == 400
+
+@pytest.mark.asyncio
+async def test_mannequin_upload_refreshes_registry(client, db_session):
+    from app.modules.catalog.mannequins import mannequins
+
+    headers = await admin_headers(client, db_session, "mannequin-admin@test.com")
+    for url in ("first.mp4", "second.mp4"):
+        res = await client.post(f"/api/v1/admin/mannequin/upload-video?video_url={url}", headers=headers)
+        assert res.status_code == 200
+        assert mannequins.video_url() == url
+    assert mannequins.rotation_degrees() == 180
+
+@pytest.mark.asyncio
+async def test_resumable_upload_feeds_garment_overlay(client, db_session, tmp_path, monkeypatch):
+    import hashlib
+    from app.storage import local
+
+    monkeypatch.setattr(local.settings, "UPLOAD_DIR", str(tmp_path))
+    headers = await admin_headers(client, db_session, "resumable-admin@test.com")
+    product = (await client.post(
+        "/api/v1/admin/products", headers=headers, json={"name": "Resumable Tee", "fit_type": "BOXY"}
+    )).json()
+    data = b"overlay" * 1000
+
+    upload = (await client.post(
+        "/api/v1/uploads", headers=headers, json={"filename": "front.png", "size": len(data)}
+    )).json()
+    url = f"/api/v1/uploads/{upload['upload_id']}"
+
+    async def put(start, end, total=len(data)):
+        return await client.put(
+            url, headers={**headers, "Content-Range": f"bytes {start}-{end - 1}/{total}"}, content=data[start:end]
+        )
+
+    res = await put(0, 4000)
+    assert res.status_code == 200 and res.headers["Upload-Offset"] == "4000"
+    res = await put(3000, 5000)
+    assert res.status_code == 409 and res.headers["Upload-Offset"] == "4000"
+    assert (await put(4000, 5000, total=1)).status_code == 400
+    assert (await client.get(url, headers=headers)).json()["offset"] == 4000
+
+    res = await client.post(
+        f"/api/v1/admin/products/{product['id']}/upload-garment-asset?size=M&asset_type=OVERLAY_FRONT"
+        f"&upload_id={upload['upload_id']}", headers=headers
+    )
+    assert res.status_code == 409
+
+    assert (await put(4000, len(data))).json()["offset"] == len(data)
+    res = await client.post(f"{url}/complete", headers=headers, json={"sha256": hashlib.sha256(data).hexdigest()})
+    assert res.json()["complete"] is True
+
+    res = await client.post(
+        f"/api/v1/admin/products/{uuid.uuid4()}/upload-garment-asset?size=M&asset_type=OVERLAY_FRONT"
+        f"&upload_id={upload['upload_id']}", headers=headers
+    )
+    assert res.status_code == 404
+
+    res = await client.post(
+        f"/api/v1/admin/products/{product['id']}/upload-garment-asset?size=M&asset_type=OVERLAY_FRONT"
+        f"&upload_id={upload['upload_id']}", headers=headers
+    )
+    assert res.status_code == 200, res.text
+    assert local.url_to_path(res.json()["url"]).read_bytes() == data
+    # Claimed uploads are gone
+    assert (await client.get(url, headers=headers)).status_code == 404
+
+@pytest.mark.asyncio
+async def test_query_budget_and_server_timing(client, monkeypatch):
+    from app.core.query_stats import QueryBudgetExceeded
+    from app.modules.catalog import router
+    from app.modules.catalog.service import catalog_cache
+
+    await catalog_cache.invalidate()
+    res = await client.get("/api/v1/products/products")
+    assert res.headers["server-timing"].startswith('db;dur=') and 'desc="1 queries"' in res.headers["server-timing"]
+    # Served from the cache now
+    res = await client.get("/api/v1/products/products?limit=20")
+    assert 'desc="0 queries"' in res.headers["server-timing"]
+
+    monkeypatch.setattr(router.list_products, "query_budget", 0)
+    await catalog_cache.invalidate()
+    with pytest.raises(QueryBudgetExceeded):
+        await client.get("/api/v1/products/products")
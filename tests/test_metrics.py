@@ -0,0 +1,39 @@
+import pytest
+
+from app.core import metrics
+
+@pytest.mark.asyncio
+async def test_metrics_label_requests_by_route_template(client):
+    product_id = "00000000-0000-0000-0000-000000000000"
+    assert (await client.get(f"/api/v1/products/products/{product_id}")).status_code == 404
+    with metrics.render_stage("render"):
+        pass
+
+    res = await client.get("/metrics")
+    assert res.status_code == 200
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/api/v1/products/products/{id}",status="404"}'
+        in res.text
+    )
+    assert 'render_stage_duration_seconds_count{stage="render"}' in res.text
+    assert "db_pool_connections_checked_out" in res.text
+
+def test_fold_process_merges_exited_horses(tmp_path, monkeypatch):
+    from prometheus_client.mmap_dict import MmapedDict, mmap_key
+
+    monkeypatch.setattr(metrics, "MULTIPROC_DIR", str(tmp_path))
+    key = mmap_key("render_jobs", "render_jobs_total", ["status"], ["DONE"], "Finished render jobs by outcome")
+    for pid in (101, 102):
+        for kind in ("counter", "gauge_livesum"):
+            values = MmapedDict(str(tmp_path / f"{kind}_{pid}.db"))
+            values.write_value(key, 2.0, 0.0)
+            values.close()
+        metrics.fold_process(pid, into="worker-w1")
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["counter_worker-w1.db"]
+    samples = {
+        sample.name: sample.value
+        for metric in metrics.MultiProcessDirsCollector([str(tmp_path)]).collect()
+        for sample in metric.samples
+    }
+    assert samples["render_jobs_total"] == 4.0
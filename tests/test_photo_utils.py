@@ -0,0 +1,28 @@
+import cv2
+import numpy as np
+import pytest
+from app.modules.users import utils
+
+def _encode(ext: str, width: int, height: int) -> bytes:
+    ok, buf = cv2.imencode(ext, np.zeros((height, width, 3), dtype=np.uint8))
+    assert ok
+    return buf.tobytes()
+
+@pytest.mark.parametrize("ext", [".jpg", ".png", ".webp"])
+def test_read_image_size_from_header(ext):
+    assert utils.read_image_size(_encode(ext, 320, 240)) == (320, 240)
+
+def test_read_image_size_unknown_format():
+    assert utils.read_image_size(b"fakeimagebytes") is None
+
+def test_oversized_header_is_rejected(monkeypatch):
+    monkeypatch.setattr(utils.settings, "PHOTO_MAX_PIXELS", 1000)
+    with pytest.raises(utils.ImageTooLarge):
+        utils.check_image_size(_encode(".png", 320, 240))
+
+def test_detection_image_is_capped():
+    data = _encode(".jpg", 1600, 1200)
+    img = utils.decode_reduced(np.frombuffer(data, np.uint8), 1600, 200)
+    # 1/8 decode leaves exactly 200px on the longest side
+    assert img.shape[:2] == (150, 200)
+    assert max(utils.cap_size(img, 100).shape[:2]) == 100
@@ -0,0 +1,104 @@
+import pytest
+from httpx import AsyncClient
+
+from app.modules.users import service
+from app.storage import local
+
+@pytest.fixture
+def analyzer(tmp_path, monkeypatch):
+    """Stands in for the photo process pool; set `result` to choose its answer."""
+    monkeypatch.setattr(local.settings, "UPLOAD_DIR", str(tmp_path))
+
+    class Analyzer:
+        result = (b"face-crop-jpeg", "#a0b0c0")
+        calls = 0
+
+        async def __call__(self, file_path):
+            self.calls += 1
+            return self.result
+
+    fake = Analyzer()
+    monkeypatch.setattr(service, "analyze_body_photo", fake)
+    return fake
+
+async def _headers(client: AsyncClient, email: str) -> dict:
+    await client.post("/api/v1/auth/register", json={"email": email, "password": "pass"})
+    login = await client.post("/api/v1/auth/login", data={"username": email, "password": "pass"})
+    return {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+async def _upload(client: AsyncClient, headers: dict, data: bytes, defer: bool = False):
+    return await client.post(
+        f"/api/v1/profile/upload-body-photo?defer_processing={str(defer).lower()}",
+        headers=headers, files={"file": ("body.jpg", data, "image/jpeg")},
+    )
+
+@pytest.mark.asyncio
+async def test_deferred_upload_returns_202_then_done(client, analyzer):
+    headers = await _headers(client, "deferred@photo.com")
+
+    res = await _upload(client, headers, b"photo one", defer=True)
+    assert res.status_code == 202
+    assert res.json()["photo_status"] == "PROCESSING"
+
+    # The background task has run by the time the ASGI call returns
+    status = (await client.get("/api/v1/profile/body-photo/status", headers=headers)).json()
+    assert status["photo_status"] == "DONE"
+    profile = (await client.get("/api/v1/profile/", headers=headers)).json()
+    assert profile["skin_tone_hex"] == "#a0b0c0"
+    assert local.url_to_path(profile["face_crop_url"]).read_bytes() == b"face-crop-jpeg"
+
+@pytest.mark.asyncio
+async def test_failed_analysis_falls_back(client, analyzer):
+    headers = await _headers(client, "failed@photo.com")
+    analyzer.result = None
+
+    res = await _upload(client, headers, b"unreadable photo")
+    assert res.status_code == 200
+    assert res.json()["photo_status"] == "FAILED"
+    assert res.json()["skin_tone_hex"] == service.FALLBACK_SKIN_TONE
+    assert res.json()["face_crop_url"] is None
+
+@pytest.mark.asyncio
+async def test_known_photo_skips_the_pool(client, analyzer):
+    first = (await _upload(client, await _headers(client, "first@photo.com"), b"same photo")).json()
+    second = (await _upload(client, await _headers(client, "second@photo.com"), b"same photo")).json()
+
+    assert analyzer.calls == 1
+    assert second["photo_status"] == "DONE"
+    assert second["face_crop_url"] == first["face_crop_url"]
+
+@pytest.mark.asyncio
+async def test_late_result_does_not_overwrite_newer_photo(client, analyzer):
+    from pathlib import Path
+    from uuid import UUID
+
+    headers = await _headers(client, "late@photo.com")
+    analyzer.result = None
+    old = (await _upload(client, headers, b"old photo")).json()
+    analyzer.result = (b"new crop", "#111111")
+    new = (await _upload(client, headers, b"new photo")).json()
+    assert new["photo_status"] == "DONE"
+
+    # The old photo's analysis finishes now
+    analyzer.result = (b"old crop", "#999999")
+    stale = local.StoredFile(
+        url=old["body_photo_url"], path=local.url_to_path(old["body_photo_url"]),
+        sha256=Path(old["body_photo_url"]).stem, size=9,
+    )
+    user_id = (await client.get("/api/v1/auth/me", headers=headers)).json()["id"]
+    await service.process_body_photo(UUID(user_id), stale)
+
+    profile = (await client.get("/api/v1/profile/", headers=headers)).json()
+    assert (profile["skin_tone_hex"], profile["face_crop_url"]) == ("#111111", new["face_crop_url"])
+
+@pytest.mark.asyncio
+async def test_deleting_the_photo_removes_its_face_crop(client, analyzer):
+    headers = await _headers(client, "delete@photo.com")
+    profile = (await _upload(client, headers, b"photo to delete")).json()
+    photo = local.url_to_path(profile["body_photo_url"])
+    crop = local.url_to_path(profile["face_crop_url"])
+    assert photo.exists() and crop.exists()
+
+    res = await client.delete("/api/v1/profile/body-photo", headers=headers)
+    assert res.status_code == 200 and res.json()["face_crop_url"] is None
+    assert not photo.exists() and not crop.exists()
@@ -0,0 +1,32 @@
+import asyncio
+import subprocess
+import sys
+
+from app.core.resources import ResourceRegistry
+
+def test_resource_created_once_on_first_get():
+    calls = []
+    registry = ResourceRegistry()
+    registry.register("thing", lambda: calls.append(1) or object())
+
+    assert not registry.loaded("thing")
+    first = registry.get("thing")
+    assert registry.get("thing") is first
+    assert calls == [1]
+
+def test_close_releases_created_resources():
+    closed = []
+    registry = ResourceRegistry()
+    registry.register("a", lambda: "a", close=closed.append)
+    registry.register("b", lambda: "b", close=closed.append)
+    registry.get("a")
+    registry.get("b")
+
+    asyncio.run(registry.close())
+    assert closed == ["b", "a"]
+    assert not registry.loaded("a")
+
+def test_importing_app_skips_heavy_modules():
+    code = "import sys, app.main; print(','.join(m for m in ('cv2', 'redis', 'rq') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    assert out.stdout.strip() == ""
@@ -0,0 +1,46 @@
+import uuid
+import numpy as np
+from app.db.models import FitType, SizeEnum
+from app.modules.sizing.service import SizeChartIndex, best_sizes, measurement_vector
+
+class _Profile:
+    height_cm = 176
+    chest_cm = 98
+    shoulders_cm = 45
+    waist_cm = None
+
+def test_regular_fit_recommends_matching_size():
+    index = SizeChartIndex(capacity=1)
+    regular, oversize = uuid.uuid4(), uuid.uuid4()
+    index.upsert(regular, FitType.REGULAR, list(SizeEnum))
+    index.upsert(oversize, FitType.OVERSIZE, list(SizeEnum))
+
+    product_ids, scores = index.score(measurement_vector(_Profile()))
+    best = {item["product_id"]: item["recommended_size"] for item in best_sizes(product_ids, scores)}
+
+    assert best[regular] == SizeEnum.M
+    # Oversize cuts run large, so the same body takes a smaller size
+    assert best[oversize] == SizeEnum.S
+
+def test_unavailable_sizes_are_skipped():
+    index = SizeChartIndex()
+    pid = uuid.uuid4()
+    index.upsert(pid, FitType.REGULAR, [SizeEnum.XS, SizeEnum.XL])
+
+    product_ids, scores = index.score(measurement_vector(_Profile()), [pid])
+    assert np.isinf(scores[0, 2])
+    assert best_sizes(product_ids, scores)[0]["recommended_size"] in (SizeEnum.XS, SizeEnum.XL)
+
+def test_remove_keeps_remaining_rows():
+    index = SizeChartIndex()
+    a, b, c = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    index.upsert(a, FitType.REGULAR, [SizeEnum.S])
+    index.upsert(b, FitType.BOXY, [SizeEnum.M])
+    index.upsert(c, FitType.CROPPED, [SizeEnum.L])
+
+    index.remove(a)
+    product_ids, scores = index.score(measurement_vector(_Profile()))
+    best = {item["product_id"]: item["recommended_size"] for item in best_sizes(product_ids, scores)}
+
+    assert len(index) == 2
+    assert best == {b: SizeEnum.M, c: SizeEnum.L}
@@ -0,0 +1,171 @@
+import hashlib
+import io
+import uuid
+import cv2
+import numpy as np
+import pytest
+from fastapi import UploadFile
+from app.storage import blobs, derivatives, local
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(local.settings, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+async def test_stream_upload_hashes_and_renames(upload_dir):
+    data = b"x" * (local.CHUNK_SIZE * 2 + 10)
+    upload = UploadFile(io.BytesIO(data), filename="garment.png")
+
+    stored = await local.stream_upload_file(upload, "garments")
+
+    assert stored.path.read_bytes() == data
+    assert stored.sha256 == hashlib.sha256(data).hexdigest()
+    assert stored.size == len(data)
+    assert stored.url == f"/static/uploads/garments/{stored.path.name}"
+    assert stored.path.suffix == ".png"
+    assert [p.name for p in (upload_dir / "garments").iterdir()] == [stored.path.name]
+
+async def test_stream_upload_over_limit_leaves_nothing(upload_dir):
+    upload = UploadFile(io.BytesIO(b"x" * 100), filename="big.jpg")
+
+    with pytest.raises(local.UploadTooLarge):
+        await local.stream_upload_file(upload, "bodies", max_bytes=10)
+
+    assert list((upload_dir / "bodies").iterdir()) == []
+
+async def test_stream_upload_strips_client_path(upload_dir):
+    upload = UploadFile(io.BytesIO(b"abc"), filename="photo.jpg")
+
+    stored = await local.stream_upload_file(upload, "bodies", "../../etc/photo.jpg")
+
+    assert stored.path == upload_dir / "bodies" / "photo.jpg"
+
+def test_blob_placement_is_idempotent(upload_dir):
+    url = blobs.blob_url("ab" * 32, ".PNG")
+    dest = local.url_to_path(url)
+    assert url.endswith(f"/blobs/ab/{'ab' * 32}.png")
+
+    blobs._place(dest, data=b"first")
+    duplicate = upload_dir / "dup.tmp"
+    duplicate.write_bytes(b"first")
+    blobs._place(dest, duplicate)
+
+    assert dest.read_bytes() == b"first"
+    assert not duplicate.exists()
+
+def test_derivatives_are_resized_and_evicted(upload_dir, monkeypatch):
+    source = upload_dir / "garments" / "overlay.png"
+    source.parent.mkdir()
+    cv2.imwrite(str(source), np.zeros((1200, 900, 4), dtype=np.uint8))
+    urls = derivatives.variant_urls("/static/uploads/garments/overlay.png")
+    assert urls["thumb"].endswith("/media/thumb.webp/garments/overlay.png")
+
+    cache = derivatives.DerivativeCache()
+    thumb = cache.get("thumb", "webp", "garments/overlay.png")
+    assert max(cv2.imread(str(thumb), cv2.IMREAD_UNCHANGED).shape[:2]) == 160
+
+    # Over the limit, older variants go first and the new one is always kept
+    monkeypatch.setattr(derivatives.settings, "DERIVATIVE_CACHE_MAX_BYTES", thumb.stat().st_size + 1)
+    medium = cache.get("medium", "jpg", "garments/overlay.png")
+    assert medium.exists() and not thumb.exists()
+
+    with pytest.raises(derivatives.DerivativeNotFound):
+        cache.get("thumb", "webp", "../outside.png")
+
+async def test_released_blobs_take_their_variants(upload_dir, db_session, monkeypatch):
+    _, png = cv2.imencode(".png", np.zeros((400, 300, 3), dtype=np.uint8))
+    stored = await blobs.store_bytes(db_session, png.tobytes(), ".png")
+    await db_session.commit()
+    source = stored.url[len("/static/uploads/"):]
+    cache = derivatives.DerivativeCache()
+    monkeypatch.setattr(derivatives, "cache", cache)
+    thumb = cache.get("thumb", "webp", source)
+
+    # Rolled back: the file is put back where it was
+    await blobs.release(db_session, stored.url)
+    assert not stored.path.exists()
+    await db_session.rollback()
+    assert stored.path.exists() and thumb.exists()
+
+    await blobs.release(db_session, stored.url)
+    await db_session.commit()
+    assert not thumb.exists()
+    assert list(stored.path.parent.iterdir()) == []
+    with pytest.raises(derivatives.DerivativeNotFound):
+        cache.get("thumb", "webp", source)
+
+def test_derivatives_refuse_oversized_sources(upload_dir, monkeypatch):
+    source = upload_dir / "garments" / "big.png"
+    source.parent.mkdir()
+    cv2.imwrite(str(source), np.zeros((400, 300, 3), dtype=np.uint8))
+    monkeypatch.setattr(derivatives.settings, "PHOTO_MAX_PIXELS", 1000)
+
+    with pytest.raises(derivatives.DerivativeNotFound):
+        derivatives.DerivativeCache().get("medium", "webp", "garments/big.png")
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+async def test_resumable_upload_appends_at_offset(upload_dir):
+    from app.storage import resumable
+
+    owner = uuid.uuid4()
+    session = await resumable.create(owner, "../mannequin.mp4", 10)
+    assert session.filename == "mannequin.mp4"
+
+    assert await resumable.append(session, 0, _chunks(b"abc", b"de")) == 5
+    with pytest.raises(resumable.OffsetMismatch) as e:
+        await resumable.append(session, 3, _chunks(b"xx"))
+    assert e.value.offset == 5
+    # A chunk failing its hash is dropped, the offset stays
+    with pytest.raises(resumable.ChunkRejected):
+        await resumable.append(session, 5, _chunks(b"fgh"), hashlib.sha256(b"other").hexdigest())
+    with pytest.raises(resumable.ChunkRejected):
+        await resumable.append(session, 5, _chunks(b"fghijk"))
+    assert resumable.offset(session) == 5
+
+    with pytest.raises(resumable.UploadIncomplete):
+        await resumable.complete(session, hashlib.sha256(b"abcdefghij").hexdigest())
+    await resumable.append(session, 5, _chunks(b"fghij"), hashlib.sha256(b"fghij").hexdigest())
+    session = await resumable.complete(session, hashlib.sha256(b"abcdefghij").hexdigest())
+    assert (await resumable.get(uuid.UUID(session.id), owner)).sha256 == session.sha256
+
+    with pytest.raises(resumable.UploadNotFound):
+        await resumable.get(uuid.UUID(session.id), uuid.uuid4())
+
+async def test_resumable_claim_follows_the_transaction(upload_dir, db_session):
+    from app.storage import resumable
+
+    owner = uuid.uuid4()
+    session = await resumable.create(owner, "overlay.png", 3)
+    await resumable.append(session, 0, _chunks(b"abc"))
+    await resumable.complete(session, hashlib.sha256(b"abc").hexdigest())
+
+    # The caller's transaction failed: the upload can be claimed again
+    await resumable.claim(db_session, uuid.UUID(session.id), owner)
+    await db_session.rollback()
+    assert resumable.offset(await resumable.get(uuid.UUID(session.id), owner)) == 3
+
+    stored = await resumable.claim(db_session, uuid.UUID(session.id), owner)
+    await db_session.commit()
+    assert stored.path.read_bytes() == b"abc"
+    with pytest.raises(resumable.UploadNotFound):
+        await resumable.get(uuid.UUID(session.id), owner)
+    assert list((upload_dir / resumable.SESSIONS_FOLDER).iterdir()) == []
+
+async def test_resumable_upload_bad_hash_and_expiry(upload_dir, monkeypatch):
+    from app.storage import resumable
+
+    owner = uuid.uuid4()
+    session = await resumable.create(owner, "overlay.png", 3)
+    await resumable.append(session, 0, _chunks(b"abc"))
+    with pytest.raises(resumable.ChunkRejected):
+        await resumable.complete(session, "0" * 64)
+    with pytest.raises(resumable.UploadNotFound):
+        await resumable.get(uuid.UUID(session.id), owner)
+
+    stale = await resumable.create(owner, "old.png", 3)
+    monkeypatch.setattr(resumable.settings, "RESUMABLE_UPLOAD_TTL_SECONDS", -1)
+    await resumable.create(owner, "new.png", 3)
+    assert not any(p.name.startswith(stale.id) for p in (upload_dir / resumable.SESSIONS_FOLDER).iterdir())
@@ -43,6 +43,11 @@ async def test_try_flow_full(client: AsyncClient, db_session):
     db_session.add(mann)
     
     await db_session.commit()
+    # Written behind the admin routes' back, so drop cached manifests
+    from app.modules.catalog.service import catalog_cache
+    from app.modules.catalog.mannequins import mannequins
+    await catalog_cache.invalidate()
+    await mannequins.load(db_session)
     
     # 2. Register & Login Customer
     email = "customer@flow.com"
@@ -79,4 +84,15 @@ async def test_try_flow_full(client: AsyncClient, db_session):
     assert res.status_code == 200
     data = res.json()
     assert data["mannequin"]["video_url"] == "vid.mp4"
+    assert data["product"] == {"id": str(prod_id), "name": "Test Tee", "fit_type": "REGULAR"}
     assert "personalization" in data
+    # Catalog cache and mannequin registry are warm now: the profile is the only query
+    res = await client.get(f"/api/v1/try/{prod_id}?size=M", headers=headers)
+    assert 'desc="1 queries"' in res.headers["server-timing"]
+
+    # Unchanged manifest: revalidation is a 304
+    res = await client.get(f"/api/v1/try/{prod_id}?size=M", headers={**headers, "If-None-Match": res.headers["ETag"]})
+    assert res.status_code == 304
+
+    res = await client.get(f"/api/v1/try/{uuid.uuid4()}?size=M", headers=headers)
+    assert res.status_code == 404
@@ -0,0 +1,29 @@
+import cv2
+import numpy as np
+
+from app.worker import video
+
+def write_video(path, frames=30, size=(640, 480), fps=15):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for i in range(frames):
+        writer.write(np.full((size[1], size[0], 3), i * 8 % 256, np.uint8))
+    writer.release()
+
+def test_ladder_only_downscales():
+    assert video.ladder(1920, 1080) == [("720p", 1280, 720), ("480p", 854, 480), ("360p", 640, 360)]
+    assert video.ladder(640, 360) == []
+
+def test_probe_and_transcode(tmp_path):
+    source = tmp_path / "mannequin.mp4"
+    write_video(source)
+
+    info = video.probe(str(source))
+    assert (info.width, info.height, info.fps, info.frame_count) == (640, 480, 15, 30)
+    assert info.duration_ms == 2000
+
+    renditions, poster, frames = video.transcode(str(source), tmp_path / "out", info)
+    assert frames == 30
+    assert [(r.name, r.width, r.height) for r in renditions] == [("360p", 480, 360)]
+    assert renditions[0].bitrate_kbps > 0
+    assert video.probe(str(renditions[0].path)).frame_count == 30
+    assert cv2.imread(str(poster)).shape == (480, 640, 3)